@@ -0,0 +1,265 @@
+'''
+RPN benchmarks.
+
+Times representative workloads (lexing, dispatch per operator family, input
+and output formats, and the CLI end to end), reporting operations per second
+and peak memory. Results can be saved as a JSON baseline, and compared
+against a previous one to catch regressions, e.g.:
+
+    python benchmarks/bench.py --save before.json
+    # upgrade, change things, etc.
+    python benchmarks/bench.py --compare before.json
+'''
+
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from fnmatch import fnmatch
+import subprocess
+import tracemalloc
+import platform
+import resource
+import tempfile
+import json
+import time
+import sys
+import io
+
+from rpn.util import RPNError
+from rpn.lexer import Lexer
+from rpn.machine import Machine
+
+
+# name: (function returning callable to time, operations per call)
+BENCHMARKS = dict()
+
+
+def benchmark(name, ops):
+    '''
+    Register benchmark; decorated function sets up, and returns what to time.
+    '''
+    def decorator(setup):
+        BENCHMARKS[name] = setup, ops
+        return setup
+    return decorator
+
+
+def lex(line):
+    lexer = Lexer()
+    return lambda: list(lexer.feedables(line))
+
+
+def feed(line, setup='', repeat=1000):
+    '''
+    Return callable feeding lexemes of line, repeat times, to a machine.
+    '''
+    machine = Machine()
+    lexer = Lexer()
+    for groups in lexer.feedables(setup):
+        machine.feed(groups)
+    lexemes = list(lexer.feedables(line)) * repeat
+    stack = list(machine.stack)
+
+    def run():
+        machine.stack.clear()
+        machine.stack.extend(stack)
+        with redirect_stdout(Null()):
+            for groups in lexemes:
+                machine.feed(groups)
+    return run
+
+
+class Null:
+    '''
+    Cheapest possible stdout.
+    '''
+    def write(self, data):
+        pass
+
+    def flush(self):
+        pass
+
+
+LONG = ' '.join(['1_000.5', "'x'", 'r', 'd', '*'] * 20000)
+NUMBERS = ' '.join(str(n * 1.5) for n in range(100000))
+STRINGS = ' '.join("'string number {}'".format(n) for n in range(50000))
+benchmark('lexer.long_line', 100000)(lambda: lex(LONG))
+benchmark('lexer.numbers', 100000)(lambda: lex(NUMBERS))
+benchmark('lexer.strings', 50000)(lambda: lex(STRINGS))
+
+
+@benchmark('lexer.stream', 100000)
+def lexstream():
+    lexer = Lexer()
+    return lambda: list(lexer.lexstream(io.StringIO(NUMBERS)))
+
+
+# Operator families: line, run after setup line, 1000 times per run.
+FAMILIES = {
+    'builtins': ('3 4 + 2 - 3 * 4 / 5 % 2 ^ _ 1 = !', ''),
+    'math': ("'sin' $ 'cos' $ 'exp' $ 'atan' $ 'fabs' $", '1'),
+    'cmath': ("d 'phase' $ 1 'rect' $ + v", "'c' o 1 2 j +"),
+    'functions': ("d r 'x' s 'x' l d 'Xs' s 'Xs' l R p", '1 2'),
+    'shorthand': ('j v 2 j + 3 j *', '1'),
+}
+for family, (line, setup) in FAMILIES.items():
+    benchmark('machine.' + family, len(list(Lexer().lex(line))) * 1000)(
+        lambda line=line, setup=setup: feed(line, setup))
+
+
+# Number literals each input format converts, by n; decimal digits, unless
+# listed. No literal converts to a datetime or time, as such.
+LITERALS = {
+    'x': lambda n: format(n, 'x'),
+    'o': lambda n: format(n, 'o'),
+    'b': lambda n: format(n, 'b'),
+}
+NO_LITERALS = {'d', 't'}
+# Values each output format converts, by n; floats, unless listed.
+VALUES = {
+    # Hours.
+    't': lambda n: n % 24,
+}
+
+for key in Machine.FMTS:
+    @benchmark('format.output.' + key, 10000)
+    def oformat(key=key):
+        machine = Machine()
+        machine.storeofmt(key)
+        machine.stack.extend(map(VALUES.get(key, float), range(10000)))
+        return lambda: machine.print(*machine.stack, file=Null())
+
+    if key in NO_LITERALS:
+        continue
+
+    @benchmark('format.input.' + key, 10000)
+    def iformat(key=key):
+        machine = Machine()
+        machine.storeifmt(key)
+        groups = [{'number': LITERALS.get(key, str)(n)} for n in range(10000)]
+
+        def run():
+            machine.stack.clear()
+            for lexeme in groups:
+                machine.feed(lexeme)
+        return run
+
+
+@benchmark('cli.stdin', 20000)
+def cli():
+    '''
+    Run CLI over large piped stdin, end to end, including startup.
+    '''
+    script = tempfile.TemporaryFile('w+')
+    for n in range(20000):
+        print("c {} d 'x' s 'x' l 2 ^ 'sqrt' $ + p".format(n), file=script)
+
+    def run():
+        script.seek(0)
+        subprocess.run([sys.executable, '-m', 'rpn'],
+                       stdin=script,
+                       stdout=subprocess.DEVNULL,
+                       check=True)
+    return run
+
+
+def measure(name, repeat):
+    '''
+    Return operations per second (best of repeat), and peak memory, in bytes.
+    '''
+    setup, ops = BENCHMARKS[name]
+    run = setup()
+    try:
+        run()
+    except RPNError as e:
+        return {'error': e.args[0]}
+    best = min(timed(run) for _ in range(repeat))
+    if name.startswith('cli.'):
+        # Peak RSS of children (in KiB, on Linux); tracemalloc can't see
+        # into them.
+        peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+    else:
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {'ops_per_sec': ops / best, 'peak_memory': peak}
+
+
+def timed(run):
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+
+def compare(results, baseline, threshold):
+    '''
+    Print results against baseline; return names of regressions.
+    '''
+    regressions = []
+    print('{:32} {:>14} {:>14} {:>8}'.format('benchmark', 'baseline ops/s',
+                                             'ops/s', 'change'))
+    for name, result in results.items():
+        before = baseline.get(name, {}).get('ops_per_sec')
+        after = result.get('ops_per_sec')
+        if before is None or after is None:
+            # New, or failing, on either side.
+            print('{:32} {:>14} {:>14}'.format(
+                name, '-' if before is None else '{:.0f}'.format(before),
+                '-' if after is None else '{:.0f}'.format(after)))
+            continue
+        change = after / before - 1
+        flag = ''
+        if change < -threshold:
+            regressions.append(name)
+            flag = ' REGRESSION'
+        print('{:32} {:14.0f} {:14.0f} {:+7.1%}{}'.format(name, before, after,
+                                                          change, flag))
+    return regressions
+
+
+def main(args=None):
+    parser = ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-k', '--filter', default='*',
+                        help='only run benchmarks matching glob')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('--save', metavar='JSON')
+    parser.add_argument('--compare', metavar='JSON')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='slowdown to report as regression')
+    args = parser.parse_args(args)
+    # Before running (and possibly saving over it).
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.compare) as file:
+                baseline = json.load(file)['results']
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            parser.error('cannot read baseline {}: {}'.format(
+                args.compare, e))
+
+    results = dict()
+    for name in BENCHMARKS:
+        if not fnmatch(name, args.filter):
+            continue
+        results[name] = result = measure(name, args.repeat)
+        if 'error' in result:
+            print('{:32} {}'.format(name, result['error']), file=sys.stderr)
+        else:
+            print('{:32} {:14.0f} ops/s {:12,} B'.format(
+                name, result['ops_per_sec'], result['peak_memory']),
+                file=sys.stderr)
+
+    if args.save:
+        with open(args.save, 'w') as save:
+            json.dump({'python': platform.python_version(),
+                       'platform': platform.platform(),
+                       'time': time.time(),
+                       'results': results},
+                      save, indent=2, sort_keys=True)
+    if baseline is not None and compare(results, baseline, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
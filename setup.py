@@ -11,6 +11,9 @@ setup(
         'regex',
         'prompt_toolkit',
     ],
+    extras_require={
+        'columns': ['numpy'],
+    },
     author='Alex Pilon',
     author_email='alp@alexpilon.ca',
     packages=['rpn'],
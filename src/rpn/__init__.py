@@ -26,15 +26,23 @@ Why another RPN calculator?
 
 # TODO: Thousands separator formatting.
 # TODO: Stack center-align numbers, on the decimal point
-# TODO: Hex, octal, binary; yes, as a programmer, I sometimes need these
-# TODO: Macros
 # TODO: complex <-> {polar, reim, cartesian}
 # TODO: Should load{alignment,ifmt,ofmt,precision} reset them
 #       to their default values? People can just dup and store, right?
 
-from .cli import CLI
-from .lexer import Lexer
-from .machine import Machine
+from importlib import import_module
 
 
 __all__ = 'Machine', 'Lexer', 'CLI'
+
+
+def __getattr__(name):
+    '''
+    Import submodules only once their contents are asked for.
+
+    Keeps startup fast for one-off invocations.
+    '''
+    if name in __all__:
+        return getattr(import_module('.' + name.lower(), __name__), name)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__,
+                                                                    name))
@@ -1,36 +1,71 @@
-from os import isatty, path
+from os import isatty, path, cpu_count
 from sys import stdin, stdout, stderr, exit
 from functools import wraps
-from argparse import ArgumentParser, REMAINDER, OPTIONAL
-
-from prompt_toolkit import PromptSession
+from argparse import ArgumentParser, FileType, REMAINDER, OPTIONAL
 
 from .util import RPNError
 from .machine import Machine
 from .lexer import Lexer
+from .output import Output
 
 
 class InteractiveInput:
-    def __init__(self, prompt):
+    def __init__(self, prompt, history=None):
         self.prompt = prompt
+        self.history = history
+        self.preview = None
+
+    def attach(self, machine):
+        '''
+        Preview what lines typed would leave on machine's stack, as typed.
+        '''
+        from .preview import Preview
+        self.preview = Preview(machine)
 
     def __iter__(self):
+        # Slow to import, and only ever needed at a terminal.
+        from prompt_toolkit import PromptSession
+        from prompt_toolkit.history import ThreadedHistory
+        from prompt_toolkit.key_binding import KeyBindings
+        session = None
+        history = None
+        bindings = KeyBindings()
+        if self.history:
+            from .history import MappedHistory, PrefixSearch
+            mapped = MappedHistory(self.history)
+            # Loaded in the background, so startup doesn't wait on it.
+            history = ThreadedHistory(mapped)
+            search = PrefixSearch(mapped)
+
+            # Older entries starting with what's typed, from all of history,
+            # not just what's loaded.
+            @bindings.add('pageup')
+            def _(event):
+                buffer = event.current_buffer
+                entry = search(buffer.text)
+                if entry is not None:
+                    buffer.text = entry
+                    buffer.cursor_position = len(entry)
+
+        def toolbar():
+            return self.preview.preview(session.default_buffer.text)
         try:
             session = PromptSession(message=self.prompt,
                                     vi_mode=True,
                                     enable_suspend=True,
                                     enable_open_in_editor=True,
                                     # Persistent
-                                    history=None,  # TODO
+                                    history=history,
+                                    key_bindings=bindings,
                                     # Stack size? Top of stack?
                                     rprompt=None,  # TODO
+                                    # Live preview of stack depth and top.
                                     # TODO:
-                                    # - Stack size?
                                     # - Editing mode?
                                     # - I/O format, rounding?
                                     # - Hints? Help?
-                                    # - Truncated stack?
-                                    bottom_toolbar=None,  # TODO
+                                    bottom_toolbar=toolbar
+                                    if self.preview else None,
                                     prompt_continuation=' ' * len(self.prompt),
                                     # Debatable. Interferes with X11 selection.
                                     mouse_support=True,
@@ -38,6 +73,8 @@ class InteractiveInput:
                                     erase_when_done=False)
             # TODO: colour, lexing, completion
             while True:
+                if self.preview:
+                    self.preview.reset()
                 yield session.prompt()
         except EOFError:
             return
@@ -68,22 +105,120 @@ class CLI:
                       machine._arity(parsed),
                       sep='\t')
 
-    def executor(self):
+    def executor(self, machine=None):
         '''
         Run machine (RPN calculator).
         '''
-        machine = Machine(verbose=self.args.verbose)
-        lexer = Lexer()
-        for line in self.args.expressions:
+        # Column machines' stacks are of arrays; not saved.
+        state = self.args.state if machine is None else None
+        machine = machine or Machine(verbose=self.args.verbose,
+                                     output=self._output(),
+                                     memo=self._memo(),
+                                     guard=self._guard(),
+                                     linecache=self._linecache())
+        if state is not None and path.exists(state):
+            try:
+                machine.loadstate(state)
+            except RPNError as e:
+                # Don't run (and save over it) without it.
+                print(e.args[0], file=stderr)
+                exit(1)
+        # Scripts come lexed already.
+        lexer = self.args.expressions \
+            if isinstance(self.args.expressions, Lexer) else Lexer()
+        lines = self.args.expressions
+        if self.profiler is not None:
+            self.profiler.instrument(machine, lexer)
+            lines = self.profiler.timelines(lines)
+        if self._interactive():
+            self.args.expressions.attach(machine)
+        output = machine.output
+        # Otherwise, only written out in large chunks.
+        lineflush = self._interactive() or output.isatty()
+        try:
+            for line in lines:
+                try:
+                    machine.feedline(line, lexer)
+                # Abort entire rest of line, makes sense anyway
+                except RPNError as e:
+                    # Keep errors in order with output, e.g., with 2>&1.
+                    output.flush()
+                    # FIXME: broken with prompt_toolkit. Moves cursor up two
+                    # lines instead.
+                    print(e.args[0], file=stderr)
+                if lineflush:
+                    output.flush()
+        finally:
+            output.flush()
+            if state is not None:
+                try:
+                    machine.savestate(state)
+                except RPNError as e:
+                    print(e.args[0], file=stderr)
+
+    def parallel_executor(self):
+        '''
+        Run independent lines on as many machines, in parallel.
+        '''
+        from .parallel import ParallelExecutor
+        executor = ParallelExecutor(self.args.jobs, verbose=self.args.verbose,
+                                    guard=self._guard(), memo=self._memo(),
+                                    linecache=self._linecache())
+        executor.run(self.args.expressions)
+
+    def columnar(self):
+        '''
+        Run machine over entire CSV columns at once, and print the result.
+        '''
+        # Optional dependency on numpy.
+        from .columns import ColumnMachine
+        machine = ColumnMachine(verbose=self.args.verbose,
+                                output=self._output(),
+                                guard=self._guard())
+        with self.args.columns as columns:
             try:
-                for match in lexer.lex(line):
-                    if lexer.isimmediate(match) and lexer.isfeedable(match):
-                        machine.feed(lexer.matchedgroups(match))
-            # Abort entire rest of line, makes sense anyway
+                machine.loadcolumns(columns)
             except RPNError as e:
-                # FIXME: broken with prompt_toolkit. Moves cursor up two lines
-                # instead.
                 print(e.args[0], file=stderr)
+                exit(1)
+        with machine.errstate():
+            self.executor(machine)
+        machine.printcolumn()
+        machine.output.flush()
+
+    def server(self):
+        '''
+        Serve a machine per connection on Unix socket, until interrupted.
+        '''
+        from .server import Server
+        Server(self.args.serve, verbose=self.args.verbose,
+               guard=self._guard()).run()
+
+    def client(self):
+        '''
+        Run lines on server, printing results as they come back.
+        '''
+        from .client import Client
+        try:
+            client = Client(self.args.connect)
+        except OSError as e:
+            print('Cannot connect to {}: {}'.format(self.args.connect,
+                                                    e.strerror),
+                  file=stderr)
+            exit(1)
+        lines = self.args.expressions
+        try:
+            # No sending ahead of what the user's seen the results of.
+            results = map(client.run, lines) if self._interactive() \
+                else client.results(lines)
+            for output, error in results:
+                stdout.write(output)
+                if error:
+                    stdout.flush()
+                    stderr.write(error)
+        finally:
+            stdout.flush()
+            client.close()
 
     def raw_grammar(self):
         '''
@@ -92,6 +227,58 @@ class CLI:
         lexer = Lexer()
         print(lexer.LEXEME)
 
+    def _output(self):
+        '''
+        Return buffered output to stdout, for machines to print to; text, or
+        machine-readable records.
+        '''
+        if self.args.output_format == 'text':
+            return Output(buffered=True)
+        from .records import OUTPUTS
+        return OUTPUTS[self.args.output_format](buffered=True)
+
+    def _memo(self):
+        '''
+        Return memo for machines to memoize pure functions with, if asked to.
+        '''
+        if self.args.memoize is None:
+            return None
+        from .memo import Memo
+        return Memo(maxsize=self.args.memoize)
+
+    def _linecache(self):
+        '''
+        Return cache of whole lines' results, if asked for one.
+        '''
+        if not self.args.cache_lines:
+            return None
+        from .replay import LineCache
+        return LineCache(maxsize=self.args.cache_lines)
+
+    def _guard(self):
+        '''
+        Return guard for machines against too costly operations, unless off.
+        '''
+        if not self.args.max_bits:
+            return None
+        from .guard import Guard
+        return Guard(maxbits=self.args.max_bits,
+                     isolate=self.args.isolate,
+                     timeout=self.args.timeout,
+                     maxmemory=self.args.max_memory << 20)
+
+    def _script(self):
+        '''
+        Return script file to run, pre-lexed.
+        '''
+        from .script import Script
+        try:
+            return Script(self.args.file)
+        except (OSError, UnicodeDecodeError) as e:
+            print('Cannot read script {}: {}'.format(self.args.file, e),
+                  file=stderr)
+            exit(1)
+
     def _prompting_input(self):
         '''
         Return prompting stdin.__iter__ decorator...
@@ -103,7 +290,8 @@ class CLI:
         if self.args.prompt or \
            isatty(stdin.fileno()) and isatty(stdout.fileno()):
             return InteractiveInput(prompt=self.args.prompt or
-                                    self.DEFAULT_PROMPT)
+                                    self.DEFAULT_PROMPT,
+                                    history=self.HISTORY_FILE)
         else:
             return stdin
 
@@ -123,6 +311,9 @@ class CLI:
         int_nonint_groups.add_argument('-p', '--prompt',
                                        nargs=OPTIONAL,
                                        const=self.DEFAULT_PROMPT)
+        # Lexed once, and cached on disk; see script.
+        int_nonint_groups.add_argument('-f', '--file',
+                                       metavar='SCRIPT')
         main_groups = self.argument_parser.add_mutually_exclusive_group()
         for short_, long_, action in [('-G', '--raw-grammar',
                                        self.raw_grammar),
@@ -131,9 +322,83 @@ class CLI:
                                      action='store_const',
                                      const=action,
                                      dest='action')
+        # Lines are assumed not to depend on one another, e.g., start with c.
+        self.argument_parser.add_argument('-j', '--jobs',
+                                          '--independent-lines',
+                                          type=int,
+                                          nargs=OPTIONAL,
+                                          const=cpu_count(),
+                                          metavar='N')
+        # Columns are loaded into registers named by the CSV header.
+        self.argument_parser.add_argument('-C', '--columns',
+                                          type=FileType('r'),
+                                          metavar='CSV')
+        # Cache results of pure functions and operators; M for hit rate.
+        self.argument_parser.add_argument('-m', '--memoize',
+                                          type=int,
+                                          nargs=OPTIONAL,
+                                          const=4096,
+                                          metavar='ENTRIES')
+        # Replay lines run before (with the same stack, formats, etc.) rather
+        # than run them again; M for hit rate, 0 for off.
+        self.argument_parser.add_argument('--cache-lines',
+                                          type=int,
+                                          nargs=OPTIONAL,
+                                          const=4096,
+                                          metavar='ENTRIES')
+        # Refuse operations whose results would be over this many bits (0 for
+        # no limit), or run them in a worker process, within a budget.
+        self.argument_parser.add_argument('--max-bits',
+                                          type=int,
+                                          default=1 << 26,
+                                          metavar='BITS')
+        self.argument_parser.add_argument('--isolate',
+                                          action='store_true',
+                                          help='run operations over '
+                                          '--max-bits in a worker process')
+        self.argument_parser.add_argument('--timeout',
+                                          type=float,
+                                          default=10.0,
+                                          metavar='SECONDS',
+                                          help='of isolated operations')
+        self.argument_parser.add_argument('--max-memory',
+                                          type=int,
+                                          default=1024,
+                                          metavar='MB',
+                                          help='of isolated operations')
+        # Persistent daemon, and its thin client; both on a Unix socket.
+        daemon_groups = self.argument_parser.add_mutually_exclusive_group()
+        daemon_groups.add_argument('--serve', metavar='SOCKET')
+        daemon_groups.add_argument('--connect', metavar='SOCKET')
+        # Report to stderr at exit, or on SIGUSR1. Runs in-process.
+        self.argument_parser.add_argument('--profile',
+                                          action='store_true',
+                                          help='time operations and lines')
+        # Machine-readable records, rather than text, per p, P and f; see
+        # records.
+        self.argument_parser.add_argument('--output-format',
+                                          choices=['text', 'ndjson',
+                                                   'f64le', 'i64le'],
+                                          default='text',
+                                          metavar='FORMAT',
+                                          help='text (default), ndjson, '
+                                          'f64le or i64le')
+        # Loaded at start, if there, and saved at exit; S and L in-language.
+        self.argument_parser.add_argument('--state', metavar='FILE')
         self.argument_parser.set_defaults(action=self.executor,
                                           expressions=stdin)
 
+    def _profile(self):
+        '''
+        Set up profiler, reporting on SIGUSR1 (where there is one).
+        '''
+        from .profiler import Profiler
+        import signal
+        self.profiler = Profiler()
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1,
+                          lambda signum, frame: self.profiler.report())
+
     def _interactive(self):
         return isinstance(self.args.expressions, InteractiveInput)
 
@@ -142,9 +407,35 @@ class CLI:
         Run CLI, given these args, or previously passed CLI args.
         '''
         self.args = self.argument_parser.parse_args(args)
-        if self.args.expressions is stdin:
+        self.profiler = None
+        if self.args.file is not None:
+            self.args.expressions = self._script()
+        elif self.args.expressions is stdin:
             self.args.expressions = self._prompting_input()
+        if self.args.output_format != 'text' and \
+                (self.args.serve is not None or
+                 self.args.connect is not None):
+            self.argument_parser.error('--output-format {} not supported '
+                                       'over a socket'
+                                       .format(self.args.output_format))
+        if self.args.profile:
+            self._profile()
+        if self.args.serve is not None:
+            self.args.action = self.server
+        elif self.args.connect is not None:
+            self.args.action = self.client
+        elif self.args.columns is not None:
+            self.args.action = self.columnar
+        elif self.args.jobs and self.args.action == self.executor and \
+                not self._interactive() and not self.args.profile and \
+                self.args.state is None and not self.args.isolate and \
+                self.args.output_format == 'text':
+            # Workers can't start isolated operations' processes of their own.
+            self.args.action = self.parallel_executor
         try:
             self.args.action()
         except KeyboardInterrupt:
             exit(1)
+        finally:
+            if self.profiler is not None:
+                self.profiler.report()
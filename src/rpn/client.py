@@ -0,0 +1,71 @@
+'''
+Thin client to the RPN daemon (see server), for shell callers.
+
+Keeps imports to a minimum; it only ever passes lines and results along.
+'''
+
+import socket
+
+
+class Client:
+    '''
+    Send lines to server at path, and get back what they printed.
+    '''
+    def __init__(self, path):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+        self.reader = self.socket.makefile('rb')
+
+    def _send(self, line):
+        # Exactly one line, or we'd get back more results than we expect.
+        line = line.rstrip('\n').replace('\n', ' ') + '\n'
+        self.socket.sendall(line.encode())
+
+    def _receive(self):
+        header = self.reader.readline()
+        if not header:
+            raise ConnectionError('Server went away')
+        lengths = header.split()
+        output = self.reader.read(int(lengths[0])).decode()
+        error = self.reader.read(int(lengths[1])).decode()
+        return output, error
+
+    def run(self, line):
+        '''
+        Run line; return its output, and error, if any.
+        '''
+        self._send(line)
+        return self._receive()
+
+    def results(self, lines):
+        '''
+        Yield (output, error) per line, in order, sending lines ahead.
+        '''
+        import threading
+        import queue
+        # One item per line sent; None once all have been.
+        sent = queue.SimpleQueue()
+
+        def send():
+            try:
+                for line in lines:
+                    self._send(line)
+                    sent.put(True)
+            finally:
+                sent.put(None)
+        # Sent from another thread, or the server might block on results
+        # nobody's reading, while we block on sending it more.
+        sender = threading.Thread(target=send, daemon=True)
+        sender.start()
+        while sent.get() is not None:
+            yield self._receive()
+        sender.join()
+
+    def close(self):
+        self.reader.close()
+        self.socket.close()
+
+
+__all__ = (
+    'Client',
+)
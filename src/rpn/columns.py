@@ -0,0 +1,135 @@
+'''
+Columnar evaluation over NumPy arrays.
+
+Rather than running the machine once per row, load every column of a CSV file
+into a register as an array, and run the expression once over all of them.
+'''
+
+from contextlib import contextmanager
+import csv
+
+import numpy
+
+from .util import RPNError
+from .machine import Machine
+from .vector import UFUNCS
+
+
+# What input formats load as; anything else stays Python objects, so as to
+# keep Python semantics (e.g., unbounded ints).
+DTYPES = {
+    float: numpy.float64,
+    complex: numpy.complex128,
+}
+
+
+def vectorized(function, arity):
+    '''
+    Return function broadcast over arrays, as a ufunc if there's one.
+
+    Otherwise, on object arrays, or where the ufunc raises a floating point
+    error (see errstate), fall back on a per-element loop; which comes up
+    with what Python would, row by row, error or result (e.g., complex
+    powers of negative numbers).
+    '''
+    name = UFUNCS.get(function)
+    ufunc = getattr(numpy, name) if name else None
+    loop = numpy.frompyfunc(function, arity, 1)
+
+    def wrapped(*args):
+        arrays = [arg for arg in args if isinstance(arg, numpy.ndarray)]
+        if not arrays:
+            return function(*args)
+        elif ufunc is not None and \
+                all(array.dtype != object for array in arrays):
+            try:
+                return ufunc(*args)
+            except FloatingPointError:
+                pass
+        return loop(*args)
+    wrapped.__doc__ = function.__doc__
+    return wrapped
+
+
+class ColumnMachine(Machine):
+    '''
+    Stack machine whose registers and stack may hold entire columns.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rows = 0
+        # Whether anything's been printed yet, e.g., by p.
+        self.printed = False
+
+    def _bind(self, opcode):
+        function, arity = super()._bind(opcode)
+        if opcode.bound or not arity:
+            return function, arity
+        return vectorized(function, arity), arity
+
+    def loadcolumns(self, file):
+        '''
+        Load every column of CSV file into the register named by its header.
+        '''
+        reader = csv.reader(file)
+        header = next(reader, None)
+        if header is None:
+            raise RPNError('Empty CSV file: no header')
+        rows = []
+        # Blank lines skipped, same as csv.DictReader.
+        for row in filter(None, reader):
+            if len(row) != len(header):
+                raise RPNError('CSV row {}: {} field(s), header has {}'
+                               .format(reader.line_num, len(row),
+                                       len(header)))
+            rows.append(row)
+        columns = list(zip(*rows)) or [()] * len(header)
+        dtype = DTYPES.get(self.ifmt, object)
+        for name, column in zip(header, columns):
+            self.registers[name] = numpy.fromiter(map(self._iconvert, column),
+                                                  dtype=dtype,
+                                                  count=len(column))
+        self.rows = len(columns[0]) if columns else 0
+
+    @contextmanager
+    def errstate(self):
+        '''
+        Make floating point errors raise, as they would on Python floats.
+        '''
+        with numpy.errstate(divide='raise', over='raise', invalid='raise'):
+            yield
+
+    def _rows(self, value):
+        '''
+        Return value, broadcast to a column, as Python objects.
+        '''
+        return numpy.broadcast_to(value, (self.rows,)).tolist()
+
+    def printall(self, values, **kwargs):
+        '''
+        Round and convert/format values, columns row by row.
+        '''
+        self.printed = True
+        rows = []
+        for value in values:
+            if isinstance(value, numpy.ndarray):
+                rows.extend(self._rows(value))
+                kwargs.setdefault('sep', '\n')
+            else:
+                rows.append(value)
+        return super().printall(rows, **kwargs)
+
+    def printcolumn(self):
+        '''
+        Print top of stack as a column, one row per line.
+
+        Unless something's been printed already, e.g., by p.
+        '''
+        if self.stack and not self.printed:
+            super().print(*self._rows(self.stack[-1]), sep='\n')
+
+
+__all__ = (
+    'ColumnMachine',
+)
@@ -0,0 +1,313 @@
+'''
+Compile RPN lines into straight-line Python, for lines run over and over.
+
+Runs of lexemes with a static stack effect are turned into a single Python
+function over local variables: stack inputs are read once, constant
+subexpressions are folded at compile time, and the stack and registers are
+only written back at the very end. Anything else (printing, rotating by
+a computed amount, format changes, and so on) is left to the machine itself.
+
+If compiled code raises, nothing has been written back yet, so the same
+lexemes are simply fed to the machine again to get exactly the interpreter's
+partial results and error.
+'''
+
+from .util import RPNError, _SELECTIONS
+from .lexer import Lexer
+
+
+class _Chunk:
+    '''
+    Compiled run of lexemes.
+    '''
+    def __init__(self, lexemes, function, inputs, outputs, cleared):
+        self.lexemes = lexemes
+        self.function = function
+        # How deep it reads into the stack, and how much it leaves on it.
+        self.inputs = inputs
+        self.outputs = outputs
+        self.cleared = cleared
+
+    def run(self, machine):
+        try:
+            self.function(machine.stack, machine.registers)
+        except Exception:
+            # Deoptimize; nothing was written back.
+            for groups in self.lexemes:
+                machine.feed(groups)
+
+
+class _Interpreted:
+    '''
+    Single lexeme left for the machine to run.
+    '''
+    def __init__(self, groups):
+        self.lexemes = [groups]
+
+    def run(self, machine):
+        machine.feed(self.lexemes[0])
+
+
+class _Compiler:
+    '''
+    Symbolically run lexemes against a stack of local variable names.
+    '''
+    def __init__(self, machine):
+        self.machine = machine
+        self.steps = []
+        self._reset()
+
+    def _reset(self):
+        self.lexemes = []
+        # Symbolic stack of (name, is constant, constant value).
+        self.symbols = []
+        self.inputs = 0
+        self.cleared = False
+        self.code = []
+        self.globals = dict()
+        self.registers = dict()
+        self.counter = 0
+
+    def _name(self, prefix, value=None):
+        name = '{}{}'.format(prefix, self.counter)
+        self.counter += 1
+        if prefix in 'kf':
+            self.globals[name] = value
+        return name
+
+    def _const(self, value):
+        return self._name('k', value), True, value
+
+    def _pop(self):
+        if self.symbols:
+            return self.symbols.pop()
+        if self.cleared:
+            raise IndexError
+        name = 'a{}'.format(self.inputs)
+        self.code.insert(self.inputs,
+                         '{} = stack[-{}]'.format(name, self.inputs + 1))
+        self.inputs += 1
+        return name, False, None
+
+    def _popn(self, n):
+        '''
+        Pop n symbols, in stack order.
+        '''
+        popped = [self._pop() for _ in range(n)]
+        popped.reverse()
+        return popped
+
+    def _peekname(self):
+        '''
+        Return constant string on top of symbolic stack, if any.
+        '''
+        if self.symbols:
+            _, const, value = self.symbols[-1]
+            if const and isinstance(value, str):
+                return value
+        return None
+
+    def _call(self, function, arity):
+        '''
+        Call pure function on symbols, folding it if they're all constant.
+        '''
+        try:
+            args = self._popn(arity)
+        except IndexError:
+            return False
+        if all(const for _, const, _ in args):
+            try:
+                value = function(*[value for _, _, value in args])
+            except Exception:
+                pass
+            else:
+                if value is not None:
+                    self.symbols.append(self._const(value))
+                return True
+        f = self._name('f', function)
+        t = self._name('t')
+        self.code.append('{} = {}({})'.format(t, f, ', '.join(
+            name for name, _, _ in args)))
+        self.symbols.append((t, False, None))
+        return True
+
+    def _load(self, name):
+        '''
+        Load register, unless it has side effects.
+        '''
+        if name == '_':
+            self.symbols.append(self._const(None))
+        elif name in self.registers:
+            self.symbols.append(self.registers[name])
+        elif name not in _SELECTIONS and \
+                (name.isupper() or name.capitalize() != name):
+            t = self._name('t')
+            self.code.append('{} = registers[{!r}]'.format(t, name))
+            self.symbols.append((t, False, None))
+        else:
+            return False
+        return True
+
+    def _store(self, name):
+        '''
+        Store into (lower case) register, at the end of the chunk.
+        '''
+        if name != '_' and not name.islower():
+            return False
+        try:
+            value, = self._popn(1)
+        except IndexError:
+            return False
+        if name != '_':
+            self.registers[name] = value
+        return True
+
+    def _lexeme(self, groups):
+        '''
+        Compile lexeme into current chunk; return False if it can't be.
+        '''
+        machine = self.machine
+        if 'str' in groups:
+            self.symbols.append(self._const(groups['__str__']))
+        elif 'number' in groups:
+            try:
+                self.symbols.append(self._const(machine.parse(groups)))
+            except RPNError:
+                return False
+        elif 'apply' in groups:
+            name = self._peekname()
+            if name not in machine.functions:
+                return False
+            function, arity = machine.functions[name]
+            if getattr(function, '__self__', None) is machine:
+                # Works on the machine itself (e.g., reductions).
+                return False
+            self.symbols.pop()
+            return self._call(function, arity)
+        else:
+            operator = groups['operator']
+            if operator == 'c':
+                self.symbols.clear()
+                self.cleared = True
+            elif operator == 'd':
+                try:
+                    top, = self._popn(1)
+                except IndexError:
+                    return False
+                self.symbols.extend([top, top])
+            elif operator == 'r':
+                try:
+                    below, top = self._popn(2)
+                except IndexError:
+                    return False
+                self.symbols.extend([top, below])
+            elif operator in 'sl':
+                name = self._peekname()
+                if name is None:
+                    return False
+                self.symbols.pop()
+                return self._load(name) if operator == 'l' \
+                    else self._store(name)
+            elif operator in machine.FUNCTIONS:
+                # Printing, rotating by a computed amount, etc.
+                return False
+            else:
+                return self._call(*machine.operators[operator])
+        return True
+
+    def _flush(self):
+        '''
+        Turn current chunk, if any, into a compiled step.
+        '''
+        if not self.lexemes:
+            return
+        code = list(self.code)
+        if self.cleared:
+            code.append('stack.clear()')
+        elif self.inputs:
+            code.append('pop = stack.pop')
+            code.extend(['pop()'] * self.inputs)
+        if self.symbols:
+            code.append('stack.extend(({},))'.format(', '.join(
+                name for name, _, _ in self.symbols)))
+        for name, (value, _, _) in self.registers.items():
+            code.append('registers[{!r}] = {}'.format(name, value))
+        source = 'def chunk(stack, registers):\n' + \
+                 ''.join('    {}\n'.format(line) for line in code) + \
+                 '    return\n'
+        namespace = dict(self.globals)
+        exec(compile(source, '<rpn>', 'exec'), namespace)
+        self.steps.append(_Chunk(self.lexemes, namespace['chunk'],
+                                 self.inputs, len(self.symbols),
+                                 self.cleared))
+        self._reset()
+
+    def run(self, lexemes):
+        '''
+        Compile lexemes into steps.
+        '''
+        lexemes = iter(lexemes)
+        for groups in lexemes:
+            # Whatever's left of the symbolic stack stays put, so it's always
+            # safe to try the next lexeme on a copy.
+            saved = (list(self.symbols), self.inputs, list(self.code),
+                     dict(self.globals), dict(self.registers), self.counter,
+                     self.cleared)
+            if self._lexeme(groups):
+                self.lexemes.append(groups)
+                continue
+            (self.symbols, self.inputs, self.code, self.globals,
+             self.registers, self.counter, self.cleared) = saved
+            self._flush()
+            self.steps.append(_Interpreted(groups))
+            # Change how later lexemes parse or dispatch; interpret
+            # everything after.
+            if groups.get('operator') in self.machine.BARRIERS:
+                self.steps.extend(map(_Interpreted, lexemes))
+        self._flush()
+        return self.steps
+
+
+class Program:
+    '''
+    RPN line compiled for a machine; run as many times as needed.
+
+    Same results as feeding the line to the machine, lexeme by lexeme.
+    '''
+    def __init__(self, machine, line):
+        self.machine = machine
+        self.line = line
+        self.lexemes = []
+        self.error = None
+        try:
+            for groups in Lexer().feedables(line):
+                self.lexemes.append(groups)
+        except RPNError as e:
+            # Raised when run, after all lexemes before it have been.
+            self.error = e
+        self._compile(machine)
+
+    def _compile(self, machine):
+        # Constants are converted, and operators resolved, at compile time.
+        self.config = machine.ifmt, machine.operators
+        self.steps = _Compiler(machine).run(self.lexemes)
+
+    def run(self, machine=None):
+        '''
+        Run program on its machine, or another one.
+        '''
+        machine = machine or self.machine
+        if self.config != (machine.ifmt, machine.operators):
+            self._compile(machine)
+        for step in self.steps:
+            step.run(machine)
+        if self.error is not None:
+            raise self.error
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, self.line)
+
+
+__all__ = (
+    'Program',
+)
@@ -0,0 +1,195 @@
+'''
+Cost guard: keep any one operation from taking the whole machine down with it.
+
+Two layers. First, before running anything that could blow up (^, « and * on
+ints, factorial, string repetition), a cheap estimate of the size of its
+result, in bits, against a ceiling; over it, the operation is refused, stack
+left as it was. Second, opt-in: rather than refused, operations over the
+ceiling run in a worker process instead, killed if they take too long or use
+too much memory.
+
+Everything else (floats, Decimals in a context, etc.) is bounded already, and
+isn't looked at.
+'''
+
+from functools import wraps
+from time import monotonic
+import operator
+import math
+import os
+
+from .util import RPNError
+
+
+# Seconds between checks on a worker's memory use.
+_POLL = 0.05
+
+
+def _power(base, exponent):
+    if not isinstance(exponent, int):
+        return 0
+    if isinstance(base, int):
+        # Negative exponents make floats, and 0s, 1s and -1s stay put.
+        if exponent <= 0 or abs(base) < 2:
+            return 0
+    elif hasattr(base, 'denominator'):
+        # Fractions, either way up.
+        exponent = abs(exponent)
+    else:
+        return 0
+    if exponent >= 1 << 64:
+        return math.inf
+    return (math.log2(abs(base.numerator) or 1) +
+            math.log2(base.denominator)) * exponent
+
+
+def _lshift(left, right):
+    if isinstance(left, int) and isinstance(right, int) and left:
+        return left.bit_length() + right
+    return 0
+
+
+def _factorial(n):
+    if not isinstance(n, int) or n < 2:
+        return 0
+    # Stirling's, more or less.
+    return math.lgamma(n + 1) / math.log(2) if n < 1 << 64 else math.inf
+
+
+def _multiply(left, right):
+    if isinstance(left, int) and isinstance(right, int):
+        return left.bit_length() + right.bit_length()
+    # Strings repeated, not multiplied.
+    if isinstance(left, int):
+        left, right = right, left
+    if isinstance(left, str) and isinstance(right, int):
+        return 8 * len(left) * right
+    return 0
+
+
+# Result size, in bits (roughly), by what the machine calls.
+ESTIMATES = {
+    operator.__pow__: _power,
+    operator.__lshift__: _lshift,
+    operator.__mul__: _multiply,
+    math.factorial: _factorial,
+}
+
+
+def _rss(pid):
+    '''
+    Return resident set size of process, in bytes, or None if unknown.
+    '''
+    try:
+        with open('/proc/{}/statm'.format(pid), 'rb') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _work(connection, function, args):
+    '''
+    Run function in worker, sending back (True, result) or (False, error).
+    '''
+    try:
+        result = True, function(*args)
+    except Exception as e:
+        result = False, '{}: {}'.format(type(e).__name__, e)
+    try:
+        connection.send(result)
+    except MemoryError:
+        connection.send((False, 'MemoryError: result too large to send'))
+    finally:
+        connection.close()
+
+
+class Guard:
+    '''
+    Refuse (or isolate) operations estimated to make results too large.
+    '''
+    # About 20 million decimal digits.
+    MAXBITS = 1 << 26
+    TIMEOUT = 10.0
+    MAXMEMORY = 1 << 30
+
+    def __init__(self, maxbits=None, isolate=False, timeout=None,
+                 maxmemory=None):
+        '''
+        :param maxbits: Estimated result size over which operations are
+            refused, or isolated.
+        :param isolate: Run operations over maxbits in a worker process,
+            rather than refuse them.
+        :param timeout: Seconds of wall-clock time a worker gets.
+        :param maxmemory: Bytes of resident memory a worker gets.
+        '''
+        self.maxbits = maxbits if maxbits is not None else type(self).MAXBITS
+        self.isolate = isolate
+        self.timeout = timeout if timeout is not None else type(self).TIMEOUT
+        self.maxmemory = maxmemory if maxmemory is not None \
+            else type(self).MAXMEMORY
+
+    def call(self, function, estimate, *args):
+        '''
+        Return function(*args), unless estimated too costly.
+        '''
+        bits = estimate(*args)
+        if bits <= self.maxbits:
+            return function(*args)
+        if not self.isolate or bits > 8 * self.maxmemory:
+            raise RPNError('Result too large: about {:.0f} bits, over {}'
+                           .format(bits, self.maxbits))
+        return self._isolated(function, args)
+
+    def _isolated(self, function, args):
+        '''
+        Return function(*args), run in a worker process, within budget.
+        '''
+        import multiprocessing
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        worker = multiprocessing.Process(target=_work,
+                                         args=(sender, function, args),
+                                         daemon=True)
+        worker.start()
+        sender.close()
+        deadline = monotonic() + self.timeout
+        try:
+            while not receiver.poll(_POLL):
+                if monotonic() > deadline:
+                    raise RPNError('Timed out after {}s'.format(self.timeout))
+                rss = _rss(worker.pid)
+                if rss is not None and rss > self.maxmemory:
+                    raise RPNError('Out of memory: over {} bytes'
+                                   .format(self.maxmemory))
+            try:
+                ok, result = receiver.recv()
+            except EOFError:
+                worker.join()
+                raise RPNError('Worker died: exit code {}'
+                               .format(worker.exitcode)) from None
+        finally:
+            if worker.is_alive():
+                worker.kill()
+            worker.join()
+            receiver.close()
+        if not ok:
+            raise RPNError(result)
+        return result
+
+    def wrap(self, function):
+        '''
+        Return guarded function, or function itself if never too costly.
+        '''
+        estimate = ESTIMATES.get(function)
+        if estimate is None:
+            return function
+        call = self.call
+
+        @wraps(function)
+        def guarded(*args):
+            return call(function, estimate, *args)
+        return guarded
+
+
+__all__ = (
+    'Guard',
+)
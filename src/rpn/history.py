@@ -0,0 +1,197 @@
+'''
+Persistent prompt history, append-only, and read through mmap.
+
+One entry per line, newest last. Appending is a single write. Nothing's read
+at startup: entries are read newest first, straight out of a memory map, as
+prompt_toolkit asks for them (in the background), up to LOAD_ENTRIES of them.
+Beyond those, PrefixSearch finds entries in the map itself, without parsing
+the rest. Duplicate entries are compacted away, in the background, once
+there's enough of them.
+'''
+
+from contextlib import contextmanager
+import mmap
+import os
+
+from prompt_toolkit.history import History
+
+
+class MappedHistory(History):
+    '''
+    prompt_toolkit history, in an append-only file read through mmap.
+    '''
+    # Compact once there are at least this many entries, and more than this
+    # fraction of them duplicates of newer ones.
+    COMPACT_ENTRIES = 1000
+    COMPACT_RATIO = 0.5
+    # Distinct entries handed to prompt_toolkit, at most; the rest are only
+    # ever searched for.
+    LOAD_ENTRIES = 10000
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = os.path.expanduser(path)
+        # Appends and compaction exclude one another on this, rather than
+        # the history itself, which compaction replaces.
+        self.lockpath = self.path + '.lock'
+        self.entries = 0
+        self.duplicates = 0
+
+    @staticmethod
+    def _encode(entry):
+        # Newlines are only whitespace to RPN anyway.
+        return entry.replace('\n', ' ').encode() + b'\n'
+
+    def _map(self):
+        '''
+        Return read-only memory map of history file, or None if empty.
+        '''
+        try:
+            with open(self.path, 'rb') as file:
+                return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # Can't map empty files.
+            return None
+
+    @staticmethod
+    def _newest(data):
+        '''
+        Yield entries in mapped data, newest first.
+        '''
+        end = len(data)
+        if data[end - 1:end] == b'\n':
+            end -= 1
+        while end > 0:
+            start = data.rfind(b'\n', 0, end) + 1
+            yield data[start:end].decode(errors='replace')
+            end = start - 1
+
+    @contextmanager
+    def _locked(self):
+        try:
+            import fcntl
+        except ImportError:
+            yield
+            return
+        with open(self.lockpath, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def load_history_strings(self):
+        '''
+        Yield distinct entries, newest first, up to LOAD_ENTRIES.
+        '''
+        data = self._map()
+        if data is None:
+            return
+        self.entries = self.duplicates = 0
+        seen = set()
+        with data:
+            for entry in self._newest(data):
+                self.entries += 1
+                if entry in seen:
+                    self.duplicates += 1
+                    continue
+                if len(seen) >= self.LOAD_ENTRIES:
+                    break
+                seen.add(entry)
+                yield entry
+        if self.entries >= self.COMPACT_ENTRIES and \
+                self.duplicates > self.entries * self.COMPACT_RATIO:
+            self.compact()
+
+    def store_string(self, string):
+        '''
+        Append entry, in a single write.
+        '''
+        with self._locked():
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                         0o600)
+            try:
+                os.write(fd, self._encode(string))
+            finally:
+                os.close(fd)
+
+    def search(self, text, prefix=False):
+        '''
+        Yield distinct entries containing (or starting with) text, newest
+        first.
+        '''
+        data = self._map()
+        if data is None:
+            return
+        needle = text.replace('\n', ' ').encode()
+        seen = set()
+        with data:
+            end = len(data)
+            while end > 0:
+                found = data.rfind(needle, 0, end)
+                if found < 0:
+                    return
+                start = data.rfind(b'\n', 0, found) + 1
+                stop = data.find(b'\n', found)
+                if stop < 0:
+                    stop = len(data)
+                if not prefix or start == found:
+                    entry = data[start:stop].decode(errors='replace')
+                    if entry not in seen:
+                        seen.add(entry)
+                        yield entry
+                # Needle can't span lines; carry on before this one.
+                end = start
+
+    def compact(self):
+        '''
+        Rewrite history, keeping only the newest of duplicate entries.
+        '''
+        data = self._map()
+        if data is None:
+            return
+        with data:
+            size = len(data)
+            entries = list(dict.fromkeys(self._newest(data)))
+        entries.reverse()
+        temporary = self.path + '.compacting'
+        fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, 'wb') as file:
+            file.writelines(map(self._encode, entries))
+            with self._locked():
+                # Whatever was appended since.
+                with open(self.path, 'rb') as history:
+                    history.seek(size)
+                    file.write(history.read())
+                file.flush()
+                os.replace(temporary, self.path)
+
+
+class PrefixSearch:
+    '''
+    Older and older history entries starting with what's typed, one a call;
+    for a key binding.
+    '''
+    def __init__(self, history):
+        self.history = history
+        # What was last returned, and what's left of its search.
+        self.last = None
+        self.matches = iter(())
+
+    def __call__(self, text):
+        '''
+        Return next older entry starting with text, or if text is what was
+        last returned, with the same prefix as that; None if no more.
+        '''
+        if text != self.last:
+            self.matches = (entry for entry in
+                            self.history.search(text, prefix=True)
+                            if entry != text)
+        self.last = next(self.matches, None)
+        return self.last
+
+
+__all__ = (
+    'MappedHistory',
+    'PrefixSearch',
+)
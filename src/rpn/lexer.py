@@ -1,5 +1,6 @@
-from typing import Iterable, Match
+from collections.abc import Iterable
 from functools import reduce
+from io import TextIOBase
 import operator
 
 import regex
@@ -117,22 +118,98 @@ class Lexer:
                     regex.VERSION1,
                     regex.VERBOSE},
                    0)
+    # Compiled once, on first use; see pattern.
+    _PATTERN = None
+    # How much of a stream to read at once.
+    CHUNK_SIZE = 1 << 16
 
-    def lex(self, line: str) -> Iterable[Match]:
+    @classmethod
+    def pattern(cls):
         '''
-        Take a line and return all lexemes.
+        Return grammar, compiled once and cached.
+
+        Matched by position, rather than by reslicing the line.
+        '''
+        if cls.__dict__.get('_PATTERN') is None:
+            cls._PATTERN = regex.compile(cls.LEXEME, cls.FLAGS)
+        return cls._PATTERN
+
+    def lex(self, line: 'str | TextIOBase') -> 'Iterable[regex.Match]':
+        '''
+        Take a line (or text stream) and return all lexemes.
 
         Doesn't yield incomplete or incorrect lexemes, stopping on first bad.
         '''
-        while line:
-            match = regex.match(type(self).LEXEME, line,
-                                flags=type(self).FLAGS)
-            if match is None:
+        if not isinstance(line, str):
+            return self.lexstream(line)
+        return self._lexline(line)
+
+    def _lexline(self, line):
+        match = self.pattern().match
+        pos = 0
+        end = len(line)
+        while pos < end:
+            lexeme = match(line, pos)
+            if lexeme is None:
                 break
-            yield match
-            line = line[len(match.group(0)):]
-        if line:
-            raise RPNError("Couldn\'t lex {0}".format(line.strip()))
+            yield lexeme
+            pos = lexeme.end()
+        if pos < end:
+            raise RPNError("Couldn\'t lex {0}".format(line[pos:].strip()))
+
+    def lexstream(self, stream: TextIOBase,
+                  chunksize=None) -> 'Iterable[regex.Match]':
+        '''
+        Lex a text stream chunk by chunk, without reading it all in at once.
+
+        Only ever holds about one chunk, plus whatever lexeme straddles its
+        end, in memory.
+        '''
+        chunksize = chunksize or type(self).CHUNK_SIZE
+        match = self.pattern().match
+        buffer = ''
+        pos = 0
+        eof = False
+        while not eof:
+            chunk = stream.read(chunksize)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            end = len(buffer)
+            while pos < end:
+                lexeme = match(buffer, pos, partial=not eof)
+                if lexeme is None:
+                    raise RPNError("Couldn\'t lex {0}".format(
+                        buffer[pos:].strip()))
+                # Lexeme might carry on into the next chunk; e.g., 12|34.
+                if not eof and (lexeme.partial or lexeme.end() == end):
+                    break
+                yield lexeme
+                pos = lexeme.end()
+
+    def feedables(self, line):
+        '''
+        Yield matched groups of every lexeme in line to feed to machine.
+        '''
+        # Same as isimmediate, isfeedable, and matchedgroups, but groupdict is
+        # expensive enough to only want to call once per lexeme.
+        for match in self.lex(line):
+            groupdict = match.groupdict()
+            if 'immediate' not in groupdict or groupdict['space']:
+                continue
+            yield self._groups(groupdict)
+
+    @staticmethod
+    def _groups(groupdict):
+        groups = {key: value
+                  for key, value
+                  in groupdict.items()
+                  if value and key != 'immediate'}
+        number = groups.get('number')
+        if number is not None and '_' in number:
+            # Separators are only for people; machines get plain numbers.
+            groups['number'] = number.replace('_', '')
+        return groups
 
     def isfeedable(self, match):
         '''
@@ -150,10 +227,7 @@ class Lexer:
         '''
         Yield lexeme matches.
         '''
-        return {key: value
-                for key, value
-                in match.groupdict().items()
-                if value and key != 'immediate'}
+        return self._groups(match.groupdict())
 
 
 __all__ = (
@@ -1,17 +1,75 @@
 from sys import stderr
-from decimal import Decimal
-from datetime import datetime, time
-from fractions import Fraction
-from inspect import signature as getsignature, getdoc, Parameter
 from functools import wraps, partial
-from collections import deque
+from collections import deque, namedtuple
+from importlib import import_module
+from itertools import repeat, islice
+from types import MethodType
 
 import operator
 import math
-import cmath
 
-from .util import (RPNError, wrap_user_errors,
-                   _SELECTIONS, _load_selection, _store_selection)
+from .util import RPNError, LazyMapping, wrap_user_errors, _SELECTIONS
+from .stack import Stack
+from .output import Output
+from .vector import Vector, broadcast, REDUCTIONS
+from .radix import HUGE_BITS
+
+
+# What an operator resolves to, once and for all: the callable actually run,
+# how many arguments it pops, and whether it's a method of the machine.
+Opcode = namedtuple('Opcode', 'function arity bound')
+
+
+def _positionals(f):
+    '''
+    Return number of non-default positional arguments of callable.
+
+    Only counts positional-or-keyword parameters, same as inspect would, but
+    avoids importing inspect (slow) at startup for the usual cases.
+    '''
+    if isinstance(f, MethodType):
+        return _positionals(f.__func__) - 1
+    # Same as inspect; see through functools.wraps.
+    while hasattr(f, '__wrapped__'):
+        f = f.__wrapped__
+    code = getattr(f, '__code__', None)
+    if code is not None:
+        positionals = code.co_argcount - code.co_posonlyargcount
+        return positionals - min(positionals, len(f.__defaults__ or ()))
+    text = getattr(f, '__text_signature__', None)
+    if text:
+        count = 0
+        for parameter in text.strip('()').split(','):
+            parameter = parameter.strip()
+            if parameter == '/':
+                # All before were positional-only.
+                count = 0
+            elif parameter.startswith('*'):
+                break
+            elif not parameter.startswith('$') and '=' not in parameter:
+                count += 1
+        return count
+    from inspect import signature as getsignature, Parameter
+    signature = getsignature(f)
+    parameters = signature.parameters.values()
+    positionals = [parameter
+                   for parameter
+                   in parameters
+                   if parameter.kind == Parameter.POSITIONAL_OR_KEYWORD and
+                      parameter.default == Parameter.empty]
+    return len(positionals)
+
+
+def _importer(module, name):
+    '''
+    Return loader of (dotted) name from module, imported only then.
+    '''
+    def load():
+        value = import_module(module)
+        for attribute in name.split('.'):
+            value = getattr(value, attribute)
+        return value
+    return load
 
 
 class Machine:
@@ -22,21 +80,33 @@ class Machine:
     language.
     '''
 
-    FMTS = {
-        'i': int,
-        'f': float,
-        'D': Decimal,
+    # Loaded on first use; most runs only ever use floats.
+    FMTS = LazyMapping({
+        'i': lambda: int,
+        'f': lambda: float,
+        'D': _importer('decimal', 'Decimal'),
 
-        'd': datetime.fromtimestamp,
-        't': time,
+        'd': _importer('datetime', 'datetime.fromtimestamp'),
+        't': _importer('datetime', 'time'),
 
         # TODO: Are these two any use?
-        'c': complex,
-        'F': Fraction,
-    }
+        'c': lambda: complex,
+        'F': _importer('fractions', 'Fraction'),
+
+        # Ints, output in other bases.
+        'x': _importer(__package__ + '.radix', 'Hex'),
+        'o': _importer(__package__ + '.radix', 'Oct'),
+        'b': _importer(__package__ + '.radix', 'Bin'),
+    })
     DEFAULT_IFMT = 'f'
     DEFAULT_OFMT = 'f'
     DEFAULT_PRECISION = None
+    # Values formatted at a time when printing; bounds memory on huge stacks.
+    PRINT_CHUNK = 4096
+    # Macros running one another (or themselves), at most.
+    MACRO_DEPTH = 100
+    # Number literals kept converted, at most; see parse.
+    LITERAL_POOL = 4096
 
     def _nullary(f):
         '''
@@ -55,6 +125,10 @@ class Machine:
             wrapped.__name__ = f.__name__
         except AttributeError:
             pass
+        # What the dispatch tables call instead; no extra frame. Constants
+        # become a C-level callable returning them forever.
+        wrapped.function = f if callable(f) else repeat(f).__next__
+        wrapped.arity = 0
         return wrapped
 
     # FIXME: *really* dirty hack around getsignature not working on some
@@ -72,6 +146,8 @@ class Machine:
             wrapped.__name__ = f.__name__
         except AttributeError:
             pass
+        wrapped.function = f
+        wrapped.arity = 1
         return wrapped
 
     def _binary(f):
@@ -86,6 +162,8 @@ class Machine:
             wrapped.__name__ = f.__name__
         except AttributeError:
             pass
+        wrapped.function = f
+        wrapped.arity = 2
         return wrapped
 
     def _lambdoc(f, doc):
@@ -95,18 +173,37 @@ class Machine:
         f.__doc__ = doc
         return f
 
+    def _bound(f):
+        '''
+        Mark method as one to bind to the machine, wherever it's looked up.
+        '''
+        f.bound = True
+        return f
+
     def _cdispatch(mathfunc, cmathfunc):
         '''
         Single dispatch to mathfunc or cmathfunc on unary argument type
+
+        cmathfunc is named, so that cmath is only imported if ever needed.
         '''
         def wrapped(only):
             if isinstance(only, complex):
-                return cmathfunc(only)
+                return getattr(import_module('cmath'), cmathfunc)(only)
             else:
                 return mathfunc(only)
         wrapped.__doc__ = mathfunc.__doc__
         return wrapped
 
+    def _lazily(module, wrappers):
+        '''
+        Wrap module's functions as specified, but only on first lookup.
+        '''
+        def loader(name, wrapper):
+            return lambda: wrapper(getattr(import_module(module), name))
+        return LazyMapping({name: loader(name, wrapper)
+                            for name, wrapper
+                            in wrappers.items()})
+
     # Arithmetic operators on the items of a machine.
     BUILTINS = {
         # Arithmetic
@@ -189,33 +286,34 @@ class Machine:
         'abs': _unary(abs),
     }
     # FIXME: Workaround for getsignature not working on these:
-    CMATH = {
-        'acos': _unary(cmath.acos),
-        'acosh': _unary(cmath.acosh),
-        'asin': _unary(cmath.asin),
-        'asinh': _unary(cmath.asinh),
-        'atan': _unary(cmath.atan),
-        'atanh': _unary(cmath.atanh),
-        'cos': _unary(cmath.cos),
-        'cosh': _unary(cmath.cosh),
-        'e': _nullary(cmath.e),
-        'exp': _unary(cmath.exp),
-        'isclose': _binary(cmath.isclose),
-        'isfinite': _unary(cmath.isfinite),
-        'isinf': _unary(cmath.isinf),
-        'isnan': _unary(cmath.isnan),
-        'log': _unary(cmath.log),
-        'log10': _unary(cmath.log10),
-        'phase': _unary(cmath.phase),
-        'pi': _nullary(cmath.pi),
-        'polar': _unary(cmath.polar),
-        'rect': _binary(cmath.rect),
-        'sin': _unary(cmath.sin),
-        'sinh': _unary(cmath.sinh),
-        'sqrt': _unary(cmath.sqrt),
-        'tan': _unary(cmath.tan),
-        'tanh': _unary(cmath.tanh),
-    }
+    # Only imported when first used.
+    CMATH = _lazily('cmath', {
+        'acos': _unary,
+        'acosh': _unary,
+        'asin': _unary,
+        'asinh': _unary,
+        'atan': _unary,
+        'atanh': _unary,
+        'cos': _unary,
+        'cosh': _unary,
+        'e': _nullary,
+        'exp': _unary,
+        'isclose': _binary,
+        'isfinite': _unary,
+        'isinf': _unary,
+        'isnan': _unary,
+        'log': _unary,
+        'log10': _unary,
+        'phase': _unary,
+        'pi': _nullary,
+        'polar': _unary,
+        'rect': _binary,
+        'sin': _unary,
+        'sinh': _unary,
+        'sqrt': _unary,
+        'tan': _unary,
+        'tanh': _unary,
+    })
     #MATH = {
     #    key: value
     #    for key, value
@@ -229,20 +327,90 @@ class Machine:
     #    if not key.startswith('_')
     #}
 
-    def __init__(self, verbose=None):
+    def __init__(self, verbose=None, output=None, selections=None,
+                 memo=None, guard=None, linecache=None):
         '''
         Create empty stack machine.
 
         :param verbose: Show stack traces on bad user commands.
-        '''
+        :param output: Output to print to; unbuffered stdout by default.
+        :param selections: Selections for the clipboard registers; X11's,
+            through xclip, by default.
+        :param memo: Memo to memoize pure functions and operators with, if
+            any.
+        :param guard: Guard to refuse (or isolate) operations whose results
+            would be too large with, if any.
+        :param linecache: LineCache to replay whole lines run before from, if
+            any; see feedline.
+        '''
+        self.output = output if output is not None else Output()
+        self.selections = selections
+        self.memo = memo
+        self.guard = guard
+        self.linecache = linecache
         self.registers = dict()
-        self.stack = deque()
-        self.frames = deque([self.stack])
+        self.macros = dict()
+        self._macrodepth = 0
         self.ifmt = type(self).FMTS[type(self).DEFAULT_IFMT]
+        self.stack = Stack(type=self.ifmt)
+        self.frames = deque([self.stack])
         self.ofmt = type(self).FMTS[type(self).DEFAULT_OFMT]
         self.precision = type(self).DEFAULT_PRECISION
         self.verbose = verbose
         # TODO: Endianness
+        self._makedispatch()
+
+    def _makedispatch(self):
+        '''
+        Resolve the class dispatch tables against this machine.
+
+        Binds machine methods once, rather than on every call.
+        '''
+        # Anything ever handed out by parse, and what it resolves to.
+        self._resolved = dict()
+        # Only resolved once needed.
+        self.dispatch = LazyMapping({mode: partial(self._resolvetable, mode)
+                                     for mode
+                                     in type(self).DISPATCH})
+        self.functions = type(self).CALLABLES.transform(self._bind)
+        self._selectdispatch()
+
+    def _resolvetable(self, mode):
+        '''
+        Resolve class dispatch table for numeric mode against this machine.
+        '''
+        table = {key: self._bind(opcode)
+                 for key, opcode
+                 in type(self).DISPATCH[mode].items()}
+        for key, (function, arity) in table.items():
+            ref = type(self).OPERATORS[key]
+            if mode == 'complex':
+                ref = type(self).CMATH.get(key, ref)
+            self._resolved[ref] = self._resolved[function] = \
+                (function, arity)
+        return table
+
+    def _bind(self, opcode):
+        '''
+        Return callable to actually run for opcode, and its arity.
+        '''
+        if opcode.bound:
+            return opcode.function.__get__(self), opcode.arity
+        function = opcode.function
+        if self.guard is not None:
+            function = self.guard.wrap(function)
+        if self.memo is not None and opcode.arity:
+            # Anything not bound to the machine is pure.
+            function = self.memo.wrap(function)
+        return function, opcode.arity
+
+    def _selectdispatch(self):
+        '''
+        Switch operators over to the table for the current numeric mode.
+        '''
+        self.operators = self.dispatch['complex'
+                                       if self.ofmt is complex
+                                       else 'real']
 
     def feed(self, groups):
         '''
@@ -250,11 +418,23 @@ class Machine:
 
         :param groups: re Match objects on lexemes.
         '''
-        parsed = self.parse(groups)
-        if self.isstackable(groups):
-            self._pshstack(parsed)
+        if 'operator' in groups:
+            self._call(*self.operators[groups['operator']])
+        elif 'apply' in groups:
+            self.apply()
         else:
-            self._apply(parsed)
+            self.stack.append(self.parse(groups))
+
+    def feedline(self, line, lexer):
+        '''
+        Feed every lexeme of line, as lexed by lexer; replayed from the line
+        cache instead, if run before (and it can be).
+        '''
+        if self.linecache is not None:
+            self.linecache.run(self, lexer, line)
+            return
+        for groups in lexer.feedables(line):
+            self.feed(groups)
 
     def parse(self, groups):
         '''
@@ -265,16 +445,29 @@ class Machine:
         if 'str' in groups:
             return groups['__str__']
         elif 'number' in groups:
-            return self._iconvert(groups['number'])
+            # Same literals over and over; convert each only once (per
+            # input format). Values of all formats are immutable.
+            number = groups['number']
+            literals = self._literals
+            value = literals.get(number)
+            if value is None:
+                value = self._iconvert(number)
+                if len(literals) >= type(self).LITERAL_POOL:
+                    literals.clear()
+                literals[number] = value
+            return value
         elif 'operator' in groups:
-            operator = groups['operator']
-            ref = type(self).OPERATORS[operator]
-            if self.ofmt is complex:
-                ref = type(self).CMATH.get(operator, ref)
-            return ref
+            return self.operators[groups['operator']][0]
         elif 'apply' in groups:
             return self.apply
 
+    def compile(self, line):
+        '''
+        Compile line into a Program, to run repeatedly with Program.run.
+        '''
+        from .compiler import Program
+        return Program(self, line)
+
     def isstackable(self, groups):
         '''
         Return true if stackable lexeme (e.g., number), rather than runnable.
@@ -287,14 +480,20 @@ class Machine:
         '''
         if not callable(f):
             return None
-        signature = getsignature(f)
-        parameters = signature.parameters.values()
-        positionals = [parameter
-                       for parameter
-                       in parameters
-                       if parameter.kind == Parameter.POSITIONAL_OR_KEYWORD and
-                          parameter.default == Parameter.empty]
-        return len(positionals)
+        return self._resolve(f)[1]
+
+    def _resolve(self, f):
+        '''
+        Return callable actually to run, and its arity, for any callable.
+        '''
+        try:
+            return self._resolved[f]
+        except KeyError:
+            pass
+        # Bind non-instance methods to self.
+        bound = f in type(self).FUNCTIONS.values()
+        resolved = self._resolved[f] = self._bind(type(self)._opcode(f, bound))
+        return resolved
 
     def apply(self):
         '''
@@ -304,24 +503,67 @@ class Machine:
         internally.
         '''
         f = self._popstack()[0]
-        self._apply(type(self).NAMESPACE[f])
+        macro = self.macros.get(f) if isinstance(f, str) else None
+        if macro is not None:
+            self.runmacro(macro)
+            return
+        try:
+            self._call(*self.functions[f])
+        except RPNError:
+            # Arguments are back where they were; so goes the function.
+            self.stack.append(f)
+            raise
+
+    def runmacro(self, macro):
+        '''
+        Run macro, guarding against runaway recursion.
+        '''
+        if self._macrodepth >= type(self).MACRO_DEPTH:
+            raise RPNError('Macros nested over {} deep, in {}'
+                           .format(type(self).MACRO_DEPTH, macro.name))
+        self._macrodepth += 1
+        try:
+            macro.run(self)
+        finally:
+            self._macrodepth -= 1
 
     def _apply(self, parsed):
         '''
         Apply (callable) parsed lexeme to stack, popping arguments as needed.
+        '''
+        self._call(*self._resolve(parsed))
+
+    def _call(self, function, arity):
+        '''
+        Call resolved function on stack, popping arguments as needed.
 
         Does the real work.
         '''
-        # Bind non-instance methods to self.
-        # TODO: A better way of detecting this?
-        if parsed in type(self).FUNCTIONS.values():
-            parsed = partial(parsed, self)
-        # If you don't reverse, you'll do 2**9 when you say 9 2 ^ instead of
-        # 9**2.
-        args = reversed(self._popstack(self._arity(parsed)))
-        res = parsed(*args)
+        if arity:
+            # In stack order, or you'll do 2**9 when you say 9 2 ^ instead of
+            # 9**2.
+            try:
+                args = self.stack.popn(arity)
+            except IndexError:
+                raise RPNError('Less than {} element(s) on stack'
+                               .format(arity)) from None
+            try:
+                res = function(*args)
+            except TypeError:
+                # Maybe vectors, to broadcast over; off the fast path.
+                if getattr(function, '__self__', None) is self or \
+                        not any(isinstance(arg, Vector) for arg in args):
+                    raise
+                res = broadcast(function, args)
+            except RPNError:
+                # Refused (e.g., too costly): as you were.
+                if getattr(function, '__self__', None) is not self:
+                    self.stack.extend(args)
+                raise
+        else:
+            res = function()
         if res is not None:
-            self._pshstack(res)
+            self.stack.append(res)
 
     @wrap_user_errors('Cannot convert {1}')
     def _iconvert(self, number):
@@ -338,6 +580,19 @@ class Machine:
         '''
         return self.ofmt(number)
 
+    @property
+    def ifmt(self):
+        '''
+        Input format; converts number literals.
+        '''
+        return self._ifmt
+
+    @ifmt.setter
+    def ifmt(self, ifmt):
+        self._ifmt = ifmt
+        # Literals converted by whatever format came before.
+        self._literals = dict()
+
     def _round(self, n):
         '''
         Round number to precision (on output) if machine set to round.
@@ -347,14 +602,76 @@ class Machine:
         else:
             return round(n, self.precision)
 
+    def _format(self, value):
+        '''
+        Return value as printed, according to machine settings.
+
+        Huge ints come back as Digits, to print a chunk at a time.
+        '''
+        if isinstance(value, Vector):
+            return '[{}]'.format(' '.join(map(str, map(self._format, value))))
+        value = self._round(self._oconvert(value))
+        if isinstance(value, int) and value.bit_length() >= HUGE_BITS:
+            from .radix import Digits
+            return Digits(value, getattr(value, 'BASE', 10))
+        return str(value)
+
     def print(self, *args, **kwargs):
         '''
         Round and convert/format args according to machine settings.
         '''
-        return print(*[self._round(self._oconvert(arg))
-                       for arg
-                       in args],
-                     **kwargs)
+        self.printall(args, **kwargs)
+
+    def printall(self, values, sep=' ', end='\n', file=None):
+        '''
+        Like print, but over any iterable, formatted a chunk at a time.
+
+        Never holds all of a large stack's formatted values at once; so, on
+        a value that fails to format, whatever chunks came before it are
+        written already, and only the rest isn't.
+        '''
+        output = self.output if file is None else Output(file)
+        writerecord = getattr(output, 'writerecord', None)
+        if writerecord is not None:
+            # Machine-readable; as a record, never formatted.
+            writerecord(values, self.ofmt, self.precision)
+            return
+        values = iter(values)
+        chunk = type(self).PRINT_CHUNK
+        text = self._joined(output, sep, islice(values, chunk))
+        while True:
+            more = list(islice(values, chunk))
+            if not more:
+                break
+            output.write(text + sep)
+            text = self._joined(output, sep, more)
+        output.write(text + end)
+        if file is not None:
+            output.flush()
+
+    def _joined(self, output, sep, values):
+        '''
+        Return values formatted and joined by sep.
+
+        Huge ints are written out a chunk at a time, along with everything
+        before them, instead.
+        '''
+        formatted = list(map(self._format, values))
+        try:
+            return sep.join(formatted)
+        except TypeError:
+            pass
+        text = []
+        for value in formatted:
+            if isinstance(value, str):
+                text.append(value)
+                continue
+            output.write(sep.join(text + ['']))
+            text = []
+            for piece in value:
+                output.write(piece)
+            text.append('')
+        return sep.join(text)
 
     def clrstack(self):
         '''
@@ -374,7 +691,7 @@ class Machine:
         Print all elements on the stack, top of the stack first.
         '''
         # TODO: Output endianness?
-        self.print(*reversed(self.stack), sep='\n')
+        self.printall(reversed(self.stack), sep='\n')
 
     def _pshstack(self, *new):
         '''
@@ -408,7 +725,9 @@ class Machine:
         '''
         Pop and print element at top of stack.
         '''
-        self.print(self._popstack()[0])
+        # Left be if it can't be printed (e.g., as a binary record).
+        self.print(self.stack[-1])
+        self.stack.pop()
 
     def revstack(self):
         '''
@@ -422,13 +741,180 @@ class Machine:
         '''
         self.stack.rotate(int(n))
 
+    def pack(self, n):
+        '''
+        Pop n elements, into a vector, topmost last.
+        '''
+        try:
+            count = int(n)
+        except (TypeError, ValueError, OverflowError):
+            count = None
+        if count != n or count < 0:
+            self.stack.append(n)
+            raise RPNError('Cannot pack {!r} element(s)'.format(n))
+        try:
+            values = self.stack.popn(count)
+        except IndexError:
+            self.stack.append(n)
+            raise RPNError('Less than {} element(s) on stack'
+                           .format(count)) from None
+        self.stack.append(Vector.of(values))
+
+    def unpack(self, vector):
+        '''
+        Push elements of vector, last one on top.
+        '''
+        if not isinstance(vector, Vector):
+            self.stack.append(vector)
+            raise RPNError('Not a vector: {!r}'.format(vector))
+        self.stack.extend(vector.tolist())
+
+    @wrap_user_errors('No such register')
+    def _registerstack(self, name):
+        '''
+        Return values in register stack, as they are: a list, or an array
+        view, if loaded from a state file and not pushed onto since.
+        '''
+        register = self.registers.get(name)
+        if not isinstance(register, list) and not hasattr(register, 'mapped'):
+            raise RPNError('Not a register stack: {}'.format(name))
+        mapped = getattr(register, 'mapped', None)
+        return register if mapped is None else mapped
+
+    def gather(self, name):
+        '''
+        Push vector of all values in register stack, leaving it as is.
+        '''
+        self.stack.append(Vector.of(self._registerstack(name)))
+
+    def depth(self):
+        '''
+        Push number of elements on the stack.
+        '''
+        self._pshstack(self._iconvert(str(len(self.stack))))
+
+    def _reduce(self, name):
+        '''
+        Reduce what's on top of the stack to a scalar, in its place: a vector;
+        a register stack, by name (left as is); or, given n, the n values
+        below it.
+
+        Nothing's popped until it's done, so it's all as it was on error.
+        '''
+        reduction = REDUCTIONS[name]
+        stack = self.stack
+        if not stack:
+            raise RPNError('Empty stack')
+        what = stack[-1]
+        if isinstance(what, (Vector, str)):
+            values = what if isinstance(what, Vector) \
+                else self._registerstack(what)
+            try:
+                result = reduction(values)
+            except RPNError:
+                raise
+            except Exception as e:
+                raise RPNError('Cannot {} {!r}'.format(name, what), e)
+            stack.pop()
+            stack.append(result)
+            return
+        try:
+            n = int(what)
+        except (TypeError, ValueError):
+            n = None
+        if n != what or not 0 <= n < len(stack):
+            raise RPNError('Cannot {} {} element(s) of {}'.format(
+                name, what, len(stack) - 1))
+        stack.pop()
+        values = stack.popn(n)
+        try:
+            result = reduction(values)
+        except Exception as e:
+            stack.extend(values)
+            stack.append(what)
+            if isinstance(e, RPNError):
+                raise
+            raise RPNError('Cannot {} {} element(s)'.format(name, n), e)
+        stack.append(result)
+
+    @_bound
+    def sumreduce(self):
+        '''
+        Sum of a vector, register stack, or n values.
+
+        Of a vector; a register stack, by name; or, given n, the n values
+        below it. Exactly rounded (as fsum) where floats.
+        '''
+        self._reduce('sum')
+
+    @_bound
+    def prodreduce(self):
+        '''
+        Product of a vector, register stack, or n values.
+
+        Of a vector; a register stack, by name; or, given n, the n values
+        below it.
+        '''
+        self._reduce('prod')
+
+    @_bound
+    def minreduce(self):
+        '''
+        Smallest of a vector, register stack, or n values.
+
+        Of a vector; a register stack, by name; or, given n, the n values
+        below it.
+        '''
+        self._reduce('min')
+
+    @_bound
+    def maxreduce(self):
+        '''
+        Largest of a vector, register stack, or n values.
+
+        Of a vector; a register stack, by name; or, given n, the n values
+        below it.
+        '''
+        self._reduce('max')
+
+    @_bound
+    def meanreduce(self):
+        '''
+        Mean of a vector, register stack, or n values.
+
+        Of a vector; a register stack, by name; or, given n, the n values
+        below it.
+        '''
+        self._reduce('mean')
+
+    def _errors(self):
+        '''
+        Return stream to print help, statistics, etc. to: the output's, if it
+        has its own (e.g., a daemon session's), stderr otherwise.
+        '''
+        errors = getattr(self.output, 'errors', None)
+        return errors if errors is not None else stderr
+
     def printhelp(self):
         '''
         Print all possible commands.
         '''
-        print('functions:', *sorted(type(self).NAMESPACE), file=stderr)
-        print('operators:', *sorted(type(self).OPERATORS), file=stderr)
-        print('formats:', *sorted(type(self).FMTS), file=stderr)
+        errors = self._errors()
+        print('functions:', *sorted(type(self).NAMESPACE), file=errors)
+        print('operators:', *sorted(type(self).OPERATORS), file=errors)
+        print('formats:', *sorted(type(self).FMTS), file=errors)
+        if self.macros:
+            print('macros:', *sorted(self.macros), file=errors)
+
+    def printmemo(self):
+        '''
+        Print memoization and line cache statistics (hit rate, etc.).
+        '''
+        errors = self._errors()
+        print('memo:', self.memo if self.memo is not None else 'off',
+              file=errors)
+        print('lines:', self.linecache if self.linecache is not None
+              else 'off', file=errors)
 
     @staticmethod
     def _mathdoc(key, function):
@@ -438,6 +924,7 @@ class Machine:
         Those functions often start with their signature, which isn't exactly
         useful.
         '''
+        from inspect import getdoc
         doclines = [line.strip()
                     for line
                     in getdoc(function).splitlines()
@@ -452,6 +939,7 @@ class Machine:
         '''
         Return cleaned up operator documentation
         '''
+        from inspect import getdoc
         if opfunc.__doc__:
             return getdoc(opfunc).splitlines()[0].strip()
         else:
@@ -461,21 +949,31 @@ class Machine:
         '''
         Print table of possible commands and abbreviated help
         '''
-        print('functions:', file=stderr)
+        errors = self._errors()
+        print('functions:', file=errors)
         for key, mathfunc in sorted(type(self).NAMESPACE.items()):
             print(key, self._mathdoc(key, mathfunc),
                   sep=': ',
-                  file=stderr)
-        print('\noperators:', file=stderr)
+                  file=errors)
+        print('\noperators:', file=errors)
         for key, opfunc in sorted(type(self).OPERATORS.items()):
             print(key, self._operatordoc(opfunc),
                   sep=': ',
-                  file=stderr)
-        print('\nformats:', file=stderr)
+                  file=errors)
+        print('\nformats:', file=errors)
         for key, formatter in sorted(type(self).FMTS.items()):
             print(key, formatter.__name__,
                   sep=': ',
-                  file=stderr)
+                  file=errors)
+
+    def _selections(self):
+        '''
+        Return selections, set up on first use.
+        '''
+        if self.selections is None:
+            from .selection import Selections
+            self.selections = Selections()
+        return self.selections
 
     @wrap_user_errors('No such register')
     def load(self, name):
@@ -485,7 +983,7 @@ class Machine:
         if name == '_':
             self._pshstack(None)
         elif name in _SELECTIONS:
-            self._pshstack(_load_selection(_SELECTIONS[name]))
+            self._pshstack(self._selections().load(_SELECTIONS[name]))
         elif not name.isupper() and name.capitalize() == name:
             self._pshstack(self.registers[name].pop())
         else:
@@ -500,7 +998,7 @@ class Machine:
         elif name == '_':
             return
         elif name in _SELECTIONS:
-            return _store_selection(value, _SELECTIONS[name])
+            return self._selections().store(_SELECTIONS[name], value)
         elif name.isupper():
             if name not in self.registers:
                 self.registers[name] = value
@@ -520,6 +1018,7 @@ class Machine:
         Set default coercion on input.
         '''
         self.ifmt = type(self).FMTS[ifmt]
+        self.stack.retype(self.ifmt)
 
     @wrap_user_errors('No such format')
     def storeofmt(self, ofmt):
@@ -527,6 +1026,7 @@ class Machine:
         Set default output format.
         '''
         self.ofmt = type(self).FMTS[ofmt]
+        self._selectdispatch()
 
     @wrap_user_errors('Bad precision')
     def storeprecision(self, precision):
@@ -556,6 +1056,34 @@ class Machine:
         '''
         self._pshstack(self.precision)
 
+    def define(self, body, name):
+        '''
+        Define (or redefine) macro name, to run body through $.
+        '''
+        from .macro import Macro
+        if not isinstance(name, str) or not name:
+            raise RPNError('Invalid macro name {!r}'.format(name))
+        elif name in type(self).NAMESPACE:
+            raise RPNError('Cannot redefine function {}'.format(name))
+        # Redefining starts over, operations resolved and all.
+        self.macros[name] = Macro(name, str(body))
+
+    @wrap_user_errors('Cannot save state to {1}')
+    def savestate(self, path):
+        '''
+        Save stack, registers, formats and precision to file.
+        '''
+        from .state import save
+        save(self, path)
+
+    @wrap_user_errors('Cannot load state from {1}')
+    def loadstate(self, path):
+        '''
+        Replace stack, registers, formats and precision with those in file.
+        '''
+        from .state import load
+        load(self, path)
+
     @wrap_user_errors('No such name')
     def help(self, name):
         '''
@@ -566,6 +1094,13 @@ class Machine:
             ref = type(self).NAMESPACE.get(name)
         if ref is None:
             raise KeyError
+        errors = getattr(self.output, 'errors', None)
+        if errors is not None:
+            import pydoc
+            pydoc.Helper(output=errors).help(ref)
+            return
+        # pydoc writes straight to stdout.
+        self.output.flush()
         help(ref)
 
     # Language mapping to stack operations/callables.
@@ -591,13 +1126,23 @@ class Machine:
         'I': loadifmt,
         'O': loadofmt,
         'K': loadprecision,
+        'M': printmemo,
+        'S': savestate,
+        'L': loadstate,
+        'm': define,
+        'n': pack,
+        'u': unpack,
+        'g': gather,
+        'z': depth,
     }
+    # Operators that may change how later lexemes parse or dispatch.
+    BARRIERS = frozenset('ioL')
 
     # Aliases to oft used functions, so we don't need to type out their full
     # name, quoted, and apply each time.
     SHORTHAND = {
         # 'v', like in UNIX dc.
-        'v': _cdispatch(math.sqrt, cmath.sqrt),
+        'v': _cdispatch(math.sqrt, 'sqrt'),
         # Unfortunately, that means you need to 3 4j + instead of 3j4, but hey,
         # it's consistent! Like _ (unary minus). No special casing. Wonder if I
         # should exceptionally make these prefix operators…
@@ -611,7 +1156,41 @@ class Machine:
     for namespace in SYMBOLS, FUNCTIONS, BUILTINS, SHORTHAND:
         OPERATORS.update(namespace)
     # The namespace of all visible callables.
-    NAMESPACE = dict()
+    NAMESPACE = LazyMapping()
     for namespace in CMATH, MATH:
-        NAMESPACE.update(namespace)
-    NAMESPACE['gcd'] = math.gcd
+        NAMESPACE.merge(namespace)
+    NAMESPACE.merge({'gcd': math.gcd})
+    # Reductions, of vectors, register stacks, or the top of the stack, down
+    # to scalars.
+    NAMESPACE.merge({
+        'sum': sumreduce,
+        'prod': prodreduce,
+        'min': minreduce,
+        'max': maxreduce,
+        'mean': meanreduce,
+    })
+    NAMESPACE.merge(LazyMapping({
+        'dot': _importer(__package__ + '.vector', 'dot'),
+    }))
+
+    def _opcode(ref, bound=False):
+        '''
+        Resolve a namespace entry down to what should actually be called.
+        '''
+        function = getattr(ref, 'function', ref)
+        bound = getattr(ref, 'bound', bound)
+        arity = getattr(ref, 'arity', None)
+        if arity is None:
+            arity = _positionals(ref) - bound
+        return Opcode(function, arity, bound)
+
+    # Per numeric mode, every operator resolved once and for all, rather than
+    # inspecting signatures on every call.
+    DISPATCH = {'real': dict(), 'complex': dict()}
+    for key, ref in OPERATORS.items():
+        DISPATCH['real'][key] = _opcode(ref, key in FUNCTIONS)
+        DISPATCH['complex'][key] = _opcode(CMATH.get(key, ref),
+                                           key in FUNCTIONS)
+    del key, ref
+    # Same, for the apply operator, but on first lookup.
+    CALLABLES = NAMESPACE.transform(_opcode)
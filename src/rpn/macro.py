@@ -0,0 +1,116 @@
+'''
+User-defined macros: named lines, lexed once, and run through `$`.
+
+A macro's body is lexed when defined, and resolved into a list of operations:
+values to push, already parsed, and callables to call, already looked up, with
+their arity (including functions applied by name, as in 'sin' $). Running it
+skips the lexer and parser entirely.
+
+Resolution depends on the input format (parsing) and the numeric mode
+(dispatch), so it's cached per both. Operations that may change either (format
+changes, applying another macro, etc.) are checked after; the rest of the body
+is resolved again if they did.
+'''
+
+import re
+
+from .util import RPNError
+from .lexer import Lexer
+
+
+# Operation kinds.
+_PUSH = 0
+_CALL = 1
+# Left to the machine, e.g., literals that don't parse in this format.
+_FEED = 2
+
+
+class Macro:
+    '''
+    Named body of lexemes, resolved once per input format and numeric mode.
+    '''
+    def __init__(self, name, body):
+        self.name = name
+        # Quotes within body come escaped, as in '\'x\' l'.
+        self.body = re.sub(r"\\([\\'])", r'\1', body)
+        # Raises on bad lexemes, at definition already.
+        self.lexemes = list(Lexer().feedables(self.body))
+        # Resolved operations, and what they were resolved against.
+        self._operations = None
+        self._ifmt = self._operators = None
+
+    def _resolve(self, machine):
+        '''
+        Return operations for lexemes, resolved against machine.
+        '''
+        barriers = machine.BARRIERS
+        operations = []
+        lexemes = self.lexemes
+        index = 0
+        while index < len(lexemes):
+            groups = lexemes[index]
+            index += 1
+            if 'operator' in groups:
+                function, arity = machine.operators[groups['operator']]
+                operations.append((_CALL, function, arity,
+                                   groups['operator'] in barriers))
+                continue
+            elif 'apply' in groups:
+                operations.append((_CALL, machine.apply, 0, True))
+                continue
+            try:
+                value = machine.parse(groups)
+            except RPNError:
+                operations.append((_FEED, groups, None, False))
+                continue
+            following = lexemes[index] if index < len(lexemes) else {}
+            if 'str' in groups and 'apply' in following and \
+                    value in machine.NAMESPACE:
+                # Named function applied; look it up once and for all.
+                function, arity = machine.functions[value]
+                operations.append((_CALL, function, arity, False))
+                index += 1
+            else:
+                operations.append((_PUSH, value, None, False))
+        return operations
+
+    def _current(self, machine):
+        return self._ifmt is machine.ifmt and \
+            self._operators is machine.operators
+
+    def operations(self, machine):
+        '''
+        Return operations, resolved against machine's current modes.
+        '''
+        if not self._current(machine):
+            self._operations = self._resolve(machine)
+            self._ifmt, self._operators = machine.ifmt, machine.operators
+        return self._operations
+
+    def run(self, machine, start=0):
+        '''
+        Run operations on machine, from start on.
+        '''
+        operations = self.operations(machine)
+        call = machine._call
+        for index in range(start, len(operations)):
+            kind, first, second, barrier = operations[index]
+            if kind is _PUSH:
+                machine.stack.append(first)
+            elif kind is _CALL:
+                call(first, second)
+                # Modes changed, by this or a nested run; resolve the rest
+                # again. Operations line up, resolved against whatever.
+                if barrier and self.operations(machine) is not operations:
+                    return self.run(machine, index + 1)
+            else:
+                machine.feed(first)
+
+    def __repr__(self):
+        return '{}({!r}, {!r})'.format(type(self).__name__,
+                                       self.name, self.body)
+
+
+__all__ = (
+    'Macro',
+)
@@ -0,0 +1,134 @@
+'''
+Opt-in memoization of pure functions (math, operators), for repeated work.
+
+Only ever wraps functions that are pure: results depend on arguments alone.
+Results are looked up by type-qualified, exact arguments, so 2, 2.0, -0.0 and
+Decimal('2.0') are all different, and kept in an LRU cache bounded both in
+entries and in (approximate) memory.
+'''
+
+from collections import OrderedDict
+from functools import wraps
+from decimal import Decimal
+from fractions import Fraction
+import sys
+
+
+# Types keyed on by value; equal values behave the same.
+_EXACT = frozenset({int, bool, str, Fraction})
+# Types keyed on by repr; equal values may not (signed zeros, exponents).
+_REPRESENTED = frozenset({float, complex, Decimal})
+# Per cache entry overhead, roughly: key tuple, LRU links, etc.
+_OVERHEAD = 200
+
+
+def freeze(values):
+    '''
+    Return values as a type-qualified, hashable tuple, or None if they can't
+    be.
+    '''
+    key = []
+    for value in values:
+        kind = type(value)
+        if kind in _EXACT:
+            key.append((kind, value))
+        elif kind in _REPRESENTED:
+            key.append((kind, repr(value)))
+        else:
+            return None
+    return tuple(key)
+
+
+class Memo:
+    '''
+    LRU cache of pure function results, with hit/miss statistics.
+    '''
+    MAXSIZE = 4096
+    MAXBYTES = 64 << 20
+
+    def __init__(self, maxsize=None, maxbytes=None):
+        self.maxsize = maxsize if maxsize is not None else type(self).MAXSIZE
+        self.maxbytes = maxbytes if maxbytes is not None \
+            else type(self).MAXBYTES
+        # Key: (result, size).
+        self._cache = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(function, args):
+        '''
+        Return type-qualified cache key, or None if args can't be keyed.
+        '''
+        key = freeze(args)
+        return None if key is None else (function,) + key
+
+    def _size(self, args, result):
+        return _OVERHEAD + sys.getsizeof(result) + \
+            sum(map(sys.getsizeof, args))
+
+    def call(self, function, *args):
+        '''
+        Return function(*args), from cache if possible.
+        '''
+        key = self._key(function, args)
+        if key is None:
+            return function(*args)
+        cache = self._cache
+        try:
+            result, _ = cache[key]
+        except KeyError:
+            pass
+        else:
+            cache.move_to_end(key)
+            self.hits += 1
+            return result
+        self.misses += 1
+        result = function(*args)
+        size = self._size(args, result)
+        if size > self.maxbytes:
+            return result
+        cache[key] = result, size
+        self.bytes += size
+        while len(cache) > self.maxsize or self.bytes > self.maxbytes:
+            _, (_, evicted) = cache.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+        return result
+
+    def wrap(self, function):
+        '''
+        Return memoized function.
+        '''
+        call = self.call
+
+        @wraps(function)
+        def memoized(*args):
+            return call(function, *args)
+        return memoized
+
+    @property
+    def hitrate(self):
+        calls = self.hits + self.misses
+        return self.hits / calls if calls else 0.0
+
+    def clear(self):
+        self._cache.clear()
+        self.bytes = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+    def __str__(self):
+        return ('hits: {} misses: {} hit rate: {:.1%} entries: {} '
+                'bytes: {} evictions: {}').format(
+                    self.hits, self.misses, self.hitrate, len(self),
+                    self.bytes, self.evictions)
+
+
+__all__ = (
+    'Memo',
+    'freeze',
+)
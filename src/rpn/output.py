@@ -0,0 +1,69 @@
+'''
+Machine output, buffered into large writes when nobody's watching.
+
+Printing value by value means a small write per p or P, at best. When output
+goes to a pipe or file, gather it up, and write it out a chunk at a time.
+'''
+
+import sys
+
+
+class Output:
+    '''
+    Text writer for machine output; optionally buffered.
+    '''
+    # Write out buffered output once there's this much of it.
+    BUFFER_SIZE = 1 << 16
+    # What's written; bytes, for binary subclasses.
+    EMPTY = ''
+
+    def __init__(self, stream=None, buffered=False, errors=None):
+        '''
+        :param stream: text stream to write to; sys.stdout, as it is at the
+            time, if None.
+        :param buffered: hold on to output until flushed, or there's enough.
+        :param errors: text stream for help, statistics, etc., if not the
+            machine's stderr.
+        '''
+        self.stream = stream
+        self.buffered = buffered
+        self.errors = errors
+        self._buffer = []
+        self._size = 0
+
+    def _stream(self):
+        return self.stream if self.stream is not None else sys.stdout
+
+    def write(self, text):
+        '''
+        Write text, or buffer it.
+        '''
+        if not self.buffered:
+            self._stream().write(text)
+            return
+        self._buffer.append(text)
+        self._size += len(text)
+        if self._size >= self.BUFFER_SIZE:
+            self.flush()
+
+    def flush(self):
+        '''
+        Write out anything buffered, and flush the stream.
+        '''
+        stream = self._stream()
+        if self._buffer:
+            stream.write(self.EMPTY.join(self._buffer))
+            self._buffer.clear()
+            self._size = 0
+        stream.flush()
+
+    def isatty(self):
+        try:
+            return self._stream().isatty()
+        except (AttributeError, ValueError):
+            return False
+
+
+__all__ = (
+    'Output',
+)
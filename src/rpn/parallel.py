@@ -0,0 +1,109 @@
+'''
+Run independent input lines in parallel, across worker processes.
+
+Each worker has its own machine, so this only makes sense for lines that don't
+depend on one another (e.g., that start by clearing the stack). Output comes
+back in input order, as soon as it's ready.
+'''
+
+from sys import stdout, stderr
+from collections import deque
+from contextlib import redirect_stdout
+from itertools import islice
+import multiprocessing
+import io
+
+from .util import RPNError
+from .machine import Machine
+from .lexer import Lexer
+
+
+# Worker process state.
+_machine = None
+_lexer = None
+
+
+def _initializer(verbose, guard, memo, linecache):
+    global _machine, _lexer
+    # Each worker with its own copy of the memo and line cache.
+    _machine = Machine(verbose=verbose, guard=guard, memo=memo,
+                       linecache=linecache)
+    _lexer = Lexer()
+
+
+def _evaluate(lines):
+    '''
+    Run batch of lines on this worker's machine.
+
+    Return, per line, what it printed, and the error it was aborted on.
+    '''
+    results = []
+    for line in lines:
+        output = io.StringIO()
+        error = None
+        with redirect_stdout(output):
+            try:
+                for groups in _lexer.feedables(line):
+                    _machine.feed(groups)
+            except RPNError as e:
+                error = e.args[0]
+        results.append((output.getvalue(), error))
+    return results
+
+
+class ParallelExecutor:
+    '''
+    Feed lines to a pool of machines, in batches, printing results in order.
+    '''
+    # Lines per batch sent to a worker; amortizes inter-process overhead.
+    BATCH_SIZE = 256
+    # Batches in flight per worker, bounding memory use on large inputs.
+    BACKLOG = 4
+
+    def __init__(self, jobs, verbose=None, guard=None, memo=None,
+                 linecache=None):
+        self.jobs = jobs
+        self.verbose = verbose
+        self.guard = guard
+        self.memo = memo
+        self.linecache = linecache
+
+    def _batches(self, lines):
+        lines = iter(lines)
+        while True:
+            batch = list(islice(lines, type(self).BATCH_SIZE))
+            if not batch:
+                return
+            yield batch
+
+    def results(self, lines):
+        '''
+        Yield (output, error) per line, in input order.
+        '''
+        with multiprocessing.Pool(self.jobs, _initializer,
+                                  (self.verbose, self.guard, self.memo,
+                                   self.linecache)) as pool:
+            pending = deque()
+            for batch in self._batches(lines):
+                pending.append(pool.apply_async(_evaluate, (batch,)))
+                while pending and \
+                        (pending[0].ready() or
+                         len(pending) >= self.jobs * type(self).BACKLOG):
+                    yield from pending.popleft().get()
+            while pending:
+                yield from pending.popleft().get()
+
+    def run(self, lines):
+        '''
+        Run lines, printing output and errors in input order.
+        '''
+        for output, error in self.results(lines):
+            stdout.write(output)
+            if error is not None:
+                stdout.flush()
+                print(error, file=stderr)
+
+
+__all__ = (
+    'ParallelExecutor',
+)
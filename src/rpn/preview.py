@@ -0,0 +1,174 @@
+'''
+Live preview of what the line being typed would leave on the stack.
+
+Runs on a sandboxed copy of the machine: nothing printed, no clipboard, no
+state files, no help. Machine state is checkpointed after every lexeme, so that
+each keystroke only reruns lexemes from the first one that changed, and a time
+budget keeps any one keystroke from lagging; whatever's left over is picked up
+again on the next one.
+'''
+
+from time import perf_counter
+
+from .util import RPNError
+from .machine import Machine
+from .guard import Guard
+from .lexer import Lexer
+from .state import MappedStack
+
+
+def _copy(value):
+    # Register stacks are mutated in place; everything else is replaced.
+    if isinstance(value, (list, MappedStack)):
+        return value.copy()
+    return value
+
+
+class _NoSelections:
+    '''
+    Refuse to touch the clipboard.
+    '''
+    def load(self, *args):
+        raise RPNError('No preview of clipboard')
+
+    store = load
+
+
+def _nofiles(*args):
+    raise RPNError('No preview of state files')
+
+
+class PreviewMachine(Machine):
+    '''
+    Machine with no side effects outside of itself.
+    '''
+    # Print to the terminal, whatever the output.
+    QUIET = {Machine.FUNCTIONS[key] for key in 'hVHM'}
+    # Read or write files.
+    FILES = {Machine.FUNCTIONS[key] for key in 'SL'}
+
+    def __init__(self, *args, **kwargs):
+        kwargs['selections'] = _NoSelections()
+        super().__init__(*args, **kwargs)
+
+    def _bind(self, opcode):
+        if opcode.function in type(self).QUIET:
+            return (lambda *args: None), opcode.arity
+        if opcode.function in type(self).FILES:
+            return _nofiles, opcode.arity
+        return super()._bind(opcode)
+
+    def printall(self, values, **kwargs):
+        pass
+
+    def state(self):
+        '''
+        Return snapshot of machine state.
+        '''
+        return (tuple(self.stack),
+                {name: _copy(value) for name, value in self.registers.items()},
+                self.ifmt, self.ofmt, self.precision, dict(self.macros))
+
+    def restore(self, state):
+        '''
+        Go back to snapshot.
+        '''
+        stack, registers, self.ifmt, self.ofmt, self.precision, macros = \
+            state
+        self.stack.clear()
+        self.stack.retype(self.ifmt)
+        self.stack.extend(stack)
+        self.registers = {name: _copy(value)
+                          for name, value in registers.items()}
+        # Macros are never changed, only replaced.
+        self.macros = dict(macros)
+        self._selectdispatch()
+
+
+class Preview:
+    '''
+    Preview stack top and depth of lines run on machine, incrementally.
+    '''
+    # Seconds of evaluation per preview, at most (give or take a lexeme).
+    BUDGET = 0.05
+    # Bits of any one result, at most; bigger ones aren't worth the wait.
+    MAXBITS = 1 << 20
+
+    def __init__(self, machine):
+        self.machine = machine
+        self.lexer = Lexer()
+        self.sandbox = PreviewMachine(guard=Guard(maxbits=self.MAXBITS))
+        self.reset()
+
+    def reset(self):
+        '''
+        Start over from machine's current state, e.g., at a new prompt.
+        '''
+        machine = self.machine
+        self.sandbox.restore((tuple(machine.stack), machine.registers,
+                              machine.ifmt, machine.ofmt, machine.precision,
+                              machine.macros))
+        self.base = self.sandbox.state()
+        # Lexemes run so far, and state after each.
+        self.lexemes = []
+        self.states = []
+
+    def _lex(self, line):
+        '''
+        Return (text, groups) of lexemes in line, up to any bad one.
+        '''
+        lexemes = []
+        try:
+            for match in self.lexer.lex(line):
+                if self.lexer.isfeedable(match):
+                    lexemes.append((match.group(0),
+                                    self.lexer.matchedgroups(match)))
+        except RPNError:
+            # Likely not done typing it.
+            pass
+        return lexemes
+
+    def preview(self, line):
+        '''
+        Return preview of line: stack depth and top, or error.
+        '''
+        lexemes = self._lex(line)
+        # Only rerun from first changed lexeme.
+        common = 0
+        for (text, _), previous in zip(lexemes, self.lexemes):
+            if text != previous:
+                break
+            common += 1
+        del self.lexemes[common:], self.states[common:]
+        sandbox = self.sandbox
+        sandbox.restore(self.states[-1] if self.states else self.base)
+        deadline = perf_counter() + self.BUDGET
+        for text, groups in lexemes[common:]:
+            try:
+                sandbox.feed(groups)
+            except RPNError as e:
+                return e.args[0]
+            except Exception as e:
+                return '{}: {}'.format(type(e).__name__, e)
+            self.lexemes.append(text)
+            self.states.append(sandbox.state())
+            # At least a lexeme further along every time.
+            if perf_counter() > deadline and \
+                    len(self.lexemes) < len(lexemes):
+                return self._show() + ' …'
+        return self._show()
+
+    def _show(self):
+        stack = self.sandbox.stack
+        if not stack:
+            return '[0]'
+        try:
+            top = self.sandbox._format(stack[-1])
+        except RPNError:
+            top = repr(stack[-1])
+        return '[{}] {}'.format(len(stack), top)
+
+
+__all__ = (
+    'Preview',
+)
@@ -0,0 +1,176 @@
+'''
+Per-operation profiling, and per-line latency, for slow batch jobs.
+
+Nothing here costs anything unless asked for: instrumenting a machine or lexer
+swaps timing wrappers in for their methods, on those instances only.
+'''
+
+from time import perf_counter_ns
+from collections import Counter
+import math
+import sys
+
+
+class Profiler:
+    '''
+    Collect call counts and times per operation, and latency per input line.
+    '''
+    # Latency histogram buckets per doubling; bounds percentile error to ~4%
+    # without keeping every latency around.
+    RESOLUTION = 16
+
+    def __init__(self):
+        # Operation: [calls, total ns, max ns].
+        self.operations = dict()
+        self.latencies = Counter()
+        self.lines = 0
+        self.slowest = 0
+
+    def record(self, key, elapsed):
+        '''
+        Record elapsed ns for a call of operation key.
+        '''
+        try:
+            stats = self.operations[key]
+        except KeyError:
+            stats = self.operations[key] = [0, 0, 0]
+        stats[0] += 1
+        stats[1] += elapsed
+        if elapsed > stats[2]:
+            stats[2] = elapsed
+
+    def recordline(self, elapsed):
+        '''
+        Record elapsed ns for running an entire line.
+        '''
+        self.lines += 1
+        self.latencies[self._bucket(elapsed)] += 1
+        if elapsed > self.slowest:
+            self.slowest = elapsed
+
+    def _bucket(self, elapsed):
+        return math.ceil(math.log2(max(elapsed, 1)) * self.RESOLUTION)
+
+    def _bound(self, bucket):
+        '''
+        Return upper bound of bucket, in ns.
+        '''
+        return 2 ** (bucket / self.RESOLUTION)
+
+    def percentile(self, p):
+        '''
+        Return (upper bound of) pth percentile line latency, in ns.
+        '''
+        if not self.lines:
+            return None
+        rank = p / 100 * self.lines
+        seen = 0
+        for bucket in sorted(self.latencies):
+            seen += self.latencies[bucket]
+            if seen >= rank:
+                return min(self._bound(bucket), self.slowest)
+        return self.slowest
+
+    def timelines(self, lines):
+        '''
+        Yield lines, timing how long each takes to run before the next is read.
+
+        Time spent waiting on input isn't counted.
+        '''
+        for line in lines:
+            start = perf_counter_ns()
+            yield line
+            self.recordline(perf_counter_ns() - start)
+
+    def instrument(self, machine, lexer=None):
+        '''
+        Time every lexeme fed to machine, and lexed by lexer, from now on.
+        '''
+        record = self.record
+        feed = machine.feed
+        printall = machine.printall
+
+        def timedfeed(groups):
+            if 'operator' in groups:
+                key = groups['operator']
+            elif 'apply' in groups:
+                top = machine.stack[-1] if machine.stack else None
+                key = '$ {}'.format(top) if isinstance(top, str) else '$'
+            elif 'number' in groups:
+                # Input conversion, mostly.
+                key = 'number'
+            else:
+                key = 'str'
+            start = perf_counter_ns()
+            try:
+                feed(groups)
+            finally:
+                record(key, perf_counter_ns() - start)
+
+        def timedprintall(*args, **kwargs):
+            # Output conversion, rounding, and I/O; part of p, f, etc. (print
+            # goes through printall too.)
+            start = perf_counter_ns()
+            try:
+                return printall(*args, **kwargs)
+            finally:
+                record('(print)', perf_counter_ns() - start)
+
+        machine.feed = timedfeed
+        machine.printall = timedprintall
+        if lexer is not None:
+            self._instrumentlexer(lexer)
+
+    def _instrumentlexer(self, lexer):
+        record = self.record
+        feedables = lexer.feedables
+
+        def timedfeedables(line):
+            lexemes = iter(feedables(line))
+            while True:
+                start = perf_counter_ns()
+                try:
+                    groups = next(lexemes, None)
+                finally:
+                    record('(lex)', perf_counter_ns() - start)
+                if groups is None:
+                    return
+                yield groups
+
+        lexer.feedables = timedfeedables
+
+    def report(self, file=None):
+        '''
+        Print operations, slowest in total first, and line latencies.
+
+        To stderr, by default.
+        '''
+        file = file or sys.stderr
+        print('{:>12} {:>10} {:>12} {:>10} {:>10}'.format(
+            'operation', 'calls', 'total ms', 'mean µs', 'max µs'), file=file)
+        for key, (calls, total, slowest) in sorted(
+                self.operations.items(), key=lambda item: -item[1][1]):
+            print('{:>12} {:10} {:12.3f} {:10.3f} {:10.3f}'.format(
+                key, calls, total / 1e6, total / calls / 1e3, slowest / 1e3),
+                file=file)
+        if not self.lines:
+            return
+        print('\nlines: {}  p50: {:.3f} µs  p99: {:.3f} µs  max: {:.3f} µs'
+              .format(self.lines, self.percentile(50) / 1e3,
+                      self.percentile(99) / 1e3, self.slowest / 1e3),
+              file=file)
+        # Histogram by doubling.
+        doublings = Counter()
+        for bucket, count in self.latencies.items():
+            doublings[-(-bucket // self.RESOLUTION)] += count
+        widest = max(doublings.values())
+        for doubling in sorted(doublings):
+            count = doublings[doubling]
+            print('{:>12} {:10} {}'.format(
+                '≤{:.3g} µs'.format(2 ** doubling / 1e3), count,
+                '#' * math.ceil(count / widest * 40)), file=file)
+
+
+__all__ = (
+    'Profiler',
+)
@@ -0,0 +1,192 @@
+'''
+Integers printed in binary, octal, hexadecimal, and (fast) decimal.
+
+str() of a huge int is quadratic, and refuses to go past
+sys.get_int_max_str_digits() digits anyway. Power of two bases convert in
+linear time, a slice of the int's bytes at a time. Decimal converts by divide
+and conquer: the int is split in halves by bits, recursively, and recombined
+in decimal arithmetic, whose multiplication is subquadratic (libmpdec), then
+split back into chunks of digits by powers of ten, which is cheap in decimal.
+Either way, digits come a chunk at a time, rather than all in one string.
+'''
+
+
+# Ints at least this many bits long are printed a chunk at a time.
+HUGE_BITS = 8192
+# Digits per chunk, roughly.
+CHUNK_DIGITS = 1 << 16
+
+_PREFIXES = {2: '0b', 8: '0o', 10: '', 16: '0x'}
+_SPECS = {2: 'b', 8: 'o', 16: 'x'}
+_BITS = {2: 1, 8: 3, 16: 4}
+# Ints up to this many bits convert to Decimal directly.
+_DIRECT_BITS = 1024
+
+
+def _powerdigits(n, base):
+    '''
+    Yield digits of non-negative int n in base, a power of two.
+    '''
+    bits = _BITS[base]
+    # Whole digits to each chunk: octal's three bits per digit line up on
+    # three byte boundaries, counting from the least significant end.
+    unit = 3 if base == 8 else 1
+    size = -(-max(n.bit_length(), 1) // (8 * unit)) * unit
+    data = n.to_bytes(size, 'big')
+    step = CHUNK_DIGITS * bits // 8 // unit * unit
+    spec = _SPECS[base]
+    for start in range(0, size, step):
+        piece = data[start:start + step]
+        text = format(int.from_bytes(piece, 'big'), spec)
+        if start:
+            yield text.zfill(len(piece) * 8 // bits)
+        else:
+            yield text
+
+
+def _context():
+    # Exact, however many digits.
+    from decimal import Context, MAX_PREC, MAX_EMAX, MIN_EMIN
+    return Context(prec=MAX_PREC, Emax=MAX_EMAX, Emin=MIN_EMIN)
+
+
+def todecimal(n, context=None):
+    '''
+    Return int n as an (exact) Decimal, in subquadratic time.
+    '''
+    from decimal import Decimal
+    context = context or _context()
+    powers = dict()
+
+    def power(bits):
+        # 2 ** bits, as a Decimal.
+        if bits <= _DIRECT_BITS:
+            return Decimal(1 << bits)
+        if bits not in powers:
+            half = bits >> 1
+            powers[bits] = context.multiply(power(half), power(bits - half))
+        return powers[bits]
+
+    def convert(n, bits):
+        if bits <= _DIRECT_BITS:
+            return Decimal(n)
+        half = bits >> 1
+        high = n >> half
+        low = n - (high << half)
+        return context.add(context.multiply(convert(high, bits - half),
+                                            power(half)),
+                           convert(low, half))
+
+    if n < 0:
+        return context.minus(convert(-n, (-n).bit_length()))
+    return convert(n, n.bit_length())
+
+
+def _split(d, digits, pad, context):
+    '''
+    Yield digits of non-negative integral Decimal d, of at most digits
+    digits, zero-padded to pad.
+    '''
+    from decimal import ROUND_DOWN
+    if digits <= CHUNK_DIGITS:
+        yield str(d).zfill(pad)
+        return
+    low_digits = digits // 2
+    high = context.scaleb(d, -low_digits).to_integral_value(
+        rounding=ROUND_DOWN, context=context)
+    low = context.subtract(d, context.scaleb(high, low_digits))
+    yield from _split(high, digits - low_digits, max(pad - low_digits, 0),
+                      context)
+    yield from _split(low, low_digits, low_digits, context)
+
+
+def _decimaldigits(n):
+    '''
+    Yield digits of non-negative int n in decimal.
+    '''
+    if n.bit_length() < HUGE_BITS:
+        yield str(n)
+        return
+    context = _context()
+    d = todecimal(n, context)
+    yield from _split(d, d.adjusted() + 1, 0, context)
+
+
+def digits(n, base=10):
+    '''
+    Yield int n in base (2, 8, 10 or 16), with sign and prefix, a chunk at
+    a time.
+    '''
+    n = int(n)
+    sign = '-' if n < 0 else ''
+    yield sign + _PREFIXES[base]
+    if base == 10:
+        yield from _decimaldigits(abs(n))
+    else:
+        yield from _powerdigits(abs(n), base)
+
+
+class Digits:
+    '''
+    Int as printed, in chunks; for ints too big to print all in one go.
+    '''
+    def __init__(self, n, base=10):
+        self.n = n
+        self.base = base
+
+    def __iter__(self):
+        return digits(self.n, self.base)
+
+    def __str__(self):
+        return ''.join(self)
+
+
+class _Radix(int):
+    '''
+    Int, printed in BASE.
+    '''
+    BASE = 10
+
+    def __new__(cls, value=0):
+        if isinstance(value, str):
+            return super().__new__(cls, value, cls.BASE)
+        return super().__new__(cls, value)
+
+    def __round__(self, ndigits=None):
+        return type(self)(round(int(self), ndigits))
+
+    def __str__(self):
+        return ''.join(digits(self, type(self).BASE))
+
+    __repr__ = __str__
+
+
+class Bin(_Radix):
+    '''
+    Int, in binary.
+    '''
+    BASE = 2
+
+
+class Oct(_Radix):
+    '''
+    Int, in octal.
+    '''
+    BASE = 8
+
+
+class Hex(_Radix):
+    '''
+    Int, in hexadecimal.
+    '''
+    BASE = 16
+
+
+__all__ = (
+    'Bin',
+    'Oct',
+    'Hex',
+    'Digits',
+    'digits',
+    'todecimal',
+)
@@ -0,0 +1,235 @@
+'''
+Machine-readable output: a record per p, P or f, rather than text.
+
+Every p and P writes a record of one value, and f a record of the whole stack,
+top first, same order as it prints. Values are converted by the output format,
+and rounded to the precision, first, same as printed; just never formatted,
+for something else to parse back.
+
+ndjson: a JSON array per line, of values tagged by type, e.g.,
+[{"float":1.5},{"int":3},{"decimal":"0.10"}]. Vectors are tagged "vector",
+holding their (tagged) elements. Non-finite floats are strings ("nan", "inf",
+"-inf"), as JSON has no such numbers.
+
+f64le, i64le: binary; a record is its number of values, as an unsigned 64-bit
+int, then the values, as doubles or signed 64-bit ints; all little-endian. A
+value per stack entry, so vectors (u them first), as well as values that won't
+fit (strings, non-integral values as i64le, etc.), are an error, and nothing's
+written.
+'''
+
+from array import array
+import json
+import math
+import struct
+import sys
+
+from .util import RPNError
+from .output import Output
+from .vector import Vector
+from .radix import HUGE_BITS, digits
+
+
+_COUNT = struct.Struct('<Q')
+
+
+def _converted(value, ofmt, precision):
+    '''
+    Return value converted by ofmt, and rounded to precision, as printed.
+    '''
+    try:
+        value = ofmt(value)
+        if precision is not None:
+            value = round(value, precision)
+    except Exception as e:
+        raise RPNError('Cannot convert {}'.format(value), e)
+    return value
+
+
+def _float(value):
+    if math.isfinite(value):
+        return repr(value)
+    return '"{}"'.format(value)
+
+
+def _int(value):
+    if value.bit_length() < HUGE_BITS:
+        return str(int(value))
+    return ''.join(digits(value))
+
+
+# Tag and JSON of values by type, looked up by name, so as not to import
+# decimal, etc., just to check.
+_TAGS = {
+    ('builtins', 'NoneType'): lambda value: ('none', 'null'),
+    ('builtins', 'bool'): lambda value: ('bool', json.dumps(value)),
+    ('builtins', 'int'): lambda value: ('int', _int(value)),
+    ('builtins', 'float'): lambda value: ('float', _float(value)),
+    ('builtins', 'complex'): lambda value: (
+        'complex', '[{},{}]'.format(_float(value.real), _float(value.imag))),
+    ('builtins', 'str'): lambda value: ('str', json.dumps(value)),
+    ('decimal', 'Decimal'): lambda value: ('decimal', json.dumps(str(value))),
+    ('fractions', 'Fraction'): lambda value: (
+        'fraction', json.dumps(str(value))),
+    ('datetime', 'datetime'): lambda value: (
+        'datetime', json.dumps(value.isoformat())),
+    ('datetime', 'time'): lambda value: (
+        'time', json.dumps(value.isoformat())),
+}
+
+
+def _object(value):
+    return 'object', json.dumps(str(value))
+
+
+# Same, by type, as looked up.
+_TAGGERS = dict()
+
+
+def _tagged(value):
+    '''
+    Return tag and JSON text of value, tagged by its nearest known type.
+    '''
+    cls = type(value)
+    tagger = _TAGGERS.get(cls)
+    if tagger is None:
+        for base in cls.__mro__:
+            tagger = _TAGS.get((base.__module__, base.__qualname__))
+            if tagger is not None:
+                break
+        else:
+            tagger = _object
+        _TAGGERS[cls] = tagger
+    return tagger(value)
+
+
+class JSONOutput(Output):
+    '''
+    Writer of records as newline-delimited JSON arrays of tagged values.
+    '''
+    def _value(self, value, ofmt, precision):
+        if isinstance(value, Vector):
+            return '{{"vector":[{}]}}'.format(','.join(
+                self._value(item, ofmt, precision) for item in value))
+        value = _converted(value, ofmt, precision)
+        return '{{"{}":{}}}'.format(*_tagged(value))
+
+    def record(self, values, ofmt, precision=None):
+        '''
+        Return values, converted by ofmt, and rounded to precision, as a line.
+        '''
+        if ofmt is float and precision is None:
+            values = list(values)
+            if set(map(type, values)) <= {float} and \
+                    all(map(math.isfinite, values)):
+                # Typically: floats, all formatted in one go.
+                return '[{}]\n'.format(','.join(
+                    map('{{"float":{!r}}}'.format, values)))
+        return '[{}]\n'.format(','.join(
+            self._value(value, ofmt, precision) for value in values))
+
+    def writerecord(self, values, ofmt, precision=None):
+        '''
+        Write values as a record.
+        '''
+        self.write(self.record(values, ofmt, precision))
+
+
+class BinaryOutput(Output):
+    '''
+    Writer of records as packed 64-bit little-endian values, count first.
+    '''
+    EMPTY = b''
+    # Array typecode, and what converts to it as is.
+    TYPECODE = 'd'
+    NATIVE = float
+
+    def _stream(self):
+        if self.stream is not None:
+            return self.stream
+        return sys.stdout.buffer
+
+    def _scalar(self, value):
+        '''
+        Return value, converted to what TYPECODE packs, or raise RPNError.
+        '''
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise RPNError('Not a number: {!r}'.format(value)) from None
+        except OverflowError:
+            raise RPNError('Out of range: too large for a double') from None
+
+    def _scalars(self, values, ofmt, precision):
+        for value in values:
+            if isinstance(value, Vector):
+                # Count would no longer match stack entries.
+                raise RPNError('Cannot write vector as a binary record; '
+                               'unpack it first')
+            yield self._scalar(_converted(value, ofmt, precision))
+
+    def record(self, values, ofmt, precision=None):
+        '''
+        Return values, converted by ofmt, and rounded to precision, packed.
+        '''
+        if not isinstance(values, (list, array)):
+            values = list(values)
+        packed = None
+        if ofmt is type(self).NATIVE and precision is None:
+            # Typically: floats, packed in one go, straight off the stack.
+            try:
+                packed = array(self.TYPECODE, values)
+            except (TypeError, OverflowError):
+                pass
+        if packed is None:
+            try:
+                packed = array(self.TYPECODE,
+                               self._scalars(values, ofmt, precision))
+            except OverflowError:
+                # Ints, as i64le.
+                raise RPNError('Out of range: over 64 bits') from None
+        if sys.byteorder == 'big':
+            packed.byteswap()
+        return _COUNT.pack(len(packed)) + packed.tobytes()
+
+    def writerecord(self, values, ofmt, precision=None):
+        '''
+        Write values as a record.
+        '''
+        self.write(self.record(values, ofmt, precision))
+
+
+class IntOutput(BinaryOutput):
+    '''
+    Writer of records as packed signed 64-bit ints.
+    '''
+    TYPECODE = 'q'
+    NATIVE = int
+
+    def _scalar(self, value):
+        if isinstance(value, int):
+            return value
+        try:
+            integral = int(value)
+        except (TypeError, ValueError, OverflowError):
+            raise RPNError('Not an integer: {!r}'.format(value)) from None
+        if integral != value:
+            raise RPNError('Not an integer: {!r}'.format(value))
+        return integral
+
+
+# Output classes, by --output-format; text, as is, for completeness.
+OUTPUTS = {
+    'text': Output,
+    'ndjson': JSONOutput,
+    'f64le': BinaryOutput,
+    'i64le': IntOutput,
+}
+
+
+__all__ = (
+    'JSONOutput',
+    'BinaryOutput',
+    'IntOutput',
+    'OUTPUTS',
+)
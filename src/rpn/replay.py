@@ -0,0 +1,232 @@
+'''
+Whole-line result cache: replay lines run before, rather than run them again.
+
+A line whose outcome only depends on its own lexemes, the values it takes off
+the stack, and the machine's formats and precision (no registers, clipboard,
+macros, or rotating or printing the whole stack) is looked up by just those.
+On a hit, the values it took are popped (or the stack cleared, if it clears
+it), the values it left pushed, and whatever it printed written out again,
+without running any of it.
+
+How deep a line reads into the stack, and how many values it leaves there,
+are worked out from its lexemes alone, once per line; and lines are only
+lexed the once, too, which is most of what replaying saves.
+'''
+
+from collections import OrderedDict
+
+from .util import RPNError
+from .memo import freeze
+
+
+# Machine functions safe to replay, by stack effect: values read off the top
+# of the stack, and values left in their place.
+_EFFECTS = {
+    'p': (1, 1),
+    'P': (1, 0),
+    'd': (1, 2),
+    'r': (2, 2),
+    'I': (0, 1),
+    'O': (0, 1),
+    'K': (0, 1),
+}
+
+
+def _top(stack, n):
+    '''
+    Return top n values of stack, in stack order.
+    '''
+    return [stack[i] for i in range(len(stack) - n, len(stack))]
+
+
+class _Recorder:
+    '''
+    Output writing through, and keeping a copy of what's written, up to limit.
+    '''
+    def __init__(self, output, limit):
+        self.output = output
+        self.limit = limit
+        self.empty = getattr(output, 'EMPTY', '')
+        if hasattr(output, 'record'):
+            # Machine-readable records; kept a copy of, same as text.
+            self.writerecord = self._writerecord
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.output.write(text)
+        self.size += len(text)
+        if self.size <= self.limit:
+            self.parts.append(text)
+
+    def _writerecord(self, values, ofmt, precision=None):
+        self.write(self.output.record(values, ofmt, precision))
+
+    def __getattr__(self, name):
+        # flush, isatty, etc.
+        return getattr(self.output, name)
+
+
+class LineCache:
+    '''
+    LRU cache of whole lines' stack effects and output, with hit statistics.
+    '''
+    MAXSIZE = 4096
+    # Characters of output per line, at most, worth keeping.
+    MAXOUTPUT = 1 << 16
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize if maxsize is not None else type(self).MAXSIZE
+        # Key: (values left, output).
+        self._cache = OrderedDict()
+        # Line text: (lexemes, normalized, effect), effect being (values read,
+        # values left, whether it clears the stack), or None if not
+        # replayable.
+        self._lines = dict()
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _effect(machine, lexemes):
+        '''
+        Return how many values lexemes read off the stack, how many they
+        leave in their place, and whether they clear it first; None if they
+        can't be replayed.
+        '''
+        depth = reads = 0
+        cleared = False
+        previous = dict()
+        for groups in lexemes:
+            if 'operator' in groups:
+                operator = groups['operator']
+                if operator == 'c':
+                    # Whatever's below is gone; no need to know what it was.
+                    depth = 0
+                    cleared = True
+                    previous = groups
+                    continue
+                elif operator in machine.FUNCTIONS:
+                    effect = _EFFECTS.get(operator)
+                    if effect is None:
+                        return None
+                    popped, pushed = effect
+                else:
+                    popped, pushed = machine.operators[operator][1], 1
+            elif 'apply' in groups:
+                # Named right there in the line; never a macro, then.
+                name = previous.get('__str__')
+                if name is None or name not in machine.functions:
+                    return None
+                function, arity = machine.functions[name]
+                if getattr(function, '__self__', None) is machine:
+                    # Reads as deep as the stack says (e.g., reductions).
+                    return None
+                popped, pushed = arity + 1, 1
+            else:
+                popped, pushed = 0, 1
+            if popped > depth:
+                if cleared:
+                    # Bound to fail.
+                    return None
+                reads += popped - depth
+                depth = popped
+            depth += pushed - popped
+            previous = groups
+        return reads, depth, cleared
+
+    def _lex(self, machine, lexer, text):
+        '''
+        Return lexemes of line text, normalized, and their stack effect.
+        '''
+        fed = []
+        try:
+            for groups in lexer.feedables(text):
+                fed.append(groups)
+        except RPNError:
+            # Run up to whatever doesn't lex, same as ever.
+            for groups in fed:
+                machine.feed(groups)
+            raise
+        lines = self._lines
+        if len(lines) >= self.maxsize:
+            lines.clear()
+        line = tuple(tuple(groups.items()) for groups in fed)
+        lexed = lines[text] = fed, line, self._effect(machine, fed)
+        return lexed
+
+    def run(self, machine, lexer, text):
+        '''
+        Feed line text, as lexed by lexer, to machine, or replay it if run
+        before.
+        '''
+        try:
+            fed, line, effect = self._lines[text]
+        except KeyError:
+            fed, line, effect = self._lex(machine, lexer, text)
+        stack = machine.stack
+        values = None
+        if effect is not None and effect[0] <= len(stack):
+            reads, leaves, cleared = effect
+            values = freeze(_top(stack, reads))
+        if values is None:
+            self.uncacheable += 1
+            for groups in fed:
+                machine.feed(groups)
+            return
+        key = (line, machine.ifmt, machine.ofmt, machine.precision, values)
+        cache = self._cache
+        try:
+            left, text = cache[key]
+        except KeyError:
+            pass
+        else:
+            cache.move_to_end(key)
+            self.hits += 1
+            if cleared:
+                stack.clear()
+            elif reads:
+                stack.popn(reads)
+            stack.extend(left)
+            if text:
+                machine.output.write(text)
+            return
+        self.misses += 1
+        depth = leaves if cleared else len(stack) - reads + leaves
+        recorder = machine.output = _Recorder(machine.output, self.MAXOUTPUT)
+        try:
+            for groups in fed:
+                machine.feed(groups)
+        finally:
+            machine.output = recorder.output
+        if len(stack) != depth or recorder.size > self.MAXOUTPUT:
+            return
+        cache[key] = tuple(_top(stack, leaves)), \
+            recorder.empty.join(recorder.parts)
+        while len(cache) > self.maxsize:
+            cache.popitem(last=False)
+            self.evictions += 1
+
+    @property
+    def hitrate(self):
+        lines = self.hits + self.misses + self.uncacheable
+        return self.hits / lines if lines else 0.0
+
+    def clear(self):
+        self._cache.clear()
+        self._lines.clear()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def __str__(self):
+        return ('hits: {} misses: {} uncacheable: {} hit rate: {:.1%} '
+                'entries: {} evictions: {}').format(
+                    self.hits, self.misses, self.uncacheable, self.hitrate,
+                    len(self), self.evictions)
+
+
+__all__ = (
+    'LineCache',
+)
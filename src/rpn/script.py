@@ -0,0 +1,169 @@
+'''
+Scripts, lexed once: cached on disk, pre-lexed, like .pyc files are compiled.
+
+Running a script lexes it, and saves every distinct line's lexemes (and
+error, for lines that don't lex) to __rpncache__/SCRIPT.lexed next to it, or
+if that can't be written, to ~/.cache/rpn. Later runs feed the machine
+straight from there, never touching the lexer's regex.
+
+The cache file starts with a header holding digests of the script's contents,
+of the grammar (lexer pattern and flags, operator table, and cache format
+version), and of the rest of the file; then the lexemes of each distinct
+line, in order, marshalled. If any digest doesn't match, or the file is
+unreadable, the script is just lexed again, and the cache rewritten.
+'''
+
+from hashlib import sha256
+from struct import Struct
+import marshal
+import os
+
+from .util import RPNError
+from .machine import Machine
+from .lexer import Lexer
+
+
+MAGIC = b'RPNLEXED'
+# Of how lexemes are cached, and of what the lexer hands over; bump if either
+# changes without the grammar itself changing.
+VERSION = 1
+# Magic, version, and digests of script, grammar and lexemes.
+_HEADER = Struct('<8sI4x32s32s32s')
+CACHE_DIR = '~/.cache/rpn'
+
+
+def _grammar():
+    '''
+    Return digest of everything lexing depends on besides the script itself.
+    '''
+    grammar = '\0'.join([str(VERSION), Lexer.LEXEME, str(Lexer.FLAGS),
+                         ''.join(sorted(Machine.OPERATORS))])
+    return sha256(grammar.encode()).digest()
+
+
+def _paths(path):
+    '''
+    Yield where script at path might have its lexemes cached, best first.
+    '''
+    path = os.path.abspath(path)
+    directory, name = os.path.split(path)
+    yield os.path.join(directory, '__rpncache__', name + '.lexed')
+    yield os.path.join(os.path.expanduser(CACHE_DIR),
+                       sha256(path.encode()).hexdigest() + '.lexed')
+
+
+class Script(Lexer):
+    '''
+    Lexer for the lines of one script file; pre-lexed, and cached on disk.
+    '''
+    def __init__(self, path):
+        '''
+        Read script at path, lexemes and all, from cache if up to date.
+        '''
+        self.path = path
+        with open(path, 'rb') as file:
+            data = file.read()
+        self.lines = data.decode().splitlines()
+        digest = sha256(data).digest()
+        grammar = _grammar()
+        distinct = dict.fromkeys(self.lines)
+        for cache in _paths(path):
+            lexed = self._load(cache, digest, grammar)
+            if isinstance(lexed, list) and len(lexed) == len(distinct):
+                # Line: (lexemes, error message or None).
+                self.lexed = dict(zip(distinct, lexed))
+                self.cache = cache
+                return
+        self.lexed = self._lex(distinct)
+        self.cache = None
+        payload = marshal.dumps(list(self.lexed.values()))
+        header = _HEADER.pack(MAGIC, VERSION, digest, grammar,
+                              sha256(payload).digest())
+        for cache in _paths(path):
+            try:
+                self._save(cache, header + payload)
+            except OSError:
+                continue
+            self.cache = cache
+            break
+
+    @staticmethod
+    def _load(cache, digest, grammar):
+        '''
+        Return lexemes cached for script, or None if missing, stale or bad.
+        '''
+        try:
+            with open(cache, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return None
+        if len(data) < _HEADER.size:
+            return None
+        magic, version, script, lexer, lexemes = \
+            _HEADER.unpack_from(data)
+        payload = memoryview(data)[_HEADER.size:]
+        if (magic, version, script, lexer) != \
+                (MAGIC, VERSION, digest, grammar) or \
+                sha256(payload).digest() != lexemes:
+            return None
+        try:
+            return marshal.loads(payload)
+        except (ValueError, EOFError, TypeError):
+            return None
+
+    @staticmethod
+    def _save(cache, data):
+        '''
+        Write cache file, atomically.
+        '''
+        os.makedirs(os.path.dirname(cache), exist_ok=True)
+        temporary = '{}.{}.saving'.format(cache, os.getpid())
+        try:
+            with open(temporary, 'wb') as file:
+                file.write(data)
+            os.replace(temporary, cache)
+        except BaseException:
+            try:
+                os.unlink(temporary)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def _lex(self, lines):
+        '''
+        Return lexemes of every line, and error, if any.
+        '''
+        lexed = dict()
+        feedables = super().feedables
+        for line in lines:
+            lexemes = []
+            try:
+                for groups in feedables(line):
+                    lexemes.append(groups)
+            except RPNError as e:
+                lexed[line] = lexemes, e.args[0]
+            else:
+                lexed[line] = lexemes, None
+        return lexed
+
+    def feedables(self, line):
+        '''
+        Yield matched groups of every lexeme in line, as lexed before.
+        '''
+        try:
+            lexemes, error = self.lexed[line]
+        except KeyError:
+            # Not from the script after all.
+            yield from super().feedables(line)
+            return
+        yield from lexemes
+        if error is not None:
+            raise RPNError(error)
+
+    def __iter__(self):
+        return iter(self.lines)
+
+
+__all__ = (
+    'Script',
+)
@@ -0,0 +1,152 @@
+'''
+Clipboard (X11 selection) registers, cached, and stored in the background.
+
+Every load or store used to fork and exec xclip, and wait for it. Loads are now
+cached for a short while, and stores handed off to a background thread, which
+only ever writes out the latest value if several pile up.
+'''
+
+from time import monotonic
+import threading
+import atexit
+
+from .util import RPNError
+
+
+class XclipBackend:
+    '''
+    X11 selections, through xclip.
+    '''
+    def load(self, selection):
+        import subprocess
+        with subprocess.Popen(['xclip',
+                               '-selection', selection,
+                               '-o'], stdout=subprocess.PIPE) as xclip:
+            return xclip.stdout.read().decode()
+
+    def store(self, selection, data):
+        import subprocess
+        with subprocess.Popen(['xclip',
+                               '-selection', selection],
+                              stdin=subprocess.PIPE) as xclip:
+            xclip.stdin.write(data.encode())
+
+
+class MemoryBackend:
+    '''
+    In-memory stand-in for X11 selections, e.g., for testing without X11.
+    '''
+    def __init__(self):
+        self.selections = dict()
+        # Calls that would have been a subprocess each.
+        self.loads = 0
+        self.stores = 0
+
+    def load(self, selection):
+        self.loads += 1
+        return self.selections.get(selection, '')
+
+    def store(self, selection, data):
+        self.stores += 1
+        self.selections[selection] = data
+
+
+class Selections:
+    '''
+    Selections, through a backend; cached on load, stored asynchronously.
+    '''
+    # Seconds a loaded (or stored) value is trusted to still be current.
+    TTL = 1.0
+
+    def __init__(self, backend=None, ttl=None):
+        self.backend = backend if backend is not None else XclipBackend()
+        self.ttl = ttl if ttl is not None else type(self).TTL
+        # Selection: (data, when it was known to be current).
+        self._cache = dict()
+        # Selection: latest data not yet handed to the backend.
+        self._pending = dict()
+        self._storing = False
+        self._error = None
+        self._condition = threading.Condition()
+        self._worker = None
+
+    def load(self, selection):
+        '''
+        Return selection's contents; cached, or from the backend.
+        '''
+        self._raise()
+        with self._condition:
+            if selection in self._pending:
+                return self._pending[selection]
+            cached = self._cache.get(selection)
+        if cached is not None and monotonic() - cached[1] < self.ttl:
+            return cached[0]
+        data = self.backend.load(selection)
+        self._cache[selection] = data, monotonic()
+        return data
+
+    def store(self, selection, data):
+        '''
+        Store data (as text) into selection, in the background.
+        '''
+        self._raise()
+        data = str(data)
+        with self._condition:
+            self._pending[selection] = data
+            self._cache[selection] = data, monotonic()
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work,
+                                                name='rpn-selections',
+                                                daemon=True)
+                self._worker.start()
+                # Don't lose the last stores on the way out.
+                atexit.register(self.wait)
+            self._condition.notify_all()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                # Only the latest value per selection is still pending.
+                pending, self._pending = self._pending, dict()
+                self._storing = True
+            try:
+                for selection, data in pending.items():
+                    self.backend.store(selection, data)
+            except Exception as e:
+                self._error = e
+            finally:
+                with self._condition:
+                    self._storing = False
+                    self._condition.notify_all()
+
+    def wait(self):
+        '''
+        Wait for all stores so far to be done.
+        '''
+        with self._condition:
+            while self._pending or self._storing:
+                self._condition.wait()
+
+    def flush(self):
+        '''
+        Wait for all stores so far to be done; raise if any failed.
+        '''
+        self.wait()
+        self._raise()
+
+    def _raise(self):
+        '''
+        Report failed background store, once.
+        '''
+        error, self._error = self._error, None
+        if error is not None:
+            raise RPNError('Cannot store selection', error)
+
+
+__all__ = (
+    'Selections',
+    'XclipBackend',
+    'MemoryBackend',
+)
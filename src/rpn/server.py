@@ -0,0 +1,169 @@
+'''
+RPN daemon, serving machine sessions over a Unix socket.
+
+Pay for startup once, rather than per calculation. Every connection gets its
+own machine, and sends it lines to run; it may send as many as it likes ahead
+of reading results (pipelining). Results come back in order, one framed
+response per line:
+
+    <output length> <error length>\\n<output><error>
+
+lengths in bytes of UTF-8. Help and statistics (h, V, H, M) come back as part
+of the error; the clipboard registers are refused. Lines run on a pool of
+threads, so that a slow one doesn't hold up other sessions' reads and writes.
+A session not reading its results stops having its lines read, all the way
+back to the client (backpressure).
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import io
+
+from .util import RPNError
+from .machine import Machine
+from .output import Output
+from .lexer import Lexer
+
+
+class _NoSelections:
+    '''
+    Refuse to touch the clipboard; it'd be the daemon host's, not the
+    client's.
+    '''
+    def load(self, *args):
+        raise RPNError('No clipboard in daemon sessions')
+
+    store = load
+
+
+def _frame(output, error):
+    output, error = output.encode(), error.encode()
+    return b'%d %d\n' % (len(output), len(error)) + output + error
+
+
+class Session:
+    '''
+    Connection's own machine; runs lines, returns what they print.
+    '''
+    def __init__(self, verbose=None, guard=None):
+        '''
+        :param guard: Guard against operations too costly to run, shared by
+            sessions; one line holding up the lot is all it takes otherwise.
+        '''
+        self.stream = io.StringIO()
+        self.errors = io.StringIO()
+        self.machine = Machine(verbose=verbose,
+                               output=Output(self.stream, buffered=True,
+                                             errors=self.errors),
+                               selections=_NoSelections(),
+                               guard=guard)
+        self.lexer = Lexer()
+
+    def run(self, line):
+        '''
+        Run line; return its output, and error, if any.
+        '''
+        error = ''
+        try:
+            for groups in self.lexer.feedables(line):
+                self.machine.feed(groups)
+        except RPNError as e:
+            error = '{}\n'.format(e.args[0])
+        except Exception as e:
+            # Don't take the session down with it, unlike the CLI.
+            error = '{}: {}\n'.format(type(e).__name__, e)
+        self.machine.output.flush()
+        output = self.stream.getvalue()
+        error = self.errors.getvalue() + error
+        for stream in self.stream, self.errors:
+            stream.seek(0)
+            stream.truncate()
+        return output, error
+
+    def runall(self, lines):
+        '''
+        Run lines (bytes); return their framed results.
+        '''
+        return b''.join(_frame(*self.run(line.decode(errors='replace')))
+                        for line in lines)
+
+
+class Server:
+    '''
+    Serve a session per connection on Unix socket at path.
+    '''
+    # Longest line accepted, in bytes.
+    LIMIT = 1 << 24
+    # Read at most this much pipelined input at a time.
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, path, verbose=None, workers=None, guard=None):
+        self.path = path
+        self.verbose = verbose
+        self.guard = guard
+        self.executor = ThreadPoolExecutor(workers,
+                                           thread_name_prefix='rpn-session')
+
+    async def _serve(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        session = Session(self.verbose, self.guard)
+        # Partial line read so far.
+        pending = b''
+        try:
+            while True:
+                chunk = await reader.read(type(self).CHUNK_SIZE)
+                if chunk:
+                    *lines, pending = (pending + chunk).split(b'\n')
+                else:
+                    lines, pending = [pending] if pending else [], b''
+                if len(pending) > type(self).LIMIT:
+                    writer.write(_frame('', 'Line too long\n'))
+                    break
+                if lines:
+                    # Everything pipelined so far, in one go.
+                    results = await loop.run_in_executor(
+                        self.executor, session.runall, lines)
+                    writer.write(results)
+                    # Stop reading while the client isn't reading.
+                    await writer.drain()
+                if not chunk:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, started=None):
+        '''
+        Serve forever.
+
+        :param started: event set once listening, if any; e.g., a
+            threading.Event, for whoever's waiting in another thread.
+        '''
+        server = await asyncio.start_unix_server(self._serve,
+                                                 path=self.path,
+                                                 limit=type(self).LIMIT)
+        if started is not None:
+            started.set()
+        async with server:
+            await server.serve_forever()
+
+    def run(self):
+        '''
+        Serve forever, cleaning up socket on the way out.
+        '''
+        import os
+        try:
+            asyncio.run(self.serve())
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+
+__all__ = (
+    'Server',
+    'Session',
+)
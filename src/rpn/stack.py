@@ -0,0 +1,194 @@
+'''
+Machine stack, packed into a typed array while it can be.
+
+In float (or int) input format, almost everything on the stack is a float (or
+machine-sized int). An array of those takes a fraction of the memory of
+a deque of boxed objects. The first value of any other type (complex, Decimal,
+str, a huge int, etc.) transparently promotes the stack to a deque, for
+good, or until it's cleared.
+'''
+
+from collections import deque
+from array import array
+
+
+class Stack:
+    '''
+    Deque-like stack, backed by an array('d') or array('q') when possible.
+    '''
+    # Python types that pack into arrays exactly.
+    TYPECODES = {
+        float: 'd',
+        int: 'q',
+    }
+
+    def __init__(self, values=(), type=float):
+        '''
+        :param type: type to pack values of, if any.
+        '''
+        self.retype(type)
+        self.extend(values)
+
+    def _use(self, items):
+        '''
+        Switch over to new backing items.
+        '''
+        self._items = items
+        # Straight to C where there's nothing to check.
+        self.pop = items.pop
+        if isinstance(items, deque):
+            self.append = items.append
+            self.extend = items.extend
+            self.rotate = items.rotate
+        else:
+            for name in 'append', 'extend', 'rotate':
+                self.__dict__.pop(name, None)
+
+    def retype(self, type):
+        '''
+        Pack values of type from now on, if it can be; promote otherwise.
+        '''
+        self.type = type
+        typecode = self.TYPECODES.get(type)
+        items = getattr(self, '_items', ())
+        if isinstance(items, array) and items.typecode == typecode:
+            return
+        elif typecode is not None and not items:
+            self._use(array(typecode))
+        else:
+            self._promote()
+
+    def _promote(self):
+        if not isinstance(getattr(self, '_items', None), deque):
+            self._use(deque(getattr(self, '_items', ())))
+
+    @property
+    def packed(self):
+        '''
+        True if backed by an array.
+        '''
+        return isinstance(self._items, array)
+
+    @property
+    def typecode(self):
+        '''
+        Typecode of backing array, if packed; None otherwise.
+        '''
+        return self._items.typecode if self.packed else None
+
+    def view(self):
+        '''
+        Return memoryview of backing array; must be packed.
+        '''
+        return memoryview(self._items)
+
+    def frombuffer(self, typecode, buffer):
+        '''
+        Extend with values packed (as typecode) in buffer.
+        '''
+        if self.typecode == typecode:
+            self._items.frombytes(memoryview(buffer).cast('B'))
+        else:
+            self.extend(memoryview(buffer).cast('B').cast(typecode).tolist())
+
+    def append(self, value):
+        if type(value) is self.type:
+            try:
+                return self._items.append(value)
+            except OverflowError:
+                pass
+        self._promote()
+        self._items.append(value)
+
+    def extend(self, values):
+        values = tuple(values)
+        packable = self.type
+        for value in values:
+            if type(value) is not packable:
+                break
+        else:
+            try:
+                return self._items.extend(values)
+            except OverflowError:
+                pass
+        self._promote()
+        self._items.extend(values)
+
+    def popn(self, n):
+        '''
+        Pop n values, returned in stack order (topmost last); as a list, or
+        as an array slice if packed.
+
+        Raise IndexError, popping nothing, if there aren't that many.
+        '''
+        items = self._items
+        if n > len(items):
+            raise IndexError('pop from too short a stack')
+        elif n == 1:
+            return [items.pop()]
+        elif n == 2:
+            top = items.pop()
+            return [items.pop(), top]
+        elif isinstance(items, array):
+            start = len(items) - n
+            values = items[start:]
+            del items[start:]
+            return values
+        values = [items.pop() for _ in range(n)]
+        values.reverse()
+        return values
+
+    def rotate(self, n=1):
+        '''
+        Rotate n steps to the right, like deque.rotate.
+        '''
+        items = self._items
+        if not items:
+            return
+        n %= len(items)
+        if n:
+            items[:] = items[-n:] + items[:-n]
+
+    def clear(self):
+        '''
+        Empty stack, packing values again if it was promoted.
+        '''
+        if self.type in self.TYPECODES:
+            self._use(array(self.TYPECODES[self.type]))
+        else:
+            self._items.clear()
+
+    def replace(self, other):
+        '''
+        Take over other stack's values and type, in place, without copying.
+        '''
+        self.type = other.type
+        self._use(other._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __bool__(self):
+        return bool(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __reversed__(self):
+        return reversed(self._items)
+
+    def __eq__(self, other):
+        if isinstance(other, Stack):
+            other = other._items
+        return list(self._items) == list(other)
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, list(self._items))
+
+
+__all__ = (
+    'Stack',
+)
@@ -0,0 +1,382 @@
+'''
+Machine state (stack, registers, formats, precision), saved to and loaded from
+a compact binary file.
+
+Layout: a header (magic, version), then the input and output formats, the
+precision, the stack, and the registers, each a tagged value:
+
+    N                               None
+    b <u8>                          bool
+    i <u32 length> <bytes>          int, two's complement, little-endian
+    r <u8 base> <int>               int printed in base (Hex, Oct, Bin)
+    f <f64>                         float
+    c <f64> <f64>                   complex
+    D <str>                         Decimal, as its (exact) str
+    F <int> <int>                   Fraction
+    s <u32 length> <UTF-8>          str
+    L <u64 count> <values>          list (register stack)
+    A <typecode> <u64 count> <pad>  array of f64 or i64, 8-byte aligned
+    V <L or A>                      vector
+
+All numbers little-endian. Homogeneous float (or 64-bit int) stacks are stored
+as raw arrays, so that loading them is a copy at most; register stacks are not
+even copied, but popped straight out of a memory map of the file until pushed
+onto.
+'''
+
+from decimal import Decimal
+from fractions import Fraction
+from array import array
+import struct
+import mmap
+import sys
+import os
+
+from .util import RPNError
+from .vector import Vector
+from .radix import Hex, Oct, Bin
+
+
+MAGIC = b'RPNSTATE'
+VERSION = 1
+
+_HEADER = struct.Struct('<8sI4x')
+_U8 = struct.Struct('<B')
+_U32 = struct.Struct('<I')
+_U64 = struct.Struct('<Q')
+_F64 = struct.Struct('<d')
+_C128 = struct.Struct('<dd')
+
+# Array typecodes by (exact) element type, and back; both 8 bytes wide.
+_TYPECODES = {float: 'd', int: 'q'}
+_ALIGNMENT = 8
+_NATIVE = sys.byteorder == 'little'
+# Ints printed in other bases, by base.
+_RADIXES = {kind.BASE: kind for kind in (Hex, Oct, Bin)}
+
+
+def _swapped(typecode, data):
+    # Files are little-endian, whatever the machine.
+    swapped = array(typecode)
+    swapped.frombytes(data)
+    swapped.byteswap()
+    return swapped
+
+
+class MappedStack:
+    '''
+    Register stack popped straight out of a (memory-mapped) array, and only
+    copied into a list once pushed onto.
+    '''
+    def __init__(self, view, length=None):
+        self._view = view
+        self._length = len(view) if length is None else length
+        # List, once copied.
+        self._items = None
+
+    def _copied(self):
+        if self._items is None:
+            self._items = self._view[:self._length].tolist()
+            self._view = None
+        return self._items
+
+    def pop(self):
+        if self._items is not None:
+            return self._items.pop()
+        if not self._length:
+            raise IndexError('pop from empty list')
+        self._length -= 1
+        return self._view[self._length]
+
+    def append(self, value):
+        self._copied().append(value)
+
+    def copy(self):
+        '''
+        Return independent copy; shares the map until either is pushed onto.
+        '''
+        if self._items is not None:
+            return list(self._items)
+        return type(self)(self._view, self._length)
+
+    @property
+    def mapped(self):
+        '''
+        Still read out of the map, as the given array view.
+        '''
+        return self._view[:self._length] if self._items is None else None
+
+    def __len__(self):
+        return self._length if self._items is None else len(self._items)
+
+    def __getitem__(self, index):
+        if self._items is not None:
+            return self._items[index]
+        return self._view[:self._length][index]
+
+    def __iter__(self):
+        if self._items is not None:
+            return iter(self._items)
+        return iter(self._view[:self._length].tolist())
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class _Writer:
+    def __init__(self, file):
+        self.file = file
+        self.offset = 0
+
+    def write(self, data):
+        self.file.write(data)
+        self.offset += len(data)
+
+    def int(self, n):
+        data = n.to_bytes((n.bit_length() + 8) // 8, 'little', signed=True)
+        self.write(_U32.pack(len(data)) + data)
+
+    def str(self, s):
+        data = s.encode('utf-8', 'surrogatepass')
+        self.write(_U32.pack(len(data)) + data)
+
+    def array(self, typecode, data):
+        '''
+        Write array of raw (native) data, aligned.
+        '''
+        data = memoryview(data).cast('B')
+        self.write(b'A' + typecode.encode() +
+                   _U64.pack(len(data) // _ALIGNMENT))
+        self.write(bytes(-self.offset % _ALIGNMENT))
+        if not _NATIVE:
+            data = _swapped(typecode, data)
+        self.write(data)
+
+    def value(self, value):
+        kind = type(value)
+        if value is None:
+            self.write(b'N')
+        elif kind is bool:
+            self.write(b'b' + _U8.pack(value))
+        elif kind is int:
+            self.write(b'i')
+            self.int(value)
+        elif _RADIXES.get(getattr(kind, 'BASE', None)) is kind:
+            self.write(b'r' + _U8.pack(kind.BASE))
+            self.int(int(value))
+        elif kind is float:
+            self.write(b'f' + _F64.pack(value))
+        elif kind is complex:
+            self.write(b'c' + _C128.pack(value.real, value.imag))
+        elif kind is Decimal:
+            self.write(b'D')
+            self.str(str(value))
+        elif kind is Fraction:
+            self.write(b'F')
+            self.int(value.numerator)
+            self.int(value.denominator)
+        elif kind is str:
+            self.write(b's')
+            self.str(value)
+        elif kind is list or kind is MappedStack:
+            self.values(value)
+        elif kind is Vector:
+            self.write(b'V')
+            items = value.items
+            if getattr(items, 'dtype', None) == 'float64':
+                self.array('d', items.data)
+            else:
+                self.values(value.tolist())
+        else:
+            raise RPNError('Cannot save {} value {!r}'.format(
+                kind.__name__, value))
+
+    def values(self, values):
+        '''
+        Write sequence of values, as a raw array if homogeneous.
+        '''
+        mapped = getattr(values, 'mapped', None)
+        if mapped is not None:
+            return self.array(mapped.format, mapped)
+        kinds = set(map(type, values))
+        if len(kinds) == 1:
+            typecode = _TYPECODES.get(kinds.pop())
+            if typecode is not None:
+                try:
+                    return self.array(typecode, array(typecode, values))
+                except OverflowError:
+                    # Big ints; one at a time.
+                    pass
+        self.write(b'L' + _U64.pack(len(values)))
+        for value in values:
+            self.value(value)
+
+
+class _Reader:
+    def __init__(self, data):
+        self.data = data
+        self.view = memoryview(data)
+        self.offset = 0
+
+    def read(self, size):
+        start = self.offset
+        self.offset += size
+        if self.offset > len(self.data):
+            raise RPNError('Truncated state file')
+        return self.view[start:self.offset]
+
+    def unpack(self, format):
+        return format.unpack(self.read(format.size))
+
+    def int(self):
+        size, = self.unpack(_U32)
+        return int.from_bytes(self.read(size), 'little', signed=True)
+
+    def str(self):
+        size, = self.unpack(_U32)
+        return str(self.read(size), 'utf-8', 'surrogatepass')
+
+    def array(self):
+        '''
+        Return (typecode, view) of array, without copying it if possible.
+        '''
+        typecode = str(self.read(1), 'ascii')
+        if typecode not in _TYPECODES.values():
+            raise RPNError('Bad state file array type {!r}'.format(typecode))
+        count, = self.unpack(_U64)
+        self.read(-self.offset % _ALIGNMENT)
+        data = self.read(count * _ALIGNMENT)
+        if not _NATIVE:
+            data = memoryview(_swapped(typecode, data)).cast('B')
+        return typecode, data.cast(typecode)
+
+    def value(self):
+        tag = bytes(self.read(1))
+        if tag == b'N':
+            return None
+        elif tag == b'b':
+            return bool(self.unpack(_U8)[0])
+        elif tag == b'i':
+            return self.int()
+        elif tag == b'r':
+            base, = self.unpack(_U8)
+            if base not in _RADIXES:
+                raise RPNError('Bad state file int base {}'.format(base))
+            return _RADIXES[base](self.int())
+        elif tag == b'f':
+            return self.unpack(_F64)[0]
+        elif tag == b'c':
+            return complex(*self.unpack(_C128))
+        elif tag == b'D':
+            return Decimal(self.str())
+        elif tag == b'F':
+            return Fraction(self.int(), self.int())
+        elif tag == b's':
+            return self.str()
+        elif tag == b'L':
+            count, = self.unpack(_U64)
+            return [self.value() for _ in range(count)]
+        elif tag == b'A':
+            return MappedStack(self.array()[1])
+        elif tag == b'V':
+            value = self.value()
+            # Straight out of the map, if an array.
+            mapped = getattr(value, 'mapped', None)
+            return Vector.of(value if mapped is None else mapped)
+        raise RPNError('Bad state file value tag {!r}'.format(tag))
+
+    def values(self, stack):
+        '''
+        Read sequence of values onto stack (a Stack).
+        '''
+        tag = bytes(self.read(1))
+        if tag == b'A':
+            typecode, view = self.array()
+            stack.frombuffer(typecode, view)
+        elif tag == b'L':
+            count, = self.unpack(_U64)
+            stack.extend([self.value() for _ in range(count)])
+        else:
+            raise RPNError('Bad state file stack tag {!r}'.format(tag))
+
+
+def _fmtkey(machine, fmt):
+    # Formats in use are already loaded, and the default one's near the front.
+    for key in machine.FMTS:
+        if machine.FMTS[key] is fmt:
+            return key
+    raise RPNError('Cannot save format {!r}'.format(fmt))
+
+
+def save(machine, path):
+    '''
+    Save machine state to file at path, atomically.
+    '''
+    temporary = '{}.{}.saving'.format(path, os.getpid())
+    try:
+        with open(temporary, 'wb') as file:
+            writer = _Writer(file)
+            writer.write(_HEADER.pack(MAGIC, VERSION))
+            writer.value(_fmtkey(machine, machine.ifmt))
+            writer.value(_fmtkey(machine, machine.ofmt))
+            writer.value(machine.precision)
+            stack = machine.stack
+            if stack.typecode is not None:
+                writer.array(stack.typecode, stack.view())
+            else:
+                writer.values(list(stack))
+            writer.write(_U64.pack(len(machine.registers)))
+            for name, value in machine.registers.items():
+                writer.str(name)
+                writer.value(value)
+        # Whatever else maps the old file keeps the old file.
+        os.replace(temporary, path)
+    except BaseException:
+        try:
+            os.unlink(temporary)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def load(machine, path):
+    '''
+    Replace machine state with that saved in file at path.
+    '''
+    with open(path, 'rb') as file:
+        try:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Can't map empty files.
+            raise RPNError('Truncated state file')
+    reader = _Reader(data)
+    magic, version = reader.unpack(_HEADER)
+    if magic != MAGIC:
+        raise RPNError('Not a state file')
+    if version != VERSION:
+        raise RPNError('Unsupported state file version {}'.format(version))
+    ifmt = machine.FMTS[reader.value()]
+    ofmt = machine.FMTS[reader.value()]
+    precision = reader.value()
+    stack = type(machine.stack)(type=ifmt)
+    reader.values(stack)
+    registers = dict()
+    count, = reader.unpack(_U64)
+    for _ in range(count):
+        name = reader.str()
+        registers[name] = reader.value()
+    # All or nothing.
+    machine.ifmt, machine.ofmt, machine.precision = ifmt, ofmt, precision
+    machine.stack.replace(stack)
+    machine.registers = registers
+    machine._selectdispatch()
+
+
+__all__ = (
+    'MappedStack',
+    'save',
+    'load',
+)
@@ -1,5 +1,5 @@
-from functools import wraps
-import subprocess
+from functools import wraps, partial
+from collections.abc import Mapping
 
 
 _SELECTIONS = {
@@ -8,20 +8,6 @@ _SELECTIONS = {
 }
 
 
-def _store_selection(data, selection):
-    with subprocess.Popen(['xclip',
-                           '-selection', selection],
-                          stdin=subprocess.PIPE) as xclip:
-        xclip.stdin.write(str(data).encode())
-
-
-def _load_selection(selection):
-    with subprocess.Popen(['xclip',
-                           '-selection', selection,
-                           '-o'], stdout=subprocess.PIPE) as xclip:
-        return xclip.stdout.read().decode()
-
-
 class RPNError(Exception):
     pass
 
@@ -43,3 +29,49 @@ def wrap_user_errors(fmt):
                 raise RPNError(fmt.format(*args, **kwargs), e)
         return wrapper
     return decorator
+
+
+class LazyMapping(Mapping):
+    '''
+    Read-only mapping whose values are only loaded on first lookup.
+
+    Keeps imports and setup for rarely used values off of startup.
+    '''
+    def __init__(self, loaders=()):
+        '''
+        :param loaders: mapping of key to zero-arg callable loading value.
+        '''
+        self._loaders = dict(loaders)
+        self._values = dict()
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            value = self._values[key] = self._loaders[key]()
+            return value
+
+    def __iter__(self):
+        return iter(self._loaders)
+
+    def __len__(self):
+        return len(self._loaders)
+
+    def merge(self, mapping):
+        '''
+        Add (or override with) entries of mapping, still not loading them.
+        '''
+        for key in mapping:
+            self._loaders[key] = partial(mapping.__getitem__, key)
+            self._values.pop(key, None)
+
+    def transform(self, function):
+        '''
+        Return new lazy mapping of function over each value.
+        '''
+        return type(self)({key: partial(self._transform, function, key)
+                           for key
+                           in self._loaders})
+
+    def _transform(self, function, key):
+        return function(self[key])
@@ -0,0 +1,302 @@
+'''
+Vector values: many numbers in one stack slot, operated on all at once.
+
+Operators and functions that don't take vectors (that is, just about all of
+them) are broadcast elementwise over them by the machine instead, scalars
+repeated; as one NumPy ufunc call, if NumPy is installed and there is one,
+and one loop in Python otherwise. Reductions (sum, product, etc.) take
+a vector down to a scalar.
+'''
+
+from functools import lru_cache
+from itertools import repeat
+from array import array
+import operator
+import math
+
+from .util import RPNError
+
+
+# Vectorized equivalents of what the machine calls, by name in numpy. Only
+# those whose results are the same, type and all (so, not ceil, floor and
+# trunc, which make ints of floats in Python).
+UFUNCS = {
+    operator.__add__: 'add',
+    operator.__sub__: 'subtract',
+    operator.__neg__: 'negative',
+    operator.__mul__: 'multiply',
+    operator.__truediv__: 'true_divide',
+    operator.__mod__: 'mod',
+    operator.__pow__: 'power',
+    operator.__eq__: 'equal',
+    operator.__not__: 'logical_not',
+    operator.__lshift__: 'left_shift',
+    operator.__rshift__: 'right_shift',
+    operator.__invert__: 'invert',
+    math.acos: 'arccos',
+    math.acosh: 'arccosh',
+    math.asin: 'arcsin',
+    math.asinh: 'arcsinh',
+    math.atan: 'arctan',
+    math.atan2: 'arctan2',
+    math.atanh: 'arctanh',
+    math.copysign: 'copysign',
+    math.cos: 'cos',
+    math.cosh: 'cosh',
+    math.degrees: 'degrees',
+    math.exp: 'exp',
+    math.expm1: 'expm1',
+    math.fabs: 'fabs',
+    math.gcd: 'gcd',
+    math.hypot: 'hypot',
+    math.isfinite: 'isfinite',
+    math.isinf: 'isinf',
+    math.isnan: 'isnan',
+    math.ldexp: 'ldexp',
+    math.log: 'log',
+    math.log10: 'log10',
+    math.log1p: 'log1p',
+    math.log2: 'log2',
+    math.pow: 'power',
+    math.radians: 'radians',
+    math.sin: 'sin',
+    math.sinh: 'sinh',
+    math.sqrt: 'sqrt',
+    math.tan: 'tan',
+    math.tanh: 'tanh',
+    abs: 'absolute',
+}
+
+
+@lru_cache(maxsize=None)
+def _numpy():
+    '''
+    Return numpy, imported on first use, or None if it isn't installed.
+    '''
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _dtype(numpy, values):
+    '''
+    Return dtype values pack into exactly, if any.
+
+    Only floats and complex; anything else (ints included, which numpy would
+    bound) stays Python objects, so as to keep Python semantics.
+    '''
+    kinds = set(map(type, values))
+    if kinds == {float}:
+        return numpy.float64
+    elif kinds and kinds <= {float, complex}:
+        return numpy.complex128
+    return None
+
+
+class Vector:
+    '''
+    Immutable sequence of numbers, on the stack as a single value.
+    '''
+    __slots__ = ('items',)
+    # Compares elementwise; see __eq__. So, unhashable, by defining it.
+
+    def __init__(self, items):
+        '''
+        :param items: numpy array, or list.
+        '''
+        self.items = items
+
+    @classmethod
+    def of(cls, values):
+        '''
+        Return vector of values, packed into a numpy array if possible.
+
+        Arrays (and memoryviews) of doubles are used as is, not copied.
+        '''
+        numpy = _numpy()
+        if isinstance(values, (array, memoryview)):
+            typecode = getattr(values, 'typecode', None) or values.format
+            if numpy is not None and typecode == 'd':
+                return cls(numpy.frombuffer(values, numpy.float64))
+            values = values.tolist()
+        elif numpy is not None and isinstance(values, numpy.ndarray):
+            return cls(values)
+        values = list(values)
+        if numpy is not None:
+            dtype = _dtype(numpy, values)
+            if dtype is not None:
+                return cls(numpy.array(values, dtype=dtype))
+        return cls(values)
+
+    def tolist(self):
+        '''
+        Return elements, as Python objects.
+        '''
+        items = self.items
+        return items if isinstance(items, list) else items.tolist()
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __bool__(self):
+        raise TypeError('truth value of a vector is ambiguous')
+
+    def __eq__(self, other):
+        return broadcast(operator.__eq__, (self, other))
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, self.tolist())
+
+
+def broadcast(function, args):
+    '''
+    Return function applied elementwise over vectors in args.
+
+    Scalars are repeated; vectors must all be the same length.
+    '''
+    lengths = {len(arg) for arg in args if isinstance(arg, Vector)}
+    if len(lengths) > 1:
+        raise RPNError('Vectors of different lengths: {}'.format(
+            ', '.join(map(str, sorted(lengths)))))
+    length, = lengths
+    numpy = _numpy()
+    # Through memoization, guards and such.
+    unwrapped = function
+    while hasattr(unwrapped, '__wrapped__'):
+        unwrapped = unwrapped.__wrapped__
+    name = UFUNCS.get(unwrapped)
+    if numpy is not None and name is not None:
+        operands = [arg.items if isinstance(arg, Vector) else arg
+                    for arg in args]
+        if not any(isinstance(operand, list) for operand in operands):
+            try:
+                with numpy.errstate(divide='raise', over='raise',
+                                    invalid='raise'):
+                    return Vector(getattr(numpy, name)(*operands))
+            except Exception:
+                # Whatever Python makes of it instead: an error, same as on
+                # a scalar, or a different result (e.g., complex powers of
+                # negative numbers).
+                pass
+    columns = [arg.tolist() if isinstance(arg, Vector) else repeat(arg, length)
+               for arg in args]
+    return Vector.of(map(function, *columns))
+
+
+def _elements(values):
+    '''
+    Return elements of vector, or values themselves if already a sequence
+    (list, array, memoryview, etc.).
+    '''
+    if isinstance(values, Vector):
+        return values.items
+    elif isinstance(values, (list, array, memoryview)):
+        return values
+    raise RPNError('Not a vector: {!r}'.format(values))
+
+
+def _floats(items):
+    '''
+    Return True if items are all floats (doubles, if packed).
+    '''
+    dtype = getattr(items, 'dtype', None)
+    if dtype is not None:
+        return dtype.kind == 'f'
+    kind = getattr(items, 'typecode', None) or getattr(items, 'format', None)
+    if kind is not None:
+        return kind == 'd'
+    return set(map(type, items)) <= {float}
+
+
+def total(values):
+    '''
+    Sum of elements, exactly rounded (as fsum) where floats.
+    '''
+    items = _elements(values)
+    if _floats(items):
+        return math.fsum(items)
+    elif hasattr(items, 'dtype'):
+        return items.sum().item()
+    # Exactly, in the elements' own type; ints, Decimals, etc.
+    return sum(items)
+
+
+def product(values):
+    '''
+    Product of elements.
+    '''
+    items = _elements(values)
+    if hasattr(items, 'dtype'):
+        return items.prod().item()
+    return math.prod(items)
+
+
+def minimum(values):
+    '''
+    Smallest element.
+    '''
+    items = _elements(values)
+    if hasattr(items, 'dtype'):
+        return items.min().item()
+    return min(items)
+
+
+def maximum(values):
+    '''
+    Largest element.
+    '''
+    items = _elements(values)
+    if hasattr(items, 'dtype'):
+        return items.max().item()
+    return max(items)
+
+
+def mean(values):
+    '''
+    Arithmetic mean of elements, summed as total.
+    '''
+    n = len(_elements(values))
+    if not n:
+        raise RPNError('Mean of nothing')
+    return total(values) / n
+
+
+# Reductions of a vector, or any sequence of numbers, by name.
+REDUCTIONS = {
+    'sum': total,
+    'prod': product,
+    'min': minimum,
+    'max': maximum,
+    'mean': mean,
+}
+
+
+def dot(left, right):
+    '''
+    Dot product of two vectors of the same length.
+    '''
+    left, right = _elements(left), _elements(right)
+    if len(left) != len(right):
+        raise RPNError('Vectors of different lengths: {}, {}'.format(
+            len(left), len(right)))
+    if hasattr(left, 'dtype') and hasattr(right, 'dtype'):
+        return _numpy().dot(left, right).item()
+    return sum(map(operator.mul, left, right))
+
+
+__all__ = (
+    'Vector',
+    'broadcast',
+    'total',
+    'product',
+    'minimum',
+    'maximum',
+    'mean',
+    'dot',
+    'REDUCTIONS',
+)
@@ -0,0 +1,16 @@
+'''
+Helpers shared by RPN tests
+'''
+
+from rpn.lexer import Lexer
+
+
+def run(machine, line):
+    '''
+    Feed line to machine, and return what's on its stack after.
+    '''
+    lexer = Lexer()
+    for match in lexer.lex(line):
+        if lexer.isfeedable(match):
+            machine.feed(lexer.matchedgroups(match))
+    return list(machine.stack)
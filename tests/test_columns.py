@@ -0,0 +1,134 @@
+'''
+RPN columnar evaluation tests
+'''
+
+import io
+import math
+from contextlib import redirect_stdout
+
+from pytest import importorskip, raises
+
+from rpn.util import RPNError
+from rpn.lexer import Lexer
+from rpn.machine import Machine
+from rpn.guard import Guard
+
+numpy = importorskip('numpy')
+from rpn.columns import ColumnMachine  # noqa: E402
+
+
+CSV = 'a,b,c\n1,2,3\n4,5,6\n-1,0.5,2\n'
+
+
+def run(machine, line):
+    lexer = Lexer()
+    for match in lexer.lex(line):
+        if lexer.isfeedable(match):
+            machine.feed(lexer.matchedgroups(match))
+
+
+def rows(line, ifmt='f', csv=CSV):
+    '''
+    Run line columnar, and row by row, returning both.
+    '''
+    columnar = ColumnMachine()
+    columnar.storeifmt(ifmt)
+    columnar.storeofmt(ifmt)
+    columnar.loadcolumns(io.StringIO(csv))
+    with columnar.errstate():
+        run(columnar, line)
+    output = io.StringIO()
+    with redirect_stdout(output):
+        columnar.printcolumn()
+    expected = io.StringIO()
+    header, *table = [row.split(',') for row in csv.splitlines()]
+    for row in table:
+        machine = Machine()
+        machine.storeifmt(ifmt)
+        machine.storeofmt(ifmt)
+        for name, cell in zip(header, row):
+            machine.registers[name] = machine._iconvert(cell)
+        run(machine, line)
+        with redirect_stdout(expected):
+            machine.printtop()
+    return output.getvalue().splitlines(), expected.getvalue().splitlines()
+
+
+def test_registers_are_arrays():
+    machine = ColumnMachine()
+    machine.loadcolumns(io.StringIO(CSV))
+    assert machine.rows == 3
+    assert machine.registers['b'].dtype == numpy.float64
+    assert machine.registers['b'].tolist() == [2.0, 5.0, 0.5]
+
+
+def test_ufuncs():
+    columnar, expected = rows("'a' l 'b' l * 'c' l + 'sin' $ 2 ^ 'pi' $ +")
+    assert columnar == expected
+
+
+def test_fallback_loop():
+    columnar, expected = rows("'c' l 'gamma' $ 'a' l 'erf' $ +")
+    assert columnar == expected
+
+
+def test_object_columns():
+    columnar, expected = rows("'c' l 'factorial' $ 'b' l 100 ^ +",
+                              ifmt='i', csv='b,c\n2,3\n5,30\n')
+    assert columnar == expected
+    assert columnar[0] == str(math.factorial(3) + 2 ** 100)
+
+
+def test_scalar_result_broadcast():
+    columnar, expected = rows('1 2 +')
+    assert columnar == expected == ['3.0'] * 3
+
+
+def test_same_as_scalars():
+    # Where the ufunc would differ (type, or error), row by row.
+    for line in "'b' l 'ceil' $", "'a' l 'floor' $ 'c' l +":
+        columnar, expected = rows(line)
+        assert columnar == expected
+    machine = ColumnMachine()
+    machine.loadcolumns(io.StringIO(CSV))
+    with machine.errstate():
+        run(machine, "'b' l 'ceil' $ 'a' l 0.5 ^")
+    powers = machine.stack.pop().tolist()
+    ceilings = machine.stack.pop().tolist()
+    assert powers == [1.0, 2.0, (-1) ** 0.5]
+    assert ceilings == [2, 5, 1]
+    assert all(type(n) is int for n in ceilings)
+
+
+def test_empty():
+    machine = ColumnMachine()
+    with raises(RPNError):
+        machine.loadcolumns(io.StringIO(''))
+    machine.loadcolumns(io.StringIO('a,b\n'))
+    assert machine.rows == 0
+
+
+def test_ragged():
+    machine = ColumnMachine()
+    with raises(RPNError, match='row 3'):
+        machine.loadcolumns(io.StringIO('a,b\n1,2\n3\n'))
+    machine.loadcolumns(io.StringIO('a,b\n1,2\n\n3,4\n'))
+    assert machine.registers['b'].tolist() == [2.0, 4.0]
+
+
+def test_printed_once():
+    machine = ColumnMachine()
+    machine.loadcolumns(io.StringIO(CSV))
+    output = io.StringIO()
+    with redirect_stdout(output):
+        run(machine, "'a' l 'b' l * p")
+        machine.printcolumn()
+    assert output.getvalue().splitlines() == ['2.0', '20.0', '-0.5']
+
+
+def test_guarded():
+    machine = ColumnMachine(guard=Guard(maxbits=1 << 20))
+    machine.storeifmt('i')
+    machine.loadcolumns(io.StringIO('a\n9\n'))
+    with raises(RPNError, match='too large'):
+        run(machine, "'a' l 99999999 ^")
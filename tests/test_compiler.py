@@ -0,0 +1,108 @@
+'''
+RPN compiler tests
+'''
+
+import io
+import math
+from contextlib import redirect_stdout
+
+from rpn.util import RPNError
+from rpn.lexer import Lexer
+from rpn.machine import Machine
+
+from pytest import raises, mark
+
+
+LINES = [
+    "c 2 'pi' $ * 3 ^ p",
+    "1 2 3 + * 'x' s 'x' l d * 'y' s 'y' l 'x' l f",
+    "5 d d * * 'sqrt' $ 2 r - 'z' s 2 R f",
+    "1 'q' s 'q' l 'q' l + 'q' s 'q' l 'Q' s 'Q' l P",
+    "c 2 3 'i' i 7 + 'f' i 1.5 + f",
+    "1 2 \N{INFINITY} \N{DEGREE SIGN} 'c' o 4 j v f 'f' o",
+]
+FAILING = [
+    "+ + + + +",
+    "c 3 4 'hypot' $ 1 0 / 7",
+    "c 9 'abs' $ 1_ 'nosuch' $",
+    "c 'nosuch' l",
+    "1 2 3 '",
+]
+
+
+def interpret(machine, line):
+    lexer = Lexer()
+    for match in lexer.lex(line):
+        if lexer.isfeedable(match):
+            machine.feed(lexer.matchedgroups(match))
+
+
+def outcome(machine, run):
+    output = io.StringIO()
+    error = None
+    try:
+        with redirect_stdout(output):
+            run()
+    except Exception as e:
+        error = type(e), e.args[0]
+    return (output.getvalue(), error,
+            list(machine.stack), dict(machine.registers))
+
+
+@mark.parametrize('line', LINES + FAILING)
+def test_same_as_interpreter(line):
+    interpreted, compiled = Machine(), Machine()
+    for machine in interpreted, compiled:
+        machine.stack.extend([1.0, 2.0, 3.0])
+        machine.registers['a'] = 4.0
+    program = compiled.compile(line)
+    for _ in range(2):
+        assert outcome(compiled, program.run) == \
+            outcome(interpreted, lambda: interpret(interpreted, line))
+
+
+def test_constant_folding():
+    m = Machine()
+    program = m.compile("2 'pi' $ * 3 ^")
+    step, = program.steps
+    assert not step.inputs
+    program.run()
+    assert list(m.stack) == [(2 * math.pi) ** 3]
+
+
+def test_stack_effect():
+    m = Machine()
+    step, = m.compile("* 'x' s 'x' l d +").steps
+    assert (step.inputs, step.outputs, step.cleared) == (2, 1, False)
+    step, = m.compile('+ c 1 2').steps
+    assert (step.inputs, step.outputs, step.cleared) == (2, 2, True)
+
+
+def test_recompiled_on_format_change():
+    m = Machine()
+    program = m.compile('1 2 +')
+    program.run()
+    m.storeifmt('i')
+    program.run()
+    assert [type(n) for n in m.stack] == [float, int]
+
+
+def test_lex_error_after_run():
+    m = Machine()
+    with raises(RPNError, match="Couldn't lex"):
+        m.compile("1 2 + '").run()
+    assert list(m.stack) == [3.0]
+
+
+def test_state_barrier(tmp_path):
+    # Loading state changes the input format, mid-line.
+    path = str(tmp_path / 'state')
+    saved = Machine()
+    saved.storeifmt('i')
+    saved.savestate(path)
+    line = "'{}' L 7 2 +".format(path)
+    interpreted, compiled = Machine(), Machine()
+    program = compiled.compile(line)
+    assert outcome(compiled, program.run) == \
+        outcome(interpreted, lambda: interpret(interpreted, line))
+    assert type(compiled.stack[-1]) is int
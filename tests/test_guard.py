@@ -0,0 +1,71 @@
+'''
+RPN cost guard tests
+'''
+
+import math
+import time
+
+from pytest import raises
+
+from rpn.util import RPNError
+from rpn.guard import Guard
+from rpn.memo import Memo
+from rpn.machine import Machine
+
+from helpers import run
+
+
+def test_refused():
+    machine = Machine(guard=Guard(maxbits=1 << 20))
+    run(machine, "'i' i 9 99 ^ 2 « 1000 'factorial' $")
+    assert len(machine.stack) == 2
+    for line, operator in [('9 99999999', '^'),
+                           ('1 2000000', '«'),
+                           ("1000000 'factorial'", '$'),
+                           ("'ab' 1000000", '*')]:
+        run(machine, 'c ' + line)
+        before = list(machine.stack)
+        with raises(RPNError, match='too large'):
+            run(machine, operator)
+        # As you were.
+        assert list(machine.stack) == before
+    # Floats and such are bounded anyway.
+    run(machine, "c 'f' i 9 99 ^")
+    assert machine.stack[-1] == 9.0 ** 99
+
+
+def test_squared():
+    # Squaring, over and over, as far as it's allowed.
+    machine = Machine(guard=Guard(maxbits=1 << 16))
+    run(machine, "'i' i 1 10000 « d * d *")
+    assert machine.stack[-1] == 1 << 40000
+    with raises(RPNError, match='too large'):
+        run(machine, 'd *')
+    assert list(machine.stack) == [1 << 40000] * 2
+
+
+def test_wrapped():
+    # Still memoized, and still broadcast as ufuncs, through the guard.
+    machine = Machine(guard=Guard(), memo=Memo())
+    run(machine, "'i' i 2 10 ^ 2 10 ^")
+    assert list(machine.stack) == [1024, 1024]
+    assert machine.memo.hits == 1
+    assert run(machine, "c 'f' i 1 2 2 n 2 ^ u") == [1.0, 4.0]
+
+
+def test_isolated():
+    guard = Guard(maxbits=10, isolate=True, timeout=0.5, maxmemory=50 << 20)
+    machine = Machine(guard=guard)
+    run(machine, "'i' i 2 100 ^")
+    assert list(machine.stack) == [2 ** 100]
+    with raises(RPNError, match='ValueError'):
+        guard.call(math.factorial, lambda n: 11, -1)
+    with raises(RPNError, match='Timed out'):
+        guard.call(time.sleep, lambda seconds: 11, 10)
+    with raises(RPNError, match='Out of memory'):
+        guard.call(lambda n: (b'x' * n, time.sleep(10)),
+                   lambda n: 11, 200 << 20)
+    # Not even worth trying.
+    with raises(RPNError, match='too large'):
+        run(machine, '1 1000000000 «')
+    assert list(machine.stack) == [2 ** 100, 1, 1000000000]
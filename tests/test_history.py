@@ -0,0 +1,59 @@
+'''
+RPN persistent history tests
+'''
+
+from pytest import importorskip
+
+importorskip('prompt_toolkit')
+
+from rpn.history import MappedHistory, PrefixSearch  # noqa: E402
+
+
+def test_append_and_load(tmp_path):
+    path = str(tmp_path / 'history')
+    history = MappedHistory(path)
+    assert list(history.load_history_strings()) == []
+    for entry in '1 2 +', 'c', '1 2 +', '3\n4 *', 'é p':
+        history.store_string(entry)
+    with open(path, 'rb') as file:
+        assert file.read() == '1 2 +\nc\n1 2 +\n3 4 *\né p\n'.encode()
+    history = MappedHistory(path)
+    assert list(history.load_history_strings()) == \
+        ['é p', '3 4 *', '1 2 +', 'c']
+    assert (history.entries, history.duplicates) == (5, 1)
+
+
+def test_search(tmp_path):
+    history = MappedHistory(str(tmp_path / 'history'))
+    for entry in '12 p', '2 3 +', '1 2 +', '2 p', '12 p':
+        history.store_string(entry)
+    assert list(history.search('2 ')) == ['12 p', '2 p', '1 2 +', '2 3 +']
+    assert list(history.search('2', prefix=True)) == ['2 p', '2 3 +']
+    assert list(history.search('x')) == []
+
+
+def test_compact(tmp_path):
+    path = str(tmp_path / 'history')
+    history = MappedHistory(path)
+    history.COMPACT_ENTRIES = 10
+    for n in range(30):
+        history.store_string(str(n % 5))
+    assert list(history.load_history_strings()) == ['4', '3', '2', '1', '0']
+    with open(path) as file:
+        assert file.read() == '0\n1\n2\n3\n4\n'
+    history.store_string('0')
+    assert list(history.load_history_strings()) == ['0', '4', '3', '2', '1']
+
+
+def test_prefix_search(tmp_path):
+    history = MappedHistory(str(tmp_path / 'history'))
+    history.LOAD_ENTRIES = 2
+    for entry in '2 3 +', '1 2 +', '2 p', '3 p', '4 p':
+        history.store_string(entry)
+    assert list(history.load_history_strings()) == ['4 p', '3 p']
+    # Past what's loaded.
+    search = PrefixSearch(history)
+    assert search('2') == '2 p'
+    assert search('2 p') == '2 3 +'
+    assert search('2 3 +') is None
+    assert search('1') == '1 2 +'
@@ -2,6 +2,8 @@
 RPN lexer tests
 '''
 
+import io
+
 import regex
 
 from rpn.util import RPNError
@@ -36,3 +38,25 @@ def test_odd_backslashes():
 
     matches = l.lex(r"'\\\''")
     assert [m.group('__str__') for m in matches] == [r"\\\'"]
+
+
+def test_long_line():
+    l = Lexer()
+    line = ' '.join(['1_000.5', "'x'", '+'] * 10000)
+    matches = [m.group(0) for m in l.lex(line) if l.isfeedable(m)]
+    assert matches == ['1_000.5', "'x'", '+'] * 10000
+
+
+def test_stream_chunk_boundaries():
+    l = Lexer()
+    text = "12345 'foo bar' 3.25 + p\n" * 50
+    expected = [m.group(0) for m in l.lex(text)]
+    for chunksize in 1, 2, 3, 7, 64:
+        matches = l.lexstream(io.StringIO(text), chunksize=chunksize)
+        assert [m.group(0) for m in matches] == expected
+
+
+def test_stream_bad_lexeme():
+    l = Lexer()
+    with raises(RPNError, match=regex.escape(r"Couldn't lex '\'")):
+        list(l.lex(io.StringIO(r"1 2 '\'")))
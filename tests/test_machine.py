@@ -0,0 +1,52 @@
+'''
+RPN machine tests
+'''
+
+import decimal
+import math
+
+from rpn.util import RPNError
+from rpn.machine import Machine
+
+from pytest import raises
+
+from helpers import run
+
+
+def test_dispatch_arities():
+    m = Machine()
+    assert m.operators['+'][1] == 2
+    assert m.operators['_'][1] == 1
+    assert m.operators['s'][1] == 2
+    assert m.operators['p'][1] == 0
+    assert m.operators['\N{INFINITY}'][1] == 0
+    assert m.functions['pi'][1] == 0
+    assert m._arity(m.parse({'operator': 'R'})) == 1
+
+
+def test_dispatch_runs():
+    m = Machine()
+    assert run(m, "9 2 ^ 'pi' $ \N{INFINITY}") == [81.0, math.pi, math.inf]
+    assert run(m, "c 2 'x' s 'x' l 'x' l * 3 r") == [3.0, 4.0]
+    with raises(RPNError, match='Less than 2'):
+        run(m, 'c 1 +')
+
+
+def test_dispatch_complex_mode():
+    m = Machine()
+    run(m, "'c' o")
+    assert m.operators is m.dispatch['complex']
+    assert run(m, '4 j v') == [complex(4j) ** 0.5]
+    run(m, "'f' o")
+    assert m.operators is m.dispatch['real']
+
+
+def test_literal_pool():
+    m = Machine()
+    run(m, '1_000.5 1000.5 2')
+    assert m._literals == {'1000.5': 1000.5, '2': 2.0}
+    # Changing the input format converts them anew.
+    assert run(m, "c 'D' i 0.1 0.1 +") == [decimal.Decimal('0.2')]
+    assert m._literals == {'0.1': decimal.Decimal('0.1')}
+    run(m, ' '.join(map(str, range(Machine.LITERAL_POOL + 1))))
+    assert len(m._literals) <= Machine.LITERAL_POOL
@@ -0,0 +1,62 @@
+'''
+RPN macro tests
+'''
+
+from decimal import Decimal
+
+from pytest import raises
+
+from rpn.util import RPNError
+from rpn.machine import Machine
+
+from helpers import run
+
+
+def test_define_and_run():
+    machine = Machine()
+    run(machine, r"'1 +' 'inc' m 5 'inc' $ 'inc' $")
+    assert list(machine.stack) == [7.0]
+    # Nested, and named functions applied in the body.
+    run(machine, r"c '2 * \'inc\' $ \'sqrt\' $' 'twice' m 4 'twice' $")
+    assert list(machine.stack) == [3.0]
+
+
+def test_resolved_once():
+    machine = Machine()
+    run(machine, r"'2 \'sqrt\' $ +' 'f' m")
+    macro = machine.macros['f']
+    run(machine, "1 'f' $")
+    operations = macro._operations
+    # Named function looked up ahead of time: push 2, sqrt, +.
+    assert len(operations) == 3
+    run(machine, "'f' $")
+    assert macro._operations is operations
+
+
+def test_redefine():
+    machine = Machine()
+    run(machine, r"'1 +' 'inc' m '\'inc\' $ \'inc\' $' 'inc2' m")
+    run(machine, "0 'inc2' $")
+    assert list(machine.stack) == [2.0]
+    run(machine, "'10 +' 'inc' m 'inc2' $")
+    assert list(machine.stack) == [22.0]
+    with raises(RPNError):
+        run(machine, "'1' 'sin' m")
+
+
+def test_modes():
+    machine = Machine()
+    # Literals parse as of when they're run, formats changed midway and all.
+    run(machine, r"'1.10 \'D\' i 1.10' 'f' m 'f' $")
+    assert list(machine.stack) == [1.1, Decimal('1.10')]
+    run(machine, "c 'f' $")
+    assert list(machine.stack) == [Decimal('1.10'), Decimal('1.10')]
+
+
+def test_recursion():
+    machine = Machine()
+    run(machine, r"'1 + \'loop\' $' 'loop' m")
+    with raises(RPNError):
+        run(machine, "0 'loop' $")
+    assert list(machine.stack) == [float(Machine.MACRO_DEPTH)]
+    assert machine._macrodepth == 0
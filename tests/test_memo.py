@@ -0,0 +1,66 @@
+'''
+RPN memoization tests
+'''
+
+from decimal import Decimal
+import math
+
+from rpn.memo import Memo
+from rpn.machine import Machine
+
+from helpers import run
+
+
+def test_type_qualified():
+    memo = Memo()
+    calls = []
+
+    def function(n):
+        calls.append(n)
+        return n
+
+    memoized = memo.wrap(function)
+    for n in 2, 2.0, Decimal(2), Decimal('2.0'), 0.0, -0.0, True, 2, 2.0:
+        assert type(memoized(n)) is type(n)
+    assert calls == [2, 2.0, Decimal(2), Decimal('2.0'), 0.0, -0.0, True]
+    assert math.copysign(1, memoized(-0.0)) == -1
+    assert (memo.hits, memo.misses) == (3, 7)
+
+
+def test_unkeyable():
+    memo = Memo()
+    assert memo.wrap(len)([1, 2]) == 2
+    assert (memo.hits, memo.misses, len(memo)) == (0, 0, 0)
+
+
+def test_bounds():
+    memo = Memo(maxsize=10)
+    square = memo.wrap(lambda n: n * n)
+    for n in range(20):
+        square(n)
+    assert len(memo) == 10
+    assert memo.evictions == 10
+    # Least recently used go first.
+    square(15)
+    square(0)
+    assert memo.hits == 1
+
+    memo = Memo(maxbytes=10000)
+    power = memo.wrap(pow)
+    for n in range(10):
+        power(2, 10000 * n)
+    assert memo.bytes <= 10000
+    assert 0 < len(memo) < 10
+    # Too big to ever cache.
+    power(2, 1000000)
+    assert memo.bytes <= 10000
+
+
+def test_machine():
+    m = Machine(memo=Memo())
+    assert run(m, "'i' i 20 'factorial' $ 20 'factorial' $ 2 3 ^ 2 d ^ "
+               "'x' s 'x' l M") == [math.factorial(20)] * 2 + [8, 4]
+    # Loads and stores aren't memoized.
+    assert (m.memo.hits, m.memo.misses) == (1, 3)
+    assert str(m.memo).startswith('hits: 1 misses: 3 hit rate: 25.0%')
+    run(Machine(), 'M')
@@ -0,0 +1,55 @@
+'''
+RPN output tests
+'''
+
+import io
+
+from pytest import raises
+
+from rpn.util import RPNError
+from rpn.output import Output
+from rpn.machine import Machine
+
+from helpers import run
+
+
+def test_buffered():
+    stream = io.StringIO()
+    output = Output(stream, buffered=True)
+    output.BUFFER_SIZE = 10
+    output.write('12345')
+    assert stream.getvalue() == ''
+    output.write('67890')
+    assert stream.getvalue() == '1234567890'
+    output.write('x')
+    output.flush()
+    assert stream.getvalue() == '1234567890x'
+    assert not output.isatty()
+
+
+def test_unbuffered(capsys):
+    Output().write('x')
+    assert capsys.readouterr().out == 'x'
+
+
+def test_print_chunked():
+    stream = io.StringIO()
+    m = Machine(output=Output(stream, buffered=True))
+    m.PRINT_CHUNK = 3
+    run(m, '1 2 3 4 5 6 7 f c f 1 2 p 2 k 3 / P')
+    assert stream.getvalue() == ''
+    m.output.flush()
+    assert stream.getvalue() == \
+        '7.0\n6.0\n5.0\n4.0\n3.0\n2.0\n1.0\n\n2.0\n0.67\n'
+
+
+def test_print_chunked_error(monkeypatch):
+    # Chunks before a value that won't format are written all the same.
+    monkeypatch.setattr(Machine, 'PRINT_CHUNK', 2)
+    stream = io.StringIO()
+    m = Machine(output=Output(stream))
+    m.stack.extend(['x', 1.0, 2.0, 3.0])
+    with raises(RPNError):
+        m.printstack()
+    assert stream.getvalue() == '3.0\n2.0\n'
+    assert len(m.stack) == 4
@@ -0,0 +1,28 @@
+'''
+RPN parallel execution tests
+'''
+
+from rpn.parallel import ParallelExecutor
+from rpn.guard import Guard
+
+
+def test_results_in_order():
+    lines = ['c {} d * p'.format(n) for n in range(1000)]
+    lines[10] = 'c 1 +'
+    lines[500] = "c '"
+    executor = ParallelExecutor(2)
+    executor.BATCH_SIZE = 7
+    results = list(executor.results(lines))
+    assert len(results) == 1000
+    assert results[0] == ('0.0\n', None)
+    assert results[999] == ('998001.0\n', None)
+    assert results[10] == ('', 'Less than 2 element(s) on stack')
+    assert results[500] == ('', "Couldn't lex '")
+
+
+def test_guarded():
+    executor = ParallelExecutor(2, guard=Guard(maxbits=1 << 20))
+    results = list(executor.results(["c 'i' i 9 99999999 ^ P",
+                                     "c 'i' i 2 10 ^ P"]))
+    assert results[0][1].startswith('Result too large')
+    assert results[1] == ('1024.0\n', None)
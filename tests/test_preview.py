@@ -0,0 +1,81 @@
+'''
+RPN live preview tests
+'''
+
+from rpn.machine import Machine
+from rpn.selection import Selections, MemoryBackend
+from rpn.preview import Preview
+
+from helpers import run
+
+
+def test_preview():
+    m = Machine()
+    run(m, '1 2')
+    preview = Preview(m)
+    assert preview.preview('') == '[2] 2.0'
+    assert preview.preview('3 +') == '[2] 5.0'
+    assert preview.preview('3 + 2 k 3 /') == '[2] 1.67'
+    assert preview.preview('3 + +') == '[1] 6.0'
+    assert preview.preview('c +') == 'Less than 2 element(s) on stack'
+    assert preview.preview("'x") == '[2] 2.0'
+    assert preview.preview("'x' 'Xs' s 1 'Xs' s 'Xs' l") == '[3] 1.0'
+    # Real machine untouched.
+    assert run(m, '') == [1.0, 2.0]
+    assert m.precision is None
+    assert 'Xs' not in m.registers
+
+
+def test_incremental():
+    preview = Preview(Machine())
+    fed = []
+    feed = preview.sandbox.feed
+
+    def counted(groups):
+        fed.append(groups)
+        feed(groups)
+    preview.sandbox.feed = counted
+    line = ' '.join(['1 2 +'] * 10)
+    for end in range(1, len(line) + 1):
+        preview.preview(line[:end])
+    # Each number fed twice, for each of 1, 10, and 100 lexeme long
+    # prefixes typed so far, at most, rather than the whole line each time.
+    assert len(fed) < 2 * 30
+    assert preview.preview(line) == '[10] 3.0'
+    preview.reset()
+    assert preview.preview(line.replace('2 +', '3 +', 1)) == '[10] 3.0'
+    assert preview.preview('5 ' + line) == '[11] 3.0'
+
+
+def test_budget():
+    preview = Preview(Machine())
+    preview.BUDGET = -1
+    line = ' '.join(['1'] * 5)
+    assert preview.preview(line) == '[1] 1.0 …'
+    assert preview.preview(line) == '[2] 1.0 …'
+    preview.BUDGET = 1
+    assert preview.preview(line) == '[5] 1.0'
+
+
+def test_no_side_effects(capsys):
+    backend = MemoryBackend()
+    m = Machine(selections=Selections(backend))
+    preview = Preview(m)
+    previews = [preview.preview("1 p f 'sin' H h"),
+                preview.preview("1 '+' s"),
+                preview.preview("'+' l")]
+    # Before asserting anything, which may print.
+    assert capsys.readouterr() == ('', '')
+    assert previews == ['[1] 1.0'] + ['No preview of clipboard'] * 2
+    assert (backend.loads, backend.stores) == (0, 0)
+
+
+def test_no_state_files(tmp_path):
+    path = tmp_path / 'preview.state'
+    preview = Preview(Machine())
+    assert preview.preview("1 2 '{}' S".format(path)) == \
+        'No preview of state files'
+    assert not path.exists()
+    path.write_bytes(b'')
+    assert preview.preview("'{}' L".format(path)) == \
+        'No preview of state files'
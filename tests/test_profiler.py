@@ -0,0 +1,50 @@
+'''
+RPN profiler tests
+'''
+
+from rpn.machine import Machine
+from rpn.lexer import Lexer
+from rpn.profiler import Profiler
+from rpn.cli import CLI
+
+
+def test_operations():
+    machine = Machine()
+    lexer = Lexer()
+    profiler = Profiler()
+    profiler.instrument(machine, lexer)
+    for line in profiler.timelines(['1 2 + p', "4 'sqrt' $ p", 'f']):
+        for groups in lexer.feedables(line):
+            machine.feed(groups)
+    assert list(machine.stack) == [3.0, 2.0]
+    operations = profiler.operations
+    assert operations['number'][0] == 3
+    assert operations['+'][0] == 1
+    assert operations['p'][0] == 2
+    # f too.
+    assert operations['(print)'][0] == 3
+    assert operations['$ sqrt'][0] == 1
+    # One more call per line than lexemes, to find out it's done.
+    assert operations['(lex)'][0] == 4 + 4 + 2 + 1 + 1
+    for calls, total, slowest in operations.values():
+        assert 0 <= slowest <= total
+    assert profiler.lines == 3
+
+
+def test_percentiles():
+    profiler = Profiler()
+    assert profiler.percentile(50) is None
+    for elapsed in range(1, 1001):
+        profiler.recordline(elapsed * 1000)
+    assert profiler.slowest == 1000000
+    assert 500000 <= profiler.percentile(50) <= 500000 * 1.05
+    assert 990000 <= profiler.percentile(99) <= 1000000
+    assert profiler.percentile(100) == 1000000
+
+
+def test_cli_report(capsys):
+    CLI().run(args=['--profile', '-e', '2', '3', '^', 'p'])
+    out, err = capsys.readouterr()
+    assert out == '8.0\n'
+    assert '^' in err
+    assert 'lines: 4' in err
@@ -0,0 +1,54 @@
+'''
+RPN radix output format tests
+'''
+
+import random
+import sys
+
+from rpn.radix import digits, todecimal, Hex, Oct, Bin, CHUNK_DIGITS
+from rpn.machine import Machine
+from rpn.output import Output
+
+from helpers import run
+
+
+def test_digits():
+    limit = sys.get_int_max_str_digits()
+    sys.set_int_max_str_digits(0)
+    try:
+        generator = random.Random(0)
+        for bits in 0, 1, 8, 24, 25, 1000, 9000, 250000:
+            for sign in 1, -1:
+                n = sign * generator.getrandbits(bits)
+                for base, spec in (2, '#b'), (8, '#o'), (16, '#x'), (10, 'd'):
+                    assert ''.join(digits(n, base)) == format(n, spec)
+        n = 10 ** (CHUNK_DIGITS + 10)
+        for m in n - 1, n, n + 1:
+            assert ''.join(digits(m)) == str(m)
+            assert str(todecimal(m)) == str(m)
+    finally:
+        sys.set_int_max_str_digits(limit)
+
+
+def test_chunked():
+    # Past CPython's own int to str limit, a chunk at a time.
+    n = 1 << 1_000_000
+    chunks = list(digits(n))
+    assert len(chunks) > 2
+    assert max(map(len, chunks)) <= CHUNK_DIGITS
+    assert sum(map(len, chunks)) == 301030
+    assert chunks[1].startswith('9900656229295898250697923616')
+    assert chunks[-1].endswith('8403162747109376')
+
+
+def test_formats(capsys):
+    machine = Machine(output=Output())
+    run(machine, "'i' i 'x' o 255 1 2 n p c 'i' o 1 100000 « p")
+    output = capsys.readouterr().out.splitlines()
+    assert (str(Hex(255)), str(Oct(8)), str(Bin(-5))) == \
+        ('0xff', '0o10', '-0b101')
+    assert Hex('ff') == 255
+    assert type(round(Hex(255))) is Hex
+    assert output[0] == '[0xff 0x1]'
+    assert output[1].startswith('99900209301438450794403276433003359098')
+    assert len(output[1]) == 30103
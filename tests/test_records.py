@@ -0,0 +1,85 @@
+'''
+RPN machine-readable output tests
+'''
+
+from io import BytesIO, StringIO
+import json
+import struct
+
+from pytest import raises
+
+from rpn.util import RPNError
+from rpn.machine import Machine
+from rpn.cli import CLI
+from rpn.records import JSONOutput, BinaryOutput, IntOutput
+
+from helpers import run
+
+
+def records(data):
+    '''
+    Return binary records, as lists of little-endian 64-bit values.
+    '''
+    records = []
+    while data:
+        n, = struct.unpack_from('<Q', data)
+        records.append(data[8:8 + 8 * n])
+        data = data[8 + 8 * n:]
+    return records
+
+
+def test_ndjson():
+    m = Machine(output=JSONOutput(StringIO()))
+    run(m, "1 2 'i' o p 'c' o P 'D' o 0.5 P 'F' o p 'f' o 2 k 1 3 / P "
+           "c 1 2 2 n 'i' i 2 100 ^ 'i' o f c f")
+    lines = m.output.stream.getvalue().splitlines()
+    assert [json.loads(line) for line in lines] == [
+        [{'int': 2}],
+        [{'complex': [2.0, 0.0]}],
+        [{'decimal': '0.5'}],
+        [{'fraction': '1'}],
+        [{'float': 0.33}],
+        [{'int': 2 ** 100}, {'vector': [{'int': 1}, {'int': 2}]}],
+        [],
+    ]
+    with raises(RPNError):
+        run(m, "c 'x' p")
+    assert list(m.stack) == ['x']
+
+
+def test_f64le():
+    m = Machine(output=BinaryOutput(BytesIO()))
+    run(m, "1 2 3 f 1.5 P c 5 4 2 n u f 1 k 2 3 / p")
+    data = records(m.output.stream.getvalue())
+    assert [list(struct.unpack('<{}d'.format(len(record) // 8), record))
+            for record in data] == [[3.0, 2.0, 1.0], [1.5], [4.0, 5.0],
+                                    [0.7]]
+    m.output.stream = BytesIO()
+    for line in "'x' P", "c 1 4 5 2 n f", "4 5 2 n p":
+        with raises(RPNError):
+            run(m, line)
+    assert m.stack[-1].tolist() == [4.0, 5.0]
+    assert m.output.stream.getvalue() == b''
+
+
+def test_i64le():
+    m = Machine(output=IntOutput(BytesIO()))
+    run(m, "'i' i 2 62 ^ 3 f")
+    with raises(RPNError):
+        run(m, "c 'f' i 1.5 P")
+    assert list(m.stack) == [1.5]
+    with raises(RPNError):
+        run(m, "c 2 63 ^ 'i' o p")
+    # As printed, by output format: truncated.
+    run(m, "c 1.5 P")
+    data = records(m.output.stream.getvalue())
+    assert [struct.unpack('<{}q'.format(len(record) // 8), record)
+            for record in data] == [(3, 2 ** 62), (1,)]
+
+
+def test_cached_lines(capsys):
+    # Replayed lines write their records again.
+    capsys.readouterr()
+    CLI().run(args=['--output-format', 'ndjson', '--cache-lines',
+                    '-e', 'c 1 p', 'c 1 p'])
+    assert capsys.readouterr().out == '[{"float":1.0}]\n' * 2
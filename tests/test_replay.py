@@ -0,0 +1,68 @@
+'''
+RPN whole-line result cache tests
+'''
+
+from io import StringIO
+
+from pytest import raises
+
+from rpn.util import RPNError
+from rpn.lexer import Lexer
+from rpn.machine import Machine
+from rpn.output import Output
+from rpn.replay import LineCache
+
+
+def machine():
+    return Machine(output=Output(StringIO()), linecache=LineCache())
+
+
+def feed(machine, *lines):
+    lexer = Lexer()
+    for line in lines:
+        machine.feedline(line, lexer)
+    return machine.output.stream.getvalue()
+
+
+def test_replayed():
+    m = machine()
+    assert feed(m, "3 4 'hypot' $ d * p", "3 4 'hypot' $ d * p") == \
+        '25.0\n' * 2
+    assert list(m.stack) == [25.0, 25.0]
+    cache = m.linecache
+    assert (cache.hits, cache.misses) == (1, 1)
+    # Keyed on what it takes off the stack, and nothing else.
+    feed(m, '1 + P', '1 + P', '5 1 + P', 'c 4 1 + P', 'c 4 1 + P')
+    assert (cache.hits, cache.misses) == (3, 4)
+    assert m.output.stream.getvalue().endswith('26.0\n26.0\n6.0\n5.0\n5.0\n')
+    assert list(m.stack) == []
+
+
+def test_configuration():
+    m = machine()
+    feed(m, '0.1 0.2 + p', "'D' i", '0.1 0.2 + p', "'i' o 3 k", '0.1 0.2 + p')
+    assert m.output.stream.getvalue() == '0.30000000000000004\n0.3\n0\n'
+    assert m.linecache.hits == 0
+
+
+def test_uncacheable():
+    m = machine()
+    feed(m, "1 'x' s", "1 'x' s", "'x' l 'x' l", "1 2 3 R", "'1 +' 'f' m",
+         "'f' $", 'f')
+    cache = m.linecache
+    assert (cache.hits, cache.misses) == (0, 0)
+    assert cache.uncacheable == 7
+    # Nor are vectors, nor lines that fail.
+    with raises(RPNError):
+        feed(m, 'c +')
+    feed(m, '1 2 2 n', '1 +', '1 +')
+    assert (cache.hits, cache.misses) == (0, 0)
+    assert list(m.stack)[0].tolist() == [3.0, 4.0]
+
+
+def test_bad_lexeme():
+    m = machine()
+    with raises(RPNError):
+        feed(m, '1 2 + p #')
+    # Run as far as it lexes, as ever.
+    assert m.output.stream.getvalue() == '3.0\n'
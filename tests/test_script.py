@@ -0,0 +1,60 @@
+'''
+RPN pre-lexed script tests
+'''
+
+from rpn import script
+from rpn.script import Script
+from rpn.cli import CLI
+
+
+SCRIPT = "1 2 + p\n'sqrt' 'f' s\n9 'f' l $ p\n1 2 + p\n3 # 4\n"
+
+
+def test_cached(tmp_path, capsys):
+    path = tmp_path / 'job.rpn'
+    path.write_text(SCRIPT)
+    CLI().run(args=['-f', str(path)])
+    out = capsys.readouterr().out
+    assert out == '3.0\n3.0\n3.0\n'
+    cache = tmp_path / '__rpncache__' / 'job.rpn.lexed'
+    assert cache.exists()
+    lexed = Script(str(path))
+    assert lexed.cache == str(cache)
+    # Same lexemes, errors and all, straight from the cache.
+    assert lexed.lexed == Script._lex(lexed, dict.fromkeys(lexed.lines))
+    assert list(lexed.feedables('1 2 + p')) == [
+        {'number': '1'}, {'number': '2'}, {'operator': '+'},
+        {'operator': 'p'}]
+    capsys.readouterr()
+    CLI().run(args=['-f', str(path)])
+    assert capsys.readouterr().out == out
+
+
+def test_stale(tmp_path, monkeypatch):
+    path = tmp_path / 'job.rpn'
+    path.write_text(SCRIPT)
+    Script(str(path))
+    cache = tmp_path / '__rpncache__' / 'job.rpn.lexed'
+    path.write_text('4 5 *\n')
+    assert Script(str(path)).lexed == {
+        '4 5 *': ([{'number': '4'}, {'number': '5'}, {'operator': '*'}],
+                  None)}
+    # Corrupt, or for another grammar: lexed again.
+    data = bytearray(cache.read_bytes())
+    data[-3] ^= 0xff
+    cache.write_bytes(data)
+    assert Script(str(path)).lexed['4 5 *'][0][2] == {'operator': '*'}
+    monkeypatch.setattr(script, 'VERSION', script.VERSION + 1)
+    Script(str(path))
+    assert cache.read_bytes()[8] == script.VERSION
+
+
+def test_cache_dir(tmp_path, monkeypatch):
+    path = tmp_path / 'job.rpn'
+    path.write_text(SCRIPT)
+    # Can't be written next to the script.
+    (tmp_path / '__rpncache__').write_text('')
+    monkeypatch.setattr(script, 'CACHE_DIR', str(tmp_path / 'cache'))
+    lexed = Script(str(path))
+    assert lexed.cache.startswith(str(tmp_path / 'cache'))
+    assert Script(str(path)).cache == lexed.cache
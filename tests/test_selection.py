@@ -0,0 +1,68 @@
+'''
+RPN selection (clipboard) register tests
+'''
+
+import threading
+
+from rpn.util import RPNError
+from rpn.selection import Selections, MemoryBackend
+from rpn.machine import Machine
+
+from pytest import raises
+
+from helpers import run
+
+
+def test_cached_load():
+    backend = MemoryBackend()
+    backend.selections['clipboard'] = 'x'
+    selections = Selections(backend)
+    assert [selections.load('clipboard') for _ in range(100)] == ['x'] * 100
+    assert backend.loads == 1
+    selections.ttl = 0
+    backend.selections['clipboard'] = 'y'
+    assert selections.load('clipboard') == 'y'
+    assert backend.loads == 2
+
+
+class BlockingBackend(MemoryBackend):
+    def __init__(self):
+        super().__init__()
+        self.unblock = threading.Event()
+
+    def store(self, selection, data):
+        self.unblock.wait()
+        super().store(selection, data)
+
+
+def test_coalesced_stores():
+    backend = BlockingBackend()
+    selections = Selections(backend)
+    for n in range(100):
+        selections.store('primary', n)
+        # Read your own writes, without waiting for them.
+        assert selections.load('primary') == str(n)
+    backend.unblock.set()
+    selections.flush()
+    assert backend.selections['primary'] == '99'
+    # First store, then at most the latest of all others piled up meanwhile.
+    assert backend.stores <= 2
+    assert backend.loads == 0
+
+
+def test_failed_store():
+    backend = MemoryBackend()
+    backend.store = None
+    selections = Selections(backend)
+    selections.store('clipboard', 1)
+    with raises(RPNError, match='Cannot store selection'):
+        selections.flush()
+    selections.flush()
+
+
+def test_machine():
+    backend = MemoryBackend()
+    m = Machine(selections=Selections(backend))
+    assert run(m, "3 '+' s '+' l '*' l") == ['3.0', '']
+    m.selections.flush()
+    assert backend.selections == {'clipboard': '3.0'}
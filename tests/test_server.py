@@ -0,0 +1,100 @@
+'''
+RPN daemon tests
+'''
+
+import threading
+import asyncio
+import socket
+
+from rpn.server import Server, Session
+from rpn.client import Client
+from rpn.guard import Guard
+
+from pytest import fixture, mark
+
+
+pytestmark = mark.skipif(not hasattr(socket, 'AF_UNIX'),
+                         reason='needs Unix sockets')
+
+
+@fixture
+def path(tmp_path):
+    path = str(tmp_path / 'rpn.sock')
+    server = Server(path, guard=Guard())
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    task = loop.create_task(server.serve(started))
+
+    def serve():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+    thread = threading.Thread(target=serve)
+    thread.start()
+    started.wait()
+    yield path
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join()
+    loop.close()
+    server.executor.shutdown()
+
+
+def test_session():
+    session = Session()
+    assert session.run('1 2 + p d') == ('3.0\n', '')
+    assert session.run('+ p') == ('6.0\n', '')
+    assert session.run("1 'a' +") == \
+        ('', "TypeError: unsupported operand type(s) for +: "
+             "'float' and 'str'\n")
+    assert session.run('c 1 +') == ('', 'Less than 2 element(s) on stack\n')
+
+
+def test_sessions(path):
+    first, second = Client(path), Client(path)
+    try:
+        assert first.run('1 2 + p') == ('3.0\n', '')
+        assert second.run('p') == ('', 'Empty stack\n')
+        assert first.run('p') == ('3.0\n', '')
+    finally:
+        first.close()
+        second.close()
+
+
+def test_pipelining(path):
+    client = Client(path)
+    try:
+        lines = ['c {} d * p'.format(n) for n in range(5000)]
+        lines[10] = 'c 1 +'
+        results = list(client.results(lines))
+        assert len(results) == 5000
+        assert results[0] == ('0.0\n', '')
+        assert results[4999] == ('24990001.0\n', '')
+        assert results[10] == ('', 'Less than 2 element(s) on stack\n')
+        # Still in sync afterwards.
+        assert client.run('f') == ('24990001.0\n', '')
+    finally:
+        client.close()
+
+
+def test_guarded(path):
+    client = Client(path)
+    try:
+        output, error = client.run("'i' i 9 99999999 ^")
+        assert error.startswith('Result too large')
+        assert client.run('f') == ('99999999.0\n9.0\n', '')
+    finally:
+        client.close()
+
+
+def test_session_streams(capsys):
+    # Nothing of the session's ends up on the daemon's own streams.
+    capsys.readouterr()
+    session = Session()
+    output, error = session.run("h M 'sin' H")
+    clipboard = session.run("1 '+' s")
+    assert capsys.readouterr() == ('', '')
+    assert output == ''
+    assert 'operators:' in error and 'memo: off' in error
+    assert 'sine' in error
+    assert clipboard == ('', 'No clipboard in daemon sessions\n')
@@ -0,0 +1,80 @@
+'''
+RPN stack tests
+'''
+
+from collections import deque
+from decimal import Decimal
+
+from rpn.util import RPNError
+from rpn.stack import Stack
+from rpn.machine import Machine
+
+from pytest import raises
+
+from helpers import run
+
+
+def test_packed():
+    stack = Stack([1.0, 2.0])
+    assert stack.packed
+    stack.append(3.0)
+    stack.extend([4.0, 5.0])
+    assert stack.popn(2) == [4.0, 5.0]
+    assert stack.pop() == 3.0
+    stack.rotate(1)
+    assert list(stack) == [2.0, 1.0]
+    assert stack.packed
+    with raises(IndexError):
+        stack.popn(3)
+    assert list(stack) == [2.0, 1.0]
+
+
+def test_promotion():
+    stack = Stack([1.0, 2.0])
+    stack.append(3)
+    assert not stack.packed
+    assert [type(n) for n in stack] == [float, float, int]
+    stack.clear()
+    assert stack.packed
+
+    stack = Stack(type=int)
+    stack.extend([1, 2])
+    assert stack.packed
+    for value in True, 2 ** 64:
+        stack = Stack([1, 2], type=int)
+        stack.append(value)
+        assert not stack.packed
+        assert list(stack) == [1, 2, value]
+        assert type(stack[-1]) is type(value)
+
+    stack = Stack([1.0], type=Decimal)
+    assert not stack.packed
+
+
+def test_same_as_deque():
+    for values in [1.0, 2.0, 3.0, 4.0], [1.0, 'x', 3j, 4.0]:
+        for n in range(-5, 6):
+            stack = Stack(values)
+            reference = deque(values)
+            stack.rotate(n)
+            reference.rotate(n)
+            assert list(stack) == list(reference)
+            assert list(reversed(stack)) == list(reversed(reference))
+            assert stack == reference
+
+
+def test_machine(capsys):
+    m = Machine()
+    assert run(m, "1 2 d r 1 R") == [2.0, 1.0, 2.0]
+    assert m.stack.packed
+    assert run(m, "'1.5' 'D' i 3 f") == [2.0, 1.0, 2.0, '1.5', Decimal(3)]
+    assert not m.stack.packed
+    assert '3.0\n1.5\n2.0\n1.0\n2.0\n' in capsys.readouterr().out
+    assert run(m, "'f' i c 1 2") == [1.0, 2.0]
+    assert m.stack.packed
+    assert run(m, "'i' i 3 *") == [1.0, 6.0]
+    assert not m.stack.packed
+    assert run(m, 'c 2 64 ^ 1 -') == [2 ** 64 - 1]
+    with raises(RPNError, match='Less than 2'):
+        run(m, 'c 1 +')
+    assert run(m, '') == [1]
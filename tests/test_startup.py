@@ -0,0 +1,65 @@
+'''
+RPN startup time tests
+
+One-off rpn -e invocations are dominated by interpreter startup and imports.
+'''
+
+import os
+import sys
+import subprocess
+
+import rpn
+
+
+# Modules only some runs need; must not be imported for a plain rpn -e.
+DEFERRED = {
+    'prompt_toolkit',
+    'decimal',
+    'fractions',
+    'datetime',
+    'inspect',
+    'cmath',
+    'typing',
+    'subprocess',
+}
+# Cumulative import time of rpn.cli, in microseconds. Generous, so as not to
+# be flaky; catches regressions like eagerly importing prompt_toolkit.
+BUDGET = 100000
+
+
+def importtimes(*args):
+    '''
+    Run rpn with -X importtime; return cumulative import time per module.
+    '''
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(rpn.__file__))] +
+        env.get('PYTHONPATH', '').split(os.pathsep))
+    result = subprocess.run([sys.executable, '-X', 'importtime',
+                             '-m', 'rpn', *args],
+                            env=env,
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True,
+                            check=True)
+    times = dict()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        # C accelerator modules, e.g., _decimal, count as their module.
+        times[name.strip().lstrip('_')] = int(cumulative)
+    return result.stdout, times
+
+
+def test_expression_imports():
+    output, times = importtimes('-e', '1 2 + p')
+    assert output == '3.0\n'
+    assert not DEFERRED & {name.split('.')[0] for name in times}
+    assert times['rpn.cli'] < BUDGET
+
+
+def test_formats_still_load():
+    output, times = importtimes('-e', "'D' i 0.1 0.2 + 'D' o p")
+    assert output == '0.3\n'
+    assert 'decimal' in times
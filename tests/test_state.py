@@ -0,0 +1,108 @@
+'''
+RPN state file tests
+'''
+
+from decimal import Decimal
+from fractions import Fraction
+import math
+
+from pytest import raises
+
+from rpn.util import RPNError
+from rpn.machine import Machine
+from rpn.state import MappedStack, save, load
+
+from helpers import run
+
+
+def roundtrip(machine, tmp_path):
+    path = str(tmp_path / 'state')
+    save(machine, path)
+    loaded = Machine()
+    load(loaded, path)
+    return loaded
+
+
+def test_exact(tmp_path):
+    machine = Machine()
+    values = [2 ** 100, -2 ** 100, -1, 0.1, -0.0, math.inf, 1 - 2j,
+              Decimal('1.10'), Decimal('-0E+3'), Fraction(-1, 3), 'é', None,
+              True]
+    machine.registers['Mixed'] = list(values)
+    machine.registers['x'] = Decimal('3.14')
+    loaded = roundtrip(machine, tmp_path)
+    for value, other in zip(values, loaded.registers['Mixed']):
+        assert type(value) is type(other)
+        assert repr(value) == repr(other)
+    assert loaded.registers['x'] == Decimal('3.14')
+
+
+def test_stack_and_formats(tmp_path):
+    machine = Machine()
+    run(machine, "'D' i 1.10 'F' o 3 k")
+    loaded = roundtrip(machine, tmp_path)
+    assert list(loaded.stack) == [Decimal('1.10')]
+    assert (loaded.ifmt, loaded.ofmt, loaded.precision) == \
+        (Decimal, Fraction, 3)
+
+    machine = Machine()
+    run(machine, '1 2 3')
+    loaded = roundtrip(machine, tmp_path)
+    assert loaded.stack.packed
+    assert list(loaded.stack) == [1.0, 2.0, 3.0]
+
+
+def test_mapped(tmp_path):
+    machine = Machine()
+    run(machine, "1 'Ab' s 2 'Ab' s 3 'Ab' s")
+    loaded = roundtrip(machine, tmp_path)
+    register = loaded.registers['Ab']
+    assert isinstance(register, MappedStack)
+    copy = register.copy()
+    run(loaded, "'Ab' l 'Ab' l 4 'Ab' s")
+    assert list(loaded.stack) == [3.0, 2.0]
+    assert list(register) == [1.0, 4.0]
+    assert list(copy) == [1.0, 2.0, 3.0]
+    # Saved again while still (partly) mapped.
+    loaded = roundtrip(loaded, tmp_path)
+    assert list(loaded.registers['Ab']) == [1.0, 4.0]
+
+
+def test_commands(tmp_path):
+    path = str(tmp_path / 'state')
+    machine = Machine()
+    run(machine, "1 2 'x' s '{}' S c 5 '{}' L".format(path, path))
+    assert list(machine.stack) == [1.0]
+    assert machine.registers == {'x': 2.0}
+
+
+def test_errors(tmp_path):
+    path = tmp_path / 'state'
+    path.write_bytes(b'not a state file, at all')
+    with raises(RPNError):
+        load(Machine(), str(path))
+    path.write_bytes(b'')
+    with raises(RPNError):
+        load(Machine(), str(path))
+    machine = Machine()
+    run(machine, '1')
+    machine.registers['f'] = print
+    with raises(RPNError):
+        save(machine, str(path))
+    # Nothing half-written, nor left behind.
+    assert path.read_bytes() == b''
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_radix(tmp_path):
+    # Ints input in other bases stay that way.
+    for fmt, two in ('x', '2'), ('o', '2'), ('b', '10'):
+        machine = Machine()
+        run(machine, "'{}' i 1 11 {} n 'Ab' s 11 'Ab' s 1 'c' s 101"
+            .format(fmt, two))
+        loaded = roundtrip(machine, tmp_path)
+        for value, other in [(machine.stack, loaded.stack),
+                             (machine.registers, loaded.registers)]:
+            assert repr(value) == repr(other)
+        assert type(loaded.stack[-1]) is type(machine.stack[-1])
+        assert type(loaded.registers['c']) is type(machine.registers['c'])
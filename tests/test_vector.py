@@ -0,0 +1,114 @@
+'''
+RPN vector tests
+'''
+
+from fractions import Fraction
+import math
+
+from pytest import raises
+
+from rpn.util import RPNError
+from rpn.machine import Machine
+from rpn.vector import Vector
+
+from helpers import run
+
+
+def test_pack_and_unpack():
+    machine = Machine()
+    run(machine, '1 2 3 3 n')
+    vector, = machine.stack
+    assert isinstance(vector, Vector)
+    assert vector.tolist() == [1.0, 2.0, 3.0]
+    run(machine, 'u')
+    assert list(machine.stack) == [1.0, 2.0, 3.0]
+    # Counts that aren't, put back, as you were.
+    for count, value in ('4', 4.0), ('1_', -1.0), ('1.5', 1.5), ("'x'", 'x'):
+        with raises(RPNError):
+            run(machine, count + ' n')
+        assert list(machine.stack) == [1.0, 2.0, 3.0, value]
+        machine.stack.pop()
+    assert run(machine, '0 n u') == [1.0, 2.0, 3.0]
+
+
+def test_broadcast():
+    machine = Machine()
+    run(machine, '1 2 3 3 n d 2 * +')
+    assert machine.stack[-1].tolist() == [3.0, 6.0, 9.0]
+    run(machine, "c 0 1 2 n 'cos' $ 2 =")
+    assert machine.stack[-1].tolist() == [False, False]
+    run(machine, "c 1 2 3 3 n 1 2 2 n")
+    with raises(RPNError):
+        run(machine, '+')
+    # Python semantics for ints: unbounded.
+    run(machine, "c 'i' i 2 3 2 n 100 ^ 'prod' $")
+    assert machine.stack[-1] == 6 ** 100
+
+
+def test_reductions():
+    machine = Machine()
+    run(machine, "0.1 'Xs' s 0.2 'Xs' s 0.3 'Xs' s 'Xs' g")
+    assert machine.registers['Xs'] == [0.1, 0.2, 0.3]
+    for name, expected in [('sum', math.fsum([0.1, 0.2, 0.3])),
+                           ('min', 0.1),
+                           ('max', 0.3)]:
+        run(machine, "d '{}' $".format(name))
+        assert machine.stack.pop() == expected
+    run(machine, "d 'dot' $")
+    assert machine.stack[-1] == math.fsum(x * x for x in (0.1, 0.2, 0.3))
+    with raises(RPNError):
+        run(machine, "'sum' $")
+
+
+def test_objects():
+    # Exact types stay Python objects, e.g., without NumPy's help.
+    vector = Vector.of([Fraction(1, 3), 2])
+    assert isinstance(vector.items, list)
+    machine = Machine()
+    machine.stack.append(vector)
+    run(machine, "'F' i 3 * d 'sum' $")
+    assert machine.stack.pop() == 7
+    assert machine.stack.pop().tolist() == [1, 6]
+
+
+def test_stack_reductions():
+    machine = Machine()
+    run(machine, ' '.join(['0.1'] * 10) + " z 'sum' $")
+    assert list(machine.stack) == [1.0]
+    run(machine, "c 1 2 3 4 3 'prod' $")
+    assert list(machine.stack) == [1.0, 24.0]
+    run(machine, "c 5 1 'Xs' s 2 'Xs' s 6 'Xs' s 'Xs' 'mean' $")
+    assert list(machine.stack) == [5.0, 3.0]
+    assert machine.registers['Xs'] == [1.0, 2.0, 6.0]
+    run(machine, "'Xs' 'max' $ 2 'min' $")
+    assert list(machine.stack) == [5.0, 3.0]
+    # Never folded at compile time.
+    program = machine.compile("c 1 2 3 3 'sum' $ 2 *")
+    program.run()
+    program.run()
+    assert list(machine.stack) == [12.0]
+    # Exact types stay exact.
+    run(machine, "c 'i' i 2 100 ^ 1 2 'sum' $")
+    assert machine.stack[-1] == 2 ** 100 + 1
+    # Nothing's popped on error.
+    for line in "3 'sum' $", "1_ 'sum' $", "0 'mean' $", "'Nope' 'sum' $":
+        machine.stack.clear()
+        run(machine, '1 2')
+        with raises(RPNError):
+            run(machine, line)
+        assert list(machine.stack)[:2] == [1, 2]
+        assert len(machine.stack) == 4
+
+
+def test_same_as_scalars():
+    # Elementwise, whatever NumPy would make of it.
+    for line in "8_ 0.5 ^", "2.5 'ceil' $", "2.5 'floor' $", "1_ 'trunc' $":
+        scalar, vector = Machine(), Machine()
+        run(scalar, line)
+        run(vector, line.replace(' ', ' 1 n ', 1))
+        vector, = vector.stack[-1].tolist()
+        assert vector == scalar.stack[-1]
+        assert type(vector) is type(scalar.stack[-1])
+    machine = Machine()
+    with raises(ValueError):
+        run(machine, "1_ 4 2 n 'sqrt' $")